@@ -1,9 +1,39 @@
-from .gologin import GoLogin
-from .gologin import getRandomPort
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
 from .__meta__ import __version__
 
+# submodules load on first attribute access; see tests/test_import_time.py
+_LAZY_ATTRIBUTES = {
+    "GoLogin": ".gologin",
+    "getRandomPort": ".gologin",
+    "HistogramSink": ".instrumentation",
+    "Instrumentation": ".instrumentation",
+}
+
+if TYPE_CHECKING:
+    from .gologin import GoLogin
+    from .gologin import getRandomPort
+    from .instrumentation import HistogramSink
+    from .instrumentation import Instrumentation
+
 __all__ = (
     "GoLogin",
     "getRandomPort",
+    "HistogramSink",
+    "Instrumentation",
     "__version__",
 )
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,307 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from pygologin.cookiesManager.cookiesBulk import BulkResult
+    from pygologin.runner import ProfileResult
+
+
+def read_profile_ids(args: argparse.Namespace) -> List[str]:
+    profile_ids = list(args.profile_ids)
+    if args.profiles_file:
+        with open(args.profiles_file, "r", encoding="utf-8") as f:
+            profile_ids.extend(line.strip() for line in f if line.strip())
+    return profile_ids
+
+
+def run(args: argparse.Namespace) -> int:
+    from pygologin.gologin import GET_TIMEZONE_URL
+    from pygologin.proxies import ProxyProber
+    from pygologin.runner import (
+        PortAllocator,
+        ResourceGate,
+        Runner,
+        load_entry_point,
+        script_task,
+    )
+
+    if not args.token:
+        print("token is required (--token or GOLOGIN_TOKEN)", file=sys.stderr)
+        return 2
+    if bool(args.entry) == bool(args.script):
+        print("exactly one of --entry or --script is required", file=sys.stderr)
+        return 2
+
+    profile_ids = read_profile_ids(args)
+    if not profile_ids:
+        print("no profile ids given", file=sys.stderr)
+        return 2
+
+    task = load_entry_point(args.entry) if args.entry else script_task(args.script)
+    port_start, _, port_end = args.port_range.partition("-")
+    options = {"token": args.token, "local": args.local}
+    if args.tmpdir:
+        options["tmpdir"] = args.tmpdir
+    if args.executable_path:
+        options["executablePath"] = args.executable_path
+
+    runner = Runner(
+        options,
+        task,
+        concurrency=args.concurrency,
+        retries=args.retries,
+        retry_delay=args.retry_delay,
+        ports=PortAllocator(int(port_start), int(port_end)),
+        gate=ResourceGate(max_cpu=args.max_cpu, max_memory=args.max_memory),
+        prober=(
+            ProxyProber(GET_TIMEZONE_URL, slow=args.proxy_slow)
+            if args.check_proxies
+            else None
+        ),
+    )
+
+    def on_result(result: "ProfileResult") -> None:
+        status = "ok" if result.ok else f"failed: {result.error!r}"
+        print(f"{result.profile_id} {status} ({result.total:.2f}s)", flush=True)
+
+    with runner:
+        report = runner.run(profile_ids, on_result=on_result)
+    print(report.format())
+    return 0 if not report.failed else 1
+
+
+def export_cookies(args: argparse.Namespace) -> int:
+    from pygologin.cookiesManager.cookiesExporter import CookiesExporter
+
+    exporter = CookiesExporter(
+        args.tmpdir,
+        domains=args.domain,
+        workers=args.workers,
+        include_empty=args.include_empty,
+    )
+    if args.output == "-":
+        stats = exporter.export(sys.stdout)
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            stats = exporter.export(out)
+    print(
+        f"{stats['profiles']} profiles, {stats['cookies']} cookies, "
+        f"{stats['errors']} errors",
+        file=sys.stderr,
+    )
+    return 0 if not stats["errors"] else 1
+
+
+def cookies(args: argparse.Namespace) -> int:
+    from pygologin import GoLogin
+
+    if not args.token:
+        print("token is required (--token or GOLOGIN_TOKEN)", file=sys.stderr)
+        return 2
+    profile_ids = read_profile_ids(args)
+    if not profile_ids:
+        print("no profile ids given", file=sys.stderr)
+        return 2
+
+    options = {"token": args.token}
+    if args.tmpdir:
+        options["tmpdir"] = args.tmpdir
+    if args.executable_path:
+        options["executablePath"] = args.executable_path
+    gl = GoLogin(options)
+
+    def on_result(result: "BulkResult") -> None:
+        status = f"{result.cookies} cookies" if result.ok else f"failed: {result.error}"
+        print(f"{result.profile_id} {status} ({result.seconds:.2f}s)", flush=True)
+
+    settings = {"max_workers": args.workers, "rate": args.rate, "on_result": on_result}
+    if args.action == "download":
+        results = gl.downloadCookiesMany(profile_ids, args.dir, **settings)
+    elif args.action == "upload":
+        results = gl.uploadCookiesMany(profile_ids, args.dir, **settings)
+    else:
+        results = gl.clearCookiesMany(profile_ids, **settings)
+    failed = sum(1 for result in results.values() if not result.ok)
+    print(f"{len(results) - failed} ok, {failed} failed", file=sys.stderr)
+    return 0 if not failed else 1
+
+
+def analyze(args: argparse.Namespace) -> int:
+    import json
+
+    from pygologin.eventlog import analyze as analyze_events
+    from pygologin.eventlog import format_report, read_events
+
+    report = analyze_events(read_events(args.paths), top=args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+    return 0
+
+
+def agent(args: argparse.Namespace) -> int:
+    from pygologin.agent import Agent, default_token_file
+
+    options = {"token": args.token, "tmpdir": args.tmpdir}
+    if args.executable_path:
+        options["executablePath"] = args.executable_path
+    if args.background_commit:
+        options["background_commit"] = True
+    if args.lease_url:
+        options["lease_url"] = args.lease_url
+    lease_backend = None
+    if args.lease_db:
+        from pygologin.leases import SQLiteLeaseBackend
+
+        lease_backend = SQLiteLeaseBackend(args.lease_db)
+    server = Agent(
+        options,
+        host=args.host,
+        port=args.port,
+        socket_path=args.socket,
+        auth_token=args.auth_token,
+        # without --auth-token a TCP agent generates one for local clients
+        token_file=(
+            default_token_file(args.port)
+            if not args.socket and not args.auth_token
+            else None
+        ),
+        profile_cache_ttl=args.profile_cache_ttl,
+        timezone_cache_ttl=args.timezone_cache_ttl,
+        lease_backend=lease_backend,
+    )
+    server.bind()
+    print(f"pygologin agent listening on {server.address}", file=sys.stderr, flush=True)
+    if server.token_file:
+        print(f"auth token written to {server.token_file}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m pygologin")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser(
+        "run", help="start many profiles and run a callable against each"
+    )
+    run_parser.add_argument("profile_ids", nargs="*")
+    run_parser.add_argument("--profiles-file", help="file with one profile id per line")
+    run_parser.add_argument("--token", default=os.environ.get("GOLOGIN_TOKEN"))
+    run_parser.add_argument(
+        "--entry", help="'package.module:function' called as function(gl, address)"
+    )
+    run_parser.add_argument(
+        "--script",
+        help="python file run with gologin, profile_id and debugger_address globals",
+    )
+    run_parser.add_argument("--concurrency", type=int, default=4)
+    run_parser.add_argument("--retries", type=int, default=2)
+    run_parser.add_argument("--retry-delay", type=float, default=1.0)
+    run_parser.add_argument("--max-cpu", type=float, default=90.0)
+    run_parser.add_argument("--max-memory", type=float, default=90.0)
+    run_parser.add_argument("--port-range", default="3500-35000")
+    run_parser.add_argument("--tmpdir")
+    run_parser.add_argument("--executable-path")
+    run_parser.add_argument("--local", action="store_true")
+    run_parser.add_argument(
+        "--check-proxies",
+        action="store_true",
+        help="probe every profile's proxy first, skip dead ones, start fast ones first",
+    )
+    run_parser.add_argument(
+        "--proxy-slow",
+        type=float,
+        help="also skip profiles whose proxy takes longer than this many seconds",
+    )
+    run_parser.set_defaults(handler=run)
+
+    export_parser = commands.add_parser(
+        "export-cookies", help="dump cookies of all local profiles as NDJSON"
+    )
+    export_parser.add_argument("--tmpdir", default=tempfile.gettempdir())
+    export_parser.add_argument(
+        "--domain", action="append", help="only cookies for this domain (repeatable)"
+    )
+    export_parser.add_argument("--workers", type=int)
+    export_parser.add_argument("-o", "--output", default="-")
+    export_parser.add_argument("--include-empty", action="store_true")
+    export_parser.set_defaults(handler=export_cookies)
+
+    cookies_parser = commands.add_parser(
+        "cookies", help="download, upload or clear the cookies of many profiles"
+    )
+    cookies_parser.add_argument("action", choices=("download", "upload", "clear"))
+    cookies_parser.add_argument("profile_ids", nargs="*")
+    cookies_parser.add_argument(
+        "--profiles-file", help="file with one profile id per line"
+    )
+    cookies_parser.add_argument("--token", default=os.environ.get("GOLOGIN_TOKEN"))
+    cookies_parser.add_argument(
+        "--dir",
+        help="<dir>/<profile_id>.json files; without it the local Cookies DBs in tmpdir",
+    )
+    cookies_parser.add_argument("--tmpdir")
+    cookies_parser.add_argument("--executable-path")
+    cookies_parser.add_argument("--workers", type=int, default=8)
+    cookies_parser.add_argument(
+        "--rate", type=float, help="start at most this many profiles per second"
+    )
+    cookies_parser.set_defaults(handler=cookies)
+
+    analyze_parser = commands.add_parser(
+        "analyze", help="latency report from JSONL event logs (event_log option)"
+    )
+    analyze_parser.add_argument("paths", nargs="+", help="event logs, .gz allowed")
+    analyze_parser.add_argument("--top", type=int, default=10)
+    analyze_parser.add_argument("--json", action="store_true")
+    analyze_parser.set_defaults(handler=analyze)
+
+    agent_parser = commands.add_parser(
+        "agent", help="serve start/stop for thin clients with shared caches"
+    )
+    agent_parser.add_argument("--host", default="127.0.0.1")
+    agent_parser.add_argument("--port", type=int, default=36912)
+    agent_parser.add_argument("--socket", help="listen on this Unix socket instead")
+    agent_parser.add_argument("--token", default=os.environ.get("GOLOGIN_TOKEN"))
+    agent_parser.add_argument(
+        "--auth-token",
+        default=os.environ.get("PYGOLOGIN_AGENT_TOKEN"),
+        help="require 'Authorization: Bearer <token>' from clients",
+    )
+    agent_parser.add_argument("--tmpdir", default=tempfile.gettempdir())
+    agent_parser.add_argument("--executable-path")
+    agent_parser.add_argument("--background-commit", action="store_true")
+    agent_parser.add_argument("--profile-cache-ttl", type=float, default=60)
+    agent_parser.add_argument("--timezone-cache-ttl", type=float, default=3600)
+    agent_parser.add_argument(
+        "--lease-db", help="serve profile leases for other hosts from this SQLite file"
+    )
+    agent_parser.add_argument(
+        "--lease-url", help="take a profile lease here before every start"
+    )
+    agent_parser.set_defaults(handler=agent)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    handler: Callable[[argparse.Namespace], int] = args.handler
+    return handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,609 @@
+import hmac
+import http.client
+import json
+import logging
+import ipaddress
+import os
+import secrets
+import select
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple, Union, cast
+from urllib.parse import urlparse
+
+from pygologin.__meta__ import __version__
+from pygologin.exceptions import AgentError, ProfileInUseError
+from pygologin.gologin import SHARED_ATTRIBUTES, GoLogin, getRandomPort
+from pygologin.leases import LeaseBackend, MemoryLeaseBackend, handle_lease_request
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 36912
+DEFAULT_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+
+# per-start options a client may set; everything else is fixed by whoever
+# runs the agent: the API token, and executablePath, tmpdir and extra_params,
+# which decide what the agent executes
+FORWARDED_OPTIONS = (
+    "spawn_browser",
+    "local",
+    "restore_last_session",
+    "credentials_enable_service",
+    "cleaningLocalCookies",
+    "uploadCookiesToServer",
+    "writeCookiesFromServer",
+    "cookies_via_cdp",
+)
+
+
+def default_token_file(port: int) -> str:
+    # where a TCP agent leaves its generated auth token for local clients
+    return os.path.join(
+        os.path.expanduser("~"), ".gologin", f"pygologin-agent-{port}.token"
+    )
+
+
+def read_token_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+class BrowserRecord:
+    __slots__ = ("profile_id", "gologin", "url", "pid", "port", "started", "client")
+
+    def __init__(
+        self, profile_id: str, gologin: GoLogin, url: str, client: Optional[str]
+    ) -> None:
+        self.profile_id = profile_id
+        self.gologin = gologin
+        self.url = url
+        self.pid = gologin.pid
+        self.port = gologin.port
+        self.started = time.time()
+        self.client = client
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "url": self.url,
+            "pid": self.pid,
+            "port": self.port,
+            "profile_path": self.gologin.profile_path,
+            "started": self.started,
+            "client": self.client,
+        }
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        path = cast(str, self.server_address)
+        try:
+            os.unlink(path)  # left by an agent that died
+        except FileNotFoundError:
+            pass
+        super().server_bind()
+        os.chmod(path, 0o600)
+
+
+class Agent:
+    # a long-running process that starts and stops profiles for thin clients,
+    # so they share one connection pool, profile and timezone caches, the
+    # tmpdir workspace and a registry of running browsers
+    def __init__(
+        self,
+        options: Optional[Dict[str, Any]] = None,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        socket_path: Optional[str] = None,
+        auth_token: Optional[str] = None,
+        profile_cache_ttl: float = 60,
+        timezone_cache_ttl: float = 3600,
+        lease_backend: Optional[LeaseBackend] = None,
+        token_file: Optional[str] = None,
+    ) -> None:
+        self.options = {
+            "profile_cache_ttl": profile_cache_ttl,
+            "timezone_cache_ttl": timezone_cache_ttl,
+            **(options or {}),
+        }
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        # anything on the host, a web page included, can reach a TCP port,
+        # so TCP always needs a token; the 0600 socket is guarded by its mode
+        if auth_token is None and socket_path is None:
+            auth_token = secrets.token_urlsafe(32)
+        self.auth_token = auth_token
+        # the token is written here once the port is known
+        self.token_file = token_file
+        # served under /leases, so other hosts can use this agent as lease_url
+        self.lease_backend = lease_backend
+        # client leases (/lease) are kept in the same backend, so a client and
+        # another host never both hold a profile
+        self.leases: LeaseBackend = lease_backend or MemoryLeaseBackend()
+        # every start in the agent shares the helpers of this instance
+        self.base = GoLogin(self.options)
+        self.shared = {name: getattr(self.base, name) for name in SHARED_ATTRIBUTES}
+        self.browsers: Dict[str, BrowserRecord] = {}
+        self.started = time.time()
+        self.starts = 0
+        self.stops = 0
+        self._starting: Set[str] = set()
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.BaseServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        if self.socket_path:
+            return "unix://" + self.socket_path
+        return f"http://{self.host}:{self.port}"
+
+    def gologin(self, profile_id: str, options: Dict[str, Any]) -> GoLogin:
+        forwarded = {k: v for k, v in options.items() if k in FORWARDED_OPTIONS}
+        return GoLogin(
+            {
+                **self.options,
+                **forwarded,
+                **self.shared,
+                "profile_id": profile_id,
+                "port": getRandomPort(),
+            }
+        )
+
+    def start_profile(
+        self,
+        profile_id: str,
+        options: Optional[Dict[str, Any]] = None,
+        lease: Optional[int] = None,
+        client: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            self._check_lease(profile_id, lease)
+            if profile_id in self.browsers or profile_id in self._starting:
+                raise ProfileInUseError(
+                    f"profile {profile_id} is already running in the agent"
+                )
+            self._starting.add(profile_id)
+        try:
+            gl = self.gologin(profile_id, options or {})
+            url = gl.start()
+        finally:
+            with self._lock:
+                self._starting.discard(profile_id)
+        record = BrowserRecord(profile_id, gl, url, client)
+        with self._lock:
+            self.browsers[profile_id] = record
+            self.starts += 1
+        return record.as_dict()
+
+    def stop_profile(self, profile_id: str) -> Dict[str, Any]:
+        with self._lock:
+            record = self.browsers.pop(profile_id)
+        record.gologin.stop()
+        with self._lock:
+            self.stops += 1
+        return {"profile_id": profile_id, "stopped": True}
+
+    def stop_all(self) -> None:
+        for profile_id in list(self.browsers):
+            try:
+                self.stop_profile(profile_id)
+            except Exception as e:
+                log.exception("stopping %s failed: %s", profile_id, e)
+
+    def _check_lease(self, profile_id: str, token: Optional[int]) -> None:
+        lease = self.leases.get(profile_id)
+        if lease is None:
+            return
+        if token is None or str(token) != str(lease.token):
+            raise ProfileInUseError(
+                f"profile {profile_id} is leased by {lease.owner} "
+                f"for {lease.remaining:.0f}s more"
+            )
+
+    def lease(self, profile_id: str, owner: str, ttl: float = 60) -> Dict[str, Any]:
+        # the holder renews by leasing again before ttl runs out
+        lease = self.leases.acquire(profile_id, owner, ttl)
+        if lease.owner != owner:
+            raise ProfileInUseError(f"profile {profile_id} is leased by {lease.owner}")
+        return lease.as_dict()
+
+    def release(self, profile_id: str, token: int) -> Dict[str, Any]:
+        # the backend only releases while owner and token still match
+        lease = self.leases.get(profile_id)
+        released = (
+            lease is not None
+            and str(token) == str(lease.token)
+            and self.leases.release(lease)
+        )
+        return {"profile_id": profile_id, "released": released}
+
+    def list_browsers(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [record.as_dict() for record in self.browsers.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "pid": os.getpid(),
+            "version": __version__,
+            "uptime": time.time() - self.started,
+            "browsers": len(self.browsers),
+            "starts": self.starts,
+            "stops": self.stops,
+        }
+        for name in ("profile_cache", "timezone_cache", "committer", "leases"):
+            shared = self.shared.get(name)
+            if shared is not None:
+                stats[name] = shared.stats()
+        if self.shared.get("supervisor") is not None:
+            stats["supervisor"] = self.shared["supervisor"].totals()
+        return stats
+
+    def bind(self) -> None:
+        if self._server is not None:
+            return
+        handler = _handler(self)
+        if self.socket_path:
+            self._server = UnixHTTPServer(self.socket_path, handler)
+        else:
+            server = ThreadingHTTPServer((self.host, self.port), handler)
+            self.port = server.server_address[1]
+            self._server = server
+            if self.token_file and self.auth_token:
+                self._write_token_file(self.token_file)
+        log.info("pygologin agent listening on %s", self.address)
+
+    def _write_token_file(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(self.auth_token or "")
+
+    def serve_forever(self) -> None:
+        self.bind()
+        assert self._server is not None
+        self._server.serve_forever()
+
+    def start(self) -> "Agent":
+        self.bind()
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="pygologin-agent", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def shutdown(self, stop_browsers: bool = True) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            if self.socket_path:
+                try:
+                    os.unlink(self.socket_path)
+                except FileNotFoundError:
+                    pass
+            elif self.token_file:
+                try:
+                    os.unlink(self.token_file)
+                except FileNotFoundError:
+                    pass
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if stop_browsers:
+            self.stop_all()
+        self.base.close()
+
+    def __enter__(self) -> "Agent":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+
+
+def _handler(agent: Agent) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        timeout = 300  # drops idle keep-alive connections
+
+        def log_message(self, format: str, *args: Any) -> None:
+            log.debug("agent %s", format % args)
+
+        def address_string(self) -> str:
+            # AF_UNIX peers have no address
+            return str(self.client_address[0]) if self.client_address else "unix"
+
+        def do_GET(self) -> None:
+            self._dispatch("GET")
+
+        def do_POST(self) -> None:
+            self._dispatch("POST")
+
+        def _send_json(self, status: int, data: Any) -> None:
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json_body(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object")
+            return data
+
+        def _authorized(self) -> bool:
+            if not agent.auth_token:
+                return True
+            header = self.headers.get("Authorization", "")
+            return hmac.compare_digest(
+                header.encode("utf-8"), ("Bearer " + agent.auth_token).encode("utf-8")
+            )
+
+        def _forbidden(self) -> Optional[str]:
+            # browsers send Origin on cross-site requests and a rebound DNS
+            # name as Host; neither comes from a legitimate client
+            if self.headers.get("Origin") is not None:
+                return "cross-origin requests are not allowed"
+            if agent.socket_path is None and is_loopback(agent.host):
+                host = urlparse("//" + (self.headers.get("Host") or "")).hostname
+                if not host or not is_loopback(host):
+                    return "Host must be a loopback address"
+            return None
+
+        def _reject(self, status: int, error: str, message: str) -> None:
+            # the body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            self._send_json(status, {"error": error, "message": message})
+
+        def _dispatch(self, method: str) -> None:
+            path = urlparse(self.path).path.rstrip("/") or "/"
+            forbidden = self._forbidden()
+            if forbidden:
+                self._reject(403, "Forbidden", forbidden)
+                return
+            if not self._authorized():
+                self._reject(401, "Unauthorized", path)
+                return
+            content_type = self.headers.get("Content-Type", "")
+            if method == "POST" and (
+                content_type.split(";")[0].strip().lower() != "application/json"
+            ):
+                self._reject(415, "UnsupportedMediaType", "expected application/json")
+                return
+            try:
+                body = self._json_body() if method == "POST" else {}
+            except ValueError as e:
+                self._send_json(400, {"error": "BadRequest", "message": str(e)})
+                return
+            try:
+                status, data = self._route(method, path, body)
+            except ProfileInUseError as e:
+                status, data = 409, {"error": type(e).__name__, "message": str(e)}
+            except KeyError as e:
+                status, data = 404, {"error": "NotFound", "message": str(e)}
+            except (TypeError, ValueError) as e:
+                status, data = 400, {"error": "BadRequest", "message": str(e)}
+            except Exception as e:
+                log.exception("agent %s %s failed: %s", method, path, e)
+                status, data = 500, {"error": type(e).__name__, "message": str(e)}
+            self._send_json(status, data)
+
+        def _route(
+            self, method: str, path: str, body: Dict[str, Any]
+        ) -> Tuple[int, Any]:
+            if method == "GET" and path == "/health":
+                return 200, {"status": "ok", "pid": os.getpid(), "version": __version__}
+            if method == "GET" and path == "/browsers":
+                return 200, agent.list_browsers()
+            if method == "GET" and path == "/stats":
+                return 200, agent.stats()
+            if method == "POST" and path == "/start":
+                return 200, agent.start_profile(
+                    body["profile_id"],
+                    body.get("options"),
+                    lease=body.get("lease"),
+                    client=body.get("client"),
+                )
+            if method == "POST" and path == "/stop":
+                return 200, agent.stop_profile(body["profile_id"])
+            if method == "POST" and path == "/lease":
+                return 200, agent.lease(
+                    body["profile_id"], body["owner"], float(body.get("ttl", 60))
+                )
+            if method == "POST" and path == "/release":
+                return 200, agent.release(body["profile_id"], body["token"])
+            if path.startswith("/leases/") and agent.lease_backend is not None:
+                return handle_lease_request(
+                    agent.lease_backend, method, path.split("/")[2:], body
+                )
+            if method == "POST" and path == "/shutdown":
+                threading.Thread(target=agent.shutdown, daemon=True).start()
+                return 200, {"status": "shutting down"}
+            raise KeyError(f"{method} {path}")
+
+    return Handler
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def idle_closed(connection: http.client.HTTPConnection) -> bool:
+    # an idle keep-alive socket only turns readable when the peer closed it
+    if connection.sock is None:
+        return False
+    readable, _, _ = select.select([connection.sock], [], [], 0)
+    return bool(readable)
+
+
+class AgentClient:
+    # talks to an Agent at http://host:port or unix:///path/to.sock, keeping
+    # one connection per thread alive between calls
+    def __init__(
+        self,
+        url: str = DEFAULT_URL,
+        auth_token: Optional[str] = None,
+        timeout: float = 600,
+        client: Optional[str] = None,
+    ) -> None:
+        self.url = url
+        if auth_token is None:
+            auth_token = os.environ.get("PYGOLOGIN_AGENT_TOKEN")
+        if auth_token is None and urlparse(url).scheme == "http":
+            # the token a local agent generated for itself
+            port = urlparse(url).port or DEFAULT_PORT
+            auth_token = read_token_file(default_token_file(port))
+        self.auth_token = auth_token
+        self.timeout = timeout
+        self.client = client or f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        parsed = urlparse(self.url)
+        if parsed.scheme == "unix":
+            return UnixHTTPConnection(parsed.path, timeout=self.timeout)
+        if parsed.scheme != "http":
+            raise ValueError(f"unsupported agent url {self.url!r}")
+        return http.client.HTTPConnection(
+            parsed.hostname or DEFAULT_HOST,
+            parsed.port or DEFAULT_PORT,
+            timeout=self.timeout,
+        )
+
+    def request(self, method: str, path: str, body: Optional[Any] = None) -> Any:
+        headers = {"Content-Type": "application/json"}
+        if self.auth_token:
+            headers["Authorization"] = "Bearer " + self.auth_token
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        connection: Optional[http.client.HTTPConnection] = getattr(
+            self._local, "connection", None
+        )
+        if connection is not None and idle_closed(connection):
+            connection.close()
+            connection = None
+        reused = connection is not None
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+        except (BrokenPipeError, ConnectionResetError):
+            connection.close()
+            self._local.connection = None
+            if not reused:
+                raise
+            # the agent closed an idle keep-alive connection before it got
+            # the request; nothing ran, so a fresh connection may send it
+            return self.request(method, path, body)
+        except Exception:
+            connection.close()
+            self._local.connection = None
+            raise
+        try:
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError) as e:
+            connection.close()
+            self._local.connection = None
+            if reused and method == "GET":
+                return self.request(method, path, body)
+            # the agent may have started or leased the profile already
+            raise AgentError(
+                f"agent dropped the connection during {method} {path}: {e}"
+            ) from e
+        except Exception:
+            connection.close()
+            self._local.connection = None
+            raise
+        result = json.loads(data) if data else None
+        if response.status >= 400:
+            message = (
+                result.get("message")
+                if isinstance(result, dict)
+                else data.decode("utf-8", "replace")
+            )
+            if response.status == 409:
+                raise ProfileInUseError(message)
+            raise AgentError(f"agent returned HTTP {response.status}: {message}")
+        return result
+
+    def health(self) -> Dict[str, Any]:
+        return cast(Dict[str, Any], self.request("GET", "/health"))
+
+    def start(
+        self,
+        profile_id: str,
+        options: Optional[Dict[str, Any]] = None,
+        lease: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "profile_id": profile_id,
+            "options": options or {},
+            "client": self.client,
+        }
+        if lease is not None:
+            body["lease"] = lease
+        return cast(Dict[str, Any], self.request("POST", "/start", body))
+
+    def stop(self, profile_id: Union[str, None]) -> Dict[str, Any]:
+        return cast(
+            Dict[str, Any], self.request("POST", "/stop", {"profile_id": profile_id})
+        )
+
+    def browsers(self) -> List[Dict[str, Any]]:
+        return cast(List[Dict[str, Any]], self.request("GET", "/browsers"))
+
+    def stats(self) -> Dict[str, Any]:
+        return cast(Dict[str, Any], self.request("GET", "/stats"))
+
+    def lease(self, profile_id: str, ttl: float = 60) -> Dict[str, Any]:
+        body = {"profile_id": profile_id, "owner": self.client, "ttl": ttl}
+        return cast(Dict[str, Any], self.request("POST", "/lease", body))
+
+    def release(self, profile_id: str, token: int) -> Dict[str, Any]:
+        return cast(
+            Dict[str, Any],
+            self.request(
+                "POST", "/release", {"profile_id": profile_id, "token": token}
+            ),
+        )
+
+    def shutdown(self) -> Dict[str, Any]:
+        return cast(Dict[str, Any], self.request("POST", "/shutdown", {}))
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,233 @@
+import base64
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import socket
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# API sameSite values (see cookiesManager.SAME_SITE) to CDP CookieSameSite
+SAME_SITE_TO_CDP = {
+    "no_restriction": "None",
+    "lax": "Lax",
+    "strict": "Strict",
+}
+SAME_SITE_FROM_CDP = {value: key for key, value in SAME_SITE_TO_CDP.items()}
+
+
+class CDPError(Exception):
+    def __init__(self, method: str, error: Dict[str, Any]) -> None:
+        self.method = method
+        self.error = error
+        super().__init__(f"{method}: {error.get('message', error)}")
+
+
+def accept_key(key: str) -> str:
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool) -> bytes:
+    header = bytearray([0x80 | opcode])
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    if not mask:
+        return bytes(header) + payload
+    key = os.urandom(4)
+    return bytes(header) + key + _apply_mask(payload, key)
+
+
+def _apply_mask(payload: bytes, key: bytes) -> bytes:
+    # xor through int.from_bytes is far faster than a per-byte Python loop
+    repeated = (key * (len(payload) // 4 + 1))[: len(payload)]
+    masked = int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")
+    return masked.to_bytes(len(payload), "big")
+
+
+def _read_exact(stream: io.BufferedIOBase, size: int) -> bytes:
+    data = stream.read(size)
+    if data is None or len(data) < size:
+        raise ConnectionError("websocket closed")
+    return data
+
+
+def read_frame(stream: io.BufferedIOBase) -> Tuple[bool, int, bytes]:
+    first, second = _read_exact(stream, 2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", _read_exact(stream, 2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", _read_exact(stream, 8))
+    key = _read_exact(stream, 4) if second & 0x80 else None
+    payload = _read_exact(stream, length) if length else b""
+    if key is not None:
+        payload = _apply_mask(payload, key)
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+def read_message(stream: io.BufferedIOBase, writer: Any, mask: bool) -> Optional[bytes]:
+    # returns None when the peer closes the connection
+    parts: List[bytes] = []
+    while True:
+        final, opcode, payload = read_frame(stream)
+        if opcode == OP_PING:
+            writer(encode_frame(OP_PONG, payload, mask))
+            continue
+        if opcode == OP_PONG:
+            continue
+        if opcode == OP_CLOSE:
+            return None
+        parts.append(payload)
+        if final:
+            return b"".join(parts)
+
+
+class WebSocket:
+    def __init__(self, url: str, timeout: float = 10) -> None:
+        parsed = urlparse(url)
+        if parsed.scheme != "ws":
+            raise ValueError(f"unsupported websocket url {url!r}")
+        port = parsed.port or 80
+        self.sock = socket.create_connection((parsed.hostname, port), timeout=timeout)
+        self.stream = self.sock.makefile("rb")
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = parsed.path + ("?" + parsed.query if parsed.query else "")
+        request = (
+            f"GET {path or '/'} HTTP/1.1\r\n"
+            f"Host: {parsed.hostname}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        self.sock.sendall(request.encode())
+
+        status = self.stream.readline().decode("latin-1")
+        headers: Dict[str, str] = {}
+        while True:
+            line = self.stream.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if " 101 " not in status or headers.get("sec-websocket-accept") != accept_key(
+            key
+        ):
+            self.close()
+            raise ConnectionError(f"websocket handshake failed: {status.strip()}")
+
+    def send(self, text: str) -> None:
+        self.sock.sendall(encode_frame(OP_TEXT, text.encode("utf-8"), mask=True))
+
+    def recv(self) -> str:
+        message = read_message(self.stream, self.sock.sendall, mask=True)
+        if message is None:
+            raise ConnectionError("websocket closed by peer")
+        return message.decode("utf-8")
+
+    def close(self) -> None:
+        try:
+            self.sock.sendall(encode_frame(OP_CLOSE, b"", mask=True))
+        except OSError:
+            pass
+        self.stream.close()
+        self.sock.close()
+
+
+class CDPClient:
+    def __init__(self, ws_url: str, timeout: float = 10) -> None:
+        self.ws = WebSocket(ws_url, timeout=timeout)
+        self._ids = itertools.count(1)
+
+    def send(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        message_id = next(self._ids)
+        self.ws.send(
+            json.dumps({"id": message_id, "method": method, "params": params or {}})
+        )
+        while True:
+            message = json.loads(self.ws.recv())
+            if message.get("id") != message_id:
+                continue  # an event or a stale reply
+            if "error" in message:
+                raise CDPError(method, message["error"])
+            return message.get("result", {})
+
+    def close(self) -> None:
+        self.ws.close()
+
+    def __enter__(self) -> "CDPClient":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def to_cdp_cookie(cookie: Dict[str, Any]) -> Dict[str, Any]:
+    domain = cookie.get("domain", "")
+    path = cookie.get("path", "/")
+    secure = bool(cookie.get("secure", False))
+    result: Dict[str, Any] = {
+        "name": cookie["name"],
+        "value": cookie.get("value", ""),
+        "path": path,
+        "secure": secure,
+        "httpOnly": bool(cookie.get("httpOnly", False)),
+    }
+    if cookie.get("hostOnly", not domain.startswith(".")):
+        # CDP turns any domain into a domain cookie; only a url keeps it host-only
+        host = domain[1:] if domain.startswith(".") else domain
+        result["url"] = ("https://" if secure else "http://") + host + path
+    else:
+        result["domain"] = domain
+    same_site = SAME_SITE_TO_CDP.get(cookie.get("sameSite", "unspecified"))
+    if same_site is not None:
+        result["sameSite"] = same_site
+    expires = cookie.get("expirationDate")
+    if not cookie.get("session") and expires:
+        result["expires"] = float(expires)
+    return result
+
+
+def from_cdp_cookie(cookie: Dict[str, Any]) -> Dict[str, Any]:
+    domain = cookie.get("domain", "")
+    secure = bool(cookie.get("secure", False))
+    path = cookie.get("path", "/")
+    session = bool(cookie.get("session", cookie.get("expires", -1) <= 0))
+    host = domain[1:] if domain.startswith(".") else domain
+    return {
+        "url": ("https://" if secure else "http://") + host + path,
+        "domain": domain,
+        "name": cookie["name"],
+        "value": cookie.get("value", ""),
+        "path": path,
+        "sameSite": SAME_SITE_FROM_CDP.get(cookie.get("sameSite", ""), "unspecified"),
+        "secure": secure,
+        "httpOnly": bool(cookie.get("httpOnly", False)),
+        "hostOnly": not domain.startswith("."),
+        "session": session,
+        "expirationDate": 0 if session else cookie.get("expires", 0),
+    }
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from pygologin.exceptions import CommitPendingError
+from pygologin.workspace import COMMIT_SUFFIX, PROFILE_PREFIX, pid_alive
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class CommitJob:
+    def __init__(
+        self,
+        profile_id: str,
+        commit: Callable[[], Any],
+        on_complete: Optional[Callable[["CommitJob"], Any]] = None,
+    ) -> None:
+        self.profile_id = profile_id
+        self.commit = commit
+        self.on_complete = on_complete
+        self.status = QUEUED
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "pid": os.getpid(),
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+    def __repr__(self) -> str:
+        return f"CommitJob({self.profile_id!r}, status={self.status!r})"
+
+
+class Committer:
+    # runs stop()'s zip, upload and cleanup on a bounded pool; every job has a
+    # gologin_<id>.commit state file in state_dir until it succeeds, so a
+    # pending commit survives a crash and blocks new starts of that profile
+    def __init__(
+        self,
+        state_dir: str,
+        workers: int = 2,
+        retries: int = 3,
+        backoff: float = 1.0,
+        on_complete: Optional[Callable[[CommitJob], Any]] = None,
+    ) -> None:
+        self.state_dir = state_dir
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.on_complete = on_complete
+        self.jobs: Dict[str, CommitJob] = {}
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pool: Optional["ThreadPoolExecutor"] = None
+        self._closed = False
+
+    def state_path(self, profile_id: str) -> str:
+        return os.path.join(self.state_dir, PROFILE_PREFIX + profile_id + COMMIT_SUFFIX)
+
+    def _write_state(self, job: CommitJob) -> None:
+        path = self.state_path(job.profile_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(job.as_dict(), f)
+        os.replace(tmp, path)
+
+    def read_state(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.state_path(profile_id), "r") as f:
+                state: Dict[str, Any] = json.load(f)
+                return state
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return {"profile_id": profile_id, "status": FAILED, "pid": None}
+
+    def submit(
+        self,
+        profile_id: str,
+        commit: Callable[[], Any],
+        on_complete: Optional[Callable[[CommitJob], Any]] = None,
+    ) -> CommitJob:
+        from concurrent.futures import ThreadPoolExecutor
+
+        job = CommitJob(profile_id, commit, on_complete)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("committer is closed")
+            current = self.jobs.get(profile_id)
+            if current is not None and not current.done.is_set():
+                raise CommitPendingError(
+                    f"a commit of profile {profile_id} is already queued"
+                )
+            os.makedirs(self.state_dir, exist_ok=True)
+            self._write_state(job)
+            self.jobs[profile_id] = job
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="pygologin-commit"
+                )
+            pool = self._pool
+        pool.submit(self._run, job)
+        return job
+
+    def _run(self, job: CommitJob) -> None:
+        while True:
+            job.attempts += 1
+            job.status = RUNNING
+            try:
+                job.commit()
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                if job.attempts <= self.retries:
+                    delay = self.backoff * 2 ** (job.attempts - 1)
+                    log.warning(
+                        "commit of %s failed (attempt %d), retrying in %.1fs: %s",
+                        job.profile_id,
+                        job.attempts,
+                        delay,
+                        e,
+                    )
+                    time.sleep(delay)
+                    continue
+                log.error("commit of %s failed: %s", job.profile_id, e)
+                job.status = FAILED
+                # the state file stays, so the profile keeps its local changes
+                # and is not started again until recover() commits it
+                self._write_state(job)
+            else:
+                job.status = DONE
+                job.error = None
+                try:
+                    os.remove(self.state_path(job.profile_id))
+                except FileNotFoundError:
+                    pass
+            break
+        job.finished = time.time()
+        for callback in (job.on_complete, self.on_complete):
+            if callback is None:
+                continue
+            try:
+                callback(job)
+            except Exception as e:
+                log.exception("commit callback for %s failed: %s", job.profile_id, e)
+        with self._lock:
+            if job.status == DONE:
+                self.completed += 1
+            else:
+                self.failed += 1
+            job.done.set()
+            self._idle.notify_all()
+
+    def pending(self, profile_id: str) -> bool:
+        with self._lock:
+            job = self.jobs.get(profile_id)
+            if job is not None and not job.done.is_set():
+                return True
+        return os.path.exists(self.state_path(profile_id))
+
+    def wait(self, profile_id: str, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            job = self.jobs.get(profile_id)
+        if job is not None and not job.done.wait(timeout):
+            return False
+        return not self.pending(profile_id)
+
+    def guard(self, profile_id: str, timeout: float = 0) -> None:
+        # raises unless the profile has no pending or failed commit; waits up
+        # to timeout for a commit queued in this process
+        if not self.pending(profile_id):
+            return
+        if timeout and self.wait(profile_id, timeout):
+            return
+        state = self.read_state(profile_id) or {"status": QUEUED}
+        raise CommitPendingError(
+            f"profile {profile_id} has a {state['status']} commit "
+            f"({self.state_path(profile_id)}); wait for it or recover() it "
+            "before starting the profile again"
+        )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # waits until every submitted job has finished
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while any(not job.done.is_set() for job in self.jobs.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        flushed = self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=flushed)
+        return flushed
+
+    def stale(self) -> List[str]:
+        # profile ids with a state file that no live process is working on
+        result: List[str] = []
+        prefix_len = len(PROFILE_PREFIX)
+        try:
+            names = os.listdir(self.state_dir)
+        except FileNotFoundError:
+            return result
+        for name in names:
+            if not name.startswith(PROFILE_PREFIX) or not name.endswith(COMMIT_SUFFIX):
+                continue
+            profile_id = name[prefix_len : -len(COMMIT_SUFFIX)]
+            with self._lock:
+                job = self.jobs.get(profile_id)
+                if job is not None and not job.done.is_set():
+                    continue
+            state = self.read_state(profile_id)
+            if state is None:
+                continue
+            pid = state.get("pid")
+            if state.get("status") == FAILED or not pid or not pid_alive(pid):
+                result.append(profile_id)
+        return result
+
+    def recover(self, factory: Callable[[str], Callable[[], Any]]) -> List[CommitJob]:
+        # requeues commits left behind by a crash or that ran out of retries;
+        # factory(profile_id) returns the commit callable for that profile
+        return [
+            self.submit(profile_id, factory(profile_id)) for profile_id in self.stale()
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = sum(1 for job in self.jobs.values() if not job.done.is_set())
+            return {
+                "pending": pending,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
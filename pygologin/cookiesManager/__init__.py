@@ -1,3 +1,46 @@
-from .cookiesManager import CookiesManager
+import importlib
+from typing import TYPE_CHECKING, Any, List
 
-__all__ = ("CookiesManager",)
+# CookiesManager pulls in sqlite3 and CookiesExporter a process pool, so
+# they load on first use
+_LAZY_ATTRIBUTES = {
+    "BulkResult": ".cookiesBulk",
+    "Cookie": ".cookie",
+    "CookieBatch": ".cookie",
+    "CookiesBulk": ".cookiesBulk",
+    "CookiesExporter": ".cookiesExporter",
+    "CookiesManager": ".cookiesManager",
+    "CookiesMerger": ".cookiesMerger",
+    "MergeReport": ".cookiesMerger",
+}
+
+if TYPE_CHECKING:
+    from .cookie import Cookie, CookieBatch
+    from .cookiesBulk import BulkResult, CookiesBulk
+    from .cookiesExporter import CookiesExporter
+    from .cookiesManager import CookiesManager
+    from .cookiesMerger import CookiesMerger, MergeReport
+
+__all__ = (
+    "BulkResult",
+    "Cookie",
+    "CookieBatch",
+    "CookiesBulk",
+    "CookiesExporter",
+    "CookiesManager",
+    "CookiesMerger",
+    "MergeReport",
+)
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
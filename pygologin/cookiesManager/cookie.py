@@ -0,0 +1,346 @@
+import datetime
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+SAME_SITE = {
+    -1: "unspecified",
+    0: "no_restriction",
+    1: "lax",
+    2: "strict",
+}
+SAME_SITE_CODES = {value: key for key, value in SAME_SITE.items()}
+
+# columns read by CookieBatch.from_rows, in order
+SELECT_COLUMNS = (
+    "host_key",
+    "top_frame_site_key",
+    "name",
+    "encrypted_value",
+    "path",
+    "expires_utc",
+    "creation_utc",
+    "is_secure",
+    "is_httponly",
+    "is_persistent",
+    "samesite",
+)
+
+INSERT_COLUMNS = (
+    "creation_utc",
+    "host_key",
+    "top_frame_site_key",
+    "name",
+    "value",
+    "encrypted_value",
+    "path",
+    "expires_utc",
+    "is_secure",
+    "is_httponly",
+    "last_access_utc",
+    "has_expires",
+    "is_persistent",
+    "priority",
+    "samesite",
+    "source_scheme",
+    "source_port",
+    "is_same_party",
+    "last_update_utc",
+)
+
+INSERT_QUERY = "insert or replace into cookies ({}) values ({})".format(
+    ", ".join(INSERT_COLUMNS), ", ".join("?" * len(INSERT_COLUMNS))
+)
+
+WIN32_EPOCH_MS = int(
+    datetime.datetime(1601, 1, 1, tzinfo=datetime.timezone.utc).timestamp() * 1000
+)
+
+
+def ldap_to_unix(ldap: float) -> float:
+    ldap_str = str(int(ldap))  # Convert to integer first to avoid decimals
+    ldap_length = len(ldap_str)
+
+    if ldap == 0 or ldap_length > 18:
+        return ldap
+
+    _ldap = ldap
+    if ldap_length < 18:
+        _ldap = int(
+            ldap_str + "0" * (18 - ldap_length)
+        )  # Padding zeros to the integer part
+
+    return (_ldap / 10000 + WIN32_EPOCH_MS) / 1000
+
+
+def build_cookie_url(domain: str, secure: bool, path: str) -> str:
+    domain_without_dot = domain[1:] if domain.startswith(".") else domain
+    protocol = "https://" if secure else "http://"
+
+    return protocol + domain_without_dot + path
+
+
+class Cookie:
+    __slots__ = (
+        "domain",
+        "top_frame_site_key",
+        "name",
+        "value",
+        "path",
+        "expiration_date",
+        "creation_date",
+        "secure",
+        "http_only",
+        "session",
+        "same_site",
+    )
+
+    def __init__(
+        self,
+        domain: str,
+        name: str,
+        value: Any,
+        path: str = "",
+        expiration_date: float = 0,
+        creation_date: Optional[float] = None,
+        secure: bool = False,
+        http_only: bool = False,
+        session: bool = False,
+        same_site: int = -1,
+        top_frame_site_key: str = "",
+    ) -> None:
+        self.domain = domain
+        self.top_frame_site_key = top_frame_site_key
+        self.name = name
+        self.value = value
+        self.path = path
+        self.expiration_date = expiration_date
+        self.creation_date = creation_date
+        self.secure = secure
+        self.http_only = http_only
+        self.session = session
+        self.same_site = same_site
+
+    @classmethod
+    def from_dict(cls, cookie: Dict[str, Any]) -> "Cookie":
+        session = bool(cookie.get("session", False))
+        return cls(
+            domain=cookie.get("domain", ""),
+            top_frame_site_key=cookie.get("topFrameSiteKey", ""),
+            name=cookie["name"],
+            value=cookie["value"],
+            path=cookie.get("path", ""),
+            expiration_date=0 if session else cookie.get("expirationDate", 0),
+            creation_date=cookie.get("creationDate"),
+            secure=bool(cookie.get("secure", False)),
+            http_only=bool(cookie.get("httpOnly", False)),
+            session=session,
+            same_site=SAME_SITE_CODES.get(cookie.get("sameSite", ""), -1),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "url": build_cookie_url(self.domain, self.secure, self.path),
+            "domain": self.domain,
+            "name": self.name,
+            "value": self.value,
+            "path": self.path,
+            "sameSite": SAME_SITE[self.same_site],
+            "secure": self.secure,
+            "httpOnly": self.http_only,
+            "hostOnly": not self.domain.startswith("."),
+            "session": self.session,
+            "expirationDate": self.expiration_date,
+            "creationDate": self.creation_date,
+        }
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Cookie):
+            return NotImplemented
+        return all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        return f"Cookie({self.domain!r}, {self.name!r}, path={self.path!r})"
+
+
+class CookieBatch:
+    # parallel arrays, one entry per cookie; far smaller than a list of dicts
+    __slots__ = Cookie.__slots__
+
+    def __init__(self) -> None:
+        self.domain: List[str] = []
+        self.top_frame_site_key: List[str] = []
+        self.name: List[str] = []
+        self.value: List[Any] = []
+        self.path: List[str] = []
+        self.expiration_date: List[float] = []
+        self.creation_date: List[Optional[float]] = []
+        self.secure: List[bool] = []
+        self.http_only: List[bool] = []
+        self.session: List[bool] = []
+        self.same_site: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.name)
+
+    def append(self, cookie: Cookie) -> None:
+        for slot in self.__slots__:
+            getattr(self, slot).append(getattr(cookie, slot))
+
+    def __getitem__(self, index: int) -> Cookie:
+        return Cookie(**{slot: getattr(self, slot)[index] for slot in self.__slots__})
+
+    def __iter__(self) -> Iterator[Cookie]:
+        for index in range(len(self)):
+            yield self[index]
+
+    @classmethod
+    def from_cookies(cls, cookies: Iterable[Cookie]) -> "CookieBatch":
+        batch = cls()
+        for cookie in cookies:
+            batch.append(cookie)
+        return batch
+
+    @classmethod
+    def from_dicts(cls, cookies: Iterable[Dict[str, Any]]) -> "CookieBatch":
+        batch = cls()
+        (
+            domain,
+            top_frame_site_key,
+            name,
+            value,
+            path,
+            expiration_date,
+            creation_date,
+            secure,
+            http_only,
+            session_,
+            same_site,
+        ) = (getattr(batch, slot) for slot in cls.__slots__)
+        for cookie in cookies:
+            session = bool(cookie.get("session", False))
+            domain.append(cookie.get("domain", ""))
+            top_frame_site_key.append(cookie.get("topFrameSiteKey", ""))
+            name.append(cookie["name"])
+            value.append(cookie["value"])
+            path.append(cookie.get("path", ""))
+            expiration_date.append(0 if session else cookie.get("expirationDate", 0))
+            creation_date.append(cookie.get("creationDate"))
+            secure.append(bool(cookie.get("secure", False)))
+            http_only.append(bool(cookie.get("httpOnly", False)))
+            session_.append(session)
+            same_site.append(SAME_SITE_CODES.get(cookie.get("sameSite", ""), -1))
+        return batch
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]]) -> "CookieBatch":
+        # rows from "select <SELECT_COLUMNS> from cookies"
+        batch = cls()
+        for (
+            host_key,
+            top_frame_site_key,
+            name,
+            encrypted_value,
+            path,
+            expires_utc,
+            creation_utc,
+            is_secure,
+            is_httponly,
+            is_persistent,
+            samesite,
+        ) in rows:
+            batch.domain.append(host_key)
+            batch.top_frame_site_key.append(top_frame_site_key or "")
+            batch.name.append(name)
+            batch.value.append(encrypted_value)
+            batch.path.append(path)
+            batch.expiration_date.append(ldap_to_unix(expires_utc))
+            batch.creation_date.append(ldap_to_unix(creation_utc))
+            batch.secure.append(bool(is_secure))
+            batch.http_only.append(bool(is_httponly))
+            batch.session.append(not is_persistent)
+            batch.same_site.append(samesite)
+        return batch
+
+    def sqlite_params(self, now: Optional[int] = None) -> Iterator[Tuple[Any, ...]]:
+        # tuples for INSERT_QUERY
+        today_unix = int(datetime.datetime.now().timestamp()) if now is None else now
+        for (
+            domain,
+            top_frame_site_key,
+            name,
+            value,
+            path,
+            expiration_date,
+            creation_date,
+            secure,
+            http_only,
+            session,
+            same_site,
+        ) in zip(*(getattr(self, slot) for slot in self.__slots__)):
+            is_secure = (
+                1
+                if name.startswith("__Host-") or name.startswith("__Secure-")
+                else int(secure)
+            )
+            is_persistent = 0 if session else 1 if expiration_date != 0 else 0
+            if domain == ".mail.google.com" and name == "COMPASS":
+                expiration_date = 0
+                is_persistent = 0
+
+            yield (
+                today_unix if creation_date is None else creation_date,
+                domain,
+                top_frame_site_key,
+                name,
+                "",  # value
+                value,  # encrypted_value
+                path,
+                expiration_date,
+                is_secure,
+                int(http_only),
+                0,  # last_access_utc
+                0 if expiration_date == 0 else 1,  # has_expires
+                is_persistent,
+                1,  # default priority value (https://github.com/chromium/chromium/blob/main/net/cookies/cookie_constants.h)
+                same_site,
+                2 if is_secure == 1 else 1,  # source_scheme
+                443 if is_secure == 1 else 80,  # source_port
+                0,  # is_same_party
+                0,  # last_update_utc
+            )
+
+    def to_api(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "url": build_cookie_url(domain, secure, path),
+                "domain": domain,
+                "name": name,
+                "value": value,
+                "path": path,
+                "sameSite": SAME_SITE[same_site],
+                "secure": secure,
+                "httpOnly": http_only,
+                "hostOnly": not domain.startswith("."),
+                "session": session,
+                "expirationDate": expiration_date,
+                "creationDate": creation_date,
+            }
+            for (
+                domain,
+                _top_frame_site_key,
+                name,
+                value,
+                path,
+                expiration_date,
+                creation_date,
+                secure,
+                http_only,
+                session,
+                same_site,
+            ) in zip(*(getattr(self, slot) for slot in self.__slots__))
+        ]
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_api())
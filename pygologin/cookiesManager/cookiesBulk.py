@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from pygologin.ratelimit import RateLimiter
+
+from .cookiesManager import CookiesManager
+
+if TYPE_CHECKING:
+    from pygologin.gologin import GoLogin
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class BulkResult:
+    __slots__ = ("profile_id", "ok", "cookies", "path", "error", "seconds")
+
+    def __init__(self, profile_id: str) -> None:
+        self.profile_id = profile_id
+        self.ok = False
+        self.cookies = 0
+        self.path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        state = f"{self.cookies} cookies" if self.ok else f"failed: {self.error}"
+        return f"BulkResult({self.profile_id!r}, {state})"
+
+
+Operation = Callable[[str, BulkResult], None]
+
+
+class CookiesBulk:
+    # runs one cookie operation over many profiles with at most max_workers
+    # in flight and at most rate profiles started per second; every profile
+    # gets a BulkResult, so one failure does not stop the rest
+    def __init__(
+        self,
+        gologin: "GoLogin",
+        max_workers: int = 8,
+        rate: Optional[float] = None,
+    ) -> None:
+        self.gologin = gologin
+        self.max_workers = max_workers
+        self.limiter = RateLimiter({"profile": rate}) if rate else None
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        profile_ids: List[str],
+        operation: Operation,
+        on_result: Optional[Callable[[BulkResult], Any]] = None,
+    ) -> Dict[str, BulkResult]:
+        results = {profile_id: BulkResult(profile_id) for profile_id in profile_ids}
+
+        def call(result: BulkResult) -> BulkResult:
+            if self.limiter is not None:
+                self.limiter.acquire("profile")
+            started = time.monotonic()
+            try:
+                operation(result.profile_id, result)
+                result.ok = True
+            except Exception as e:
+                log.debug("cookies of %s failed: %s", result.profile_id, e)
+                result.error = f"{type(e).__name__}: {e}"
+            result.seconds = time.monotonic() - started
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(call, result) for result in results.values()]
+            for future in as_completed(futures):
+                result = future.result()
+                if on_result is not None:
+                    with self._lock:
+                        on_result(result)
+        return results
+
+    def download(
+        self,
+        profile_ids: List[str],
+        directory: Optional[str] = None,
+        on_result: Optional[Callable[[BulkResult], Any]] = None,
+    ) -> Dict[str, BulkResult]:
+        # into <directory>/<profile_id>.json, or without a directory into the
+        # Cookies DB of each profile already extracted in tmpdir
+        gl = self.gologin
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        def to_file(profile_id: str, result: BulkResult) -> None:
+            assert directory is not None
+            path = os.path.join(directory, profile_id + ".json")
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                # streamed: a profile's cookies are never all in memory
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write("[")
+                    for cookie in gl.iter_cookies(profile_id):
+                        f.write(",\n" if result.cookies else "\n")
+                        json.dump(cookie, f)
+                        result.cookies += 1
+                    f.write("\n]\n")
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            result.path = path
+
+        def to_profile(profile_id: str, result: BulkResult) -> None:
+            manager = CookiesManager(
+                profile_id=profile_id, tmpdir=gl.tmpdir, merger=gl.cookiesMerger
+            )
+            path = manager.get_cookies_file_path()
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"no local Cookies DB at {path}")
+            # a running browser owns its Cookies DB
+            gl.profile_locks.check_launch(profile_id)
+            report = manager.write_cookies_to_file(
+                gl.iter_cookies(profile_id), batch_size=gl.cookies_batch_size
+            )
+            result.cookies = report.kept
+            result.path = path
+
+        return self.run(
+            profile_ids, to_profile if directory is None else to_file, on_result
+        )
+
+    def upload(
+        self,
+        profile_ids: List[str],
+        directory: Optional[str] = None,
+        cookies: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        on_result: Optional[Callable[[BulkResult], Any]] = None,
+    ) -> Dict[str, BulkResult]:
+        # from cookies[profile_id], <directory>/<profile_id>.json, or else
+        # the local Cookies DB of each profile
+        gl = self.gologin
+
+        def load(profile_id: str, result: BulkResult) -> List[Dict[str, Any]]:
+            if cookies is not None:
+                return cookies[profile_id]
+            if directory is not None:
+                result.path = os.path.join(directory, profile_id + ".json")
+                with open(result.path, "r", encoding="utf-8") as f:
+                    loaded: List[Dict[str, Any]] = json.load(f)
+                    return loaded
+            manager = CookiesManager(profile_id=profile_id, tmpdir=gl.tmpdir)
+            result.path = manager.get_cookies_file_path()
+            if not os.path.isfile(result.path):
+                raise FileNotFoundError(f"no local Cookies DB at {result.path}")
+            return manager.load_cookies_from_file()
+
+        def upload(profile_id: str, result: BulkResult) -> None:
+            items = load(profile_id, result)
+            response = gl.uploadCookies(items, profile_id)
+            response.raise_for_status()
+            result.cookies = len(items)
+
+        return self.run(profile_ids, upload, on_result)
+
+    def clear(
+        self,
+        profile_ids: List[str],
+        on_result: Optional[Callable[[BulkResult], Any]] = None,
+    ) -> Dict[str, BulkResult]:
+        gl = self.gologin
+
+        def clear(profile_id: str, result: BulkResult) -> None:
+            # not clearCookies(), which also flags gl's own profile for a
+            # local cleanup on its next start
+            response = gl.transport.post(
+                f"{gl.api_url}/browser/{profile_id}/cookies?cleanCookies=true",
+                name="clearCookies",
+                headers=gl.headers(),
+                json=[],
+            )
+            response.raise_for_status()
+
+        return self.run(profile_ids, clear, on_result)
@@ -0,0 +1,158 @@
+import base64
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+from urllib.parse import quote
+
+from .cookie import SELECT_COLUMNS, CookieBatch
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+PROFILE_PREFIX = "gologin_"
+
+# (profile_id, cookies, error)
+ExportResult = Tuple[str, List[Dict[str, Any]], Optional[str]]
+
+
+def find_cookies_file(profile_path: str) -> Optional[str]:
+    for parts in (("Default", "Cookies"), ("Default", "Network", "Cookies")):
+        path = os.path.join(profile_path, *parts)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def discover_profiles(tmpdir: str) -> Iterator[Tuple[str, str]]:
+    # yields (profile_id, cookies_path) for every gologin_<id> directory
+    with os.scandir(tmpdir) as entries:
+        for entry in entries:
+            if not entry.name.startswith(PROFILE_PREFIX) or not entry.is_dir():
+                continue
+            cookies_path = find_cookies_file(entry.path)
+            if cookies_path is not None:
+                yield entry.name[len(PROFILE_PREFIX) :], cookies_path
+
+
+def domain_clause(domains: Sequence[str]) -> Tuple[str, List[str]]:
+    # "example.com" matches example.com, .example.com and any subdomain
+    clauses = []
+    params: List[str] = []
+    for domain in domains:
+        domain = domain.lstrip(".").lower()
+        clauses.append("host_key = ? or host_key = ? or host_key like ?")
+        params += [domain, "." + domain, "%." + domain]
+    return " or ".join(clauses), params
+
+
+def read_cookies(
+    cookies_path: str, domains: Optional[Sequence[str]] = None
+) -> List[Dict[str, Any]]:
+    # immutable=1 skips locking and WAL recovery; the browser must not be
+    # writing to the file while it is read
+    uri = "file:" + quote(os.path.abspath(cookies_path)) + "?mode=ro&immutable=1"
+    query = f"select {', '.join(SELECT_COLUMNS)} from cookies"
+    params: List[str] = []
+    if domains:
+        where, params = domain_clause(domains)
+        query += " where " + where
+    db = sqlite3.connect(uri, uri=True)
+    try:
+        return CookieBatch.from_rows(db.execute(query, params)).to_api()
+    finally:
+        db.close()
+
+
+def export_profile(task: Tuple[str, str, Optional[Sequence[str]]]) -> ExportResult:
+    profile_id, cookies_path, domains = task
+    try:
+        return profile_id, read_cookies(cookies_path, domains), None
+    except Exception as e:
+        return profile_id, [], f"{e.__class__.__name__}: {e}"
+
+
+def json_default(value: Any) -> Any:
+    # Chrome-encrypted values are blobs
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    raise TypeError(f"{value.__class__.__name__} is not JSON serializable")
+
+
+class CookiesExporter:
+    def __init__(
+        self,
+        tmpdir: str,
+        domains: Optional[Sequence[str]] = None,
+        workers: Optional[int] = None,
+        chunksize: int = 32,
+        include_empty: bool = False,
+    ) -> None:
+        self.tmpdir = tmpdir
+        self.domains = list(domains) if domains else None
+        # 0 or 1 reads in this process
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.chunksize = chunksize
+        self.include_empty = include_empty
+
+    def profiles(self) -> List[Tuple[str, str]]:
+        return sorted(discover_profiles(self.tmpdir))
+
+    def results(
+        self, profiles: Optional[Iterable[Tuple[str, str]]] = None
+    ) -> Iterator[ExportResult]:
+        tasks = [
+            (profile_id, path, self.domains)
+            for profile_id, path in (self.profiles() if profiles is None else profiles)
+        ]
+        if self.workers <= 1 or len(tasks) <= 1:
+            results: Iterable[ExportResult] = map(export_profile, tasks)
+            yield from self._filter(results)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            yield from self._filter(
+                pool.map(export_profile, tasks, chunksize=self.chunksize)
+            )
+
+    def _filter(self, results: Iterable[ExportResult]) -> Iterator[ExportResult]:
+        for profile_id, cookies, error in results:
+            if error is not None:
+                log.warning("reading cookies of %s failed: %s", profile_id, error)
+            elif not cookies and not self.include_empty:
+                continue
+            yield profile_id, cookies, error
+
+    def export(
+        self,
+        out: Optional[TextIO] = None,
+        callback: Optional[Callable[[str, List[Dict[str, Any]]], Any]] = None,
+    ) -> Dict[str, int]:
+        # one NDJSON line per profile to out, and/or callback(profile_id, cookies)
+        stats = {"profiles": 0, "cookies": 0, "errors": 0}
+        for profile_id, cookies, error in self.results():
+            if error is not None:
+                stats["errors"] += 1
+            else:
+                stats["profiles"] += 1
+                stats["cookies"] += len(cookies)
+                if callback is not None:
+                    callback(profile_id, cookies)
+            if out is not None:
+                line: Dict[str, Any] = {"profile_id": profile_id, "cookies": cookies}
+                if error is not None:
+                    line["error"] = error
+                out.write(json.dumps(line, default=json_default) + "\n")
+        return stats
@@ -1,19 +1,22 @@
 import logging
 import sqlite3
-import base64
-from typing import Any, List, Dict, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import datetime
 import os
 from os import access, F_OK
 
-MAX_SQLITE_VARIABLES = 1
+from .cookie import (
+    INSERT_QUERY,
+    SAME_SITE,  # noqa: F401
+    SELECT_COLUMNS,
+    CookieBatch,
+    build_cookie_url,
+    ldap_to_unix,
+)
+from .cookiesMerger import CookiesMerger, MergeReport, to_unix_seconds
+from pygologin.jsonstream import batched
 
-SAME_SITE = {
-    -1: "unspecified",
-    0: "no_restriction",
-    1: "lax",
-    2: "strict",
-}
+MAX_SQLITE_VARIABLES = 1
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
@@ -44,6 +47,8 @@ class CookiesManager:
     def __init__(self, *args, **kwargs) -> None:
         self.profile_id = kwargs.get("profile_id")
         self.tmpdir = kwargs.get("tmpdir")
+        self.merger: CookiesMerger = kwargs.get("merger") or CookiesMerger()
+        self.last_merge_report: MergeReport = MergeReport()
 
     def get_db(self) -> sqlite3.Connection:
         database = self.get_cookies_file_path()
@@ -53,114 +58,17 @@ class CookiesManager:
     def get_chunked_insert_values(
         self, cookies_arr: List[Dict]
     ) -> List[Tuple[str, List]]:
-        today_unix = int(datetime.datetime.now().timestamp())
-        chunked_cookies_arr = [
-            cookies_arr[i : i + MAX_SQLITE_VARIABLES]
-            for i in range(0, len(cookies_arr), MAX_SQLITE_VARIABLES)
+        params = list(CookieBatch.from_dicts(cookies_arr).sqlite_params())
+        return [
+            (INSERT_QUERY, chunk) for chunk in self.chunk(params, MAX_SQLITE_VARIABLES)
         ]
 
-        # for cookies in chunked_cookies_arr:
-        # print('COOKIES::::::', cookies)
-        result = []
-
-        for cookies in chunked_cookies_arr:
-            query_placeholders = ", ".join(
-                ["(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"]
-                * len(cookies)
-            )
-            query = f"insert or replace into cookies (creation_utc, host_key, top_frame_site_key, name, value, encrypted_value, path, expires_utc, is_secure, is_httponly, last_access_utc, has_expires, is_persistent, priority, samesite, source_scheme, source_port, is_same_party, last_update_utc) values {query_placeholders}"
-
-            query_params = []
-            for cookie in cookies:
-                creation_date = cookie.get("creationDate", today_unix)
-                expiration_date = (
-                    0
-                    if cookie.get("session", False)
-                    else cookie.get("expirationDate", 0)
-                )
-                encrypted_value = cookie["value"]
-                samesite = next(
-                    key
-                    for key, value in SAME_SITE.items()
-                    if value == cookie.get("sameSite", "-1")
-                )
-                is_secure = (
-                    1
-                    if cookie["name"].startswith("__Host-")
-                    or cookie["name"].startswith("__Secure-")
-                    else int(cookie.get("secure", 0))
-                )
-                source_scheme = 2 if is_secure == 1 else 1
-                source_port = 443 if is_secure == 1 else 80
-                is_persistent = (
-                    0 if cookie.get("session") else 1 if expiration_date != 0 else 0
-                )
-
-                if (
-                    cookie.get("domain") == ".mail.google.com"
-                    and cookie["name"] == "COMPASS"
-                ):
-                    expiration_date = 0
-                    is_persistent = 0
-
-                query_params.append(
-                    (
-                        creation_date,
-                        cookie.get("domain", ""),
-                        "",  # top_frame_site_key
-                        cookie["name"],
-                        "",  # value
-                        encrypted_value,
-                        cookie.get("path", ""),
-                        expiration_date,
-                        is_secure,
-                        int(cookie.get("httpOnly", 0)),
-                        0,  # last_access_utc
-                        0 if expiration_date == 0 else 1,  # has_expires
-                        is_persistent,
-                        1,  # default priority value (https://github.com/chromium/chromium/blob/main/net/cookies/cookie_constants.h)
-                        samesite,
-                        source_scheme,
-                        source_port,
-                        0,  # is_same_party
-                        0,  # last_update_utc
-                    )
-                )
-
-            result.append((query, query_params))
-
-        return result
-
-    def load_cookies_from_file(self) -> List[Dict[str, Any]]:
+    def load_cookie_batch(self) -> CookieBatch:
         db = None
-        cookies = []
-
         try:
             db = self.get_db()
-            cookies_rows = db.execute("select * from cookies")
-            cookies_rows = cookies_rows.fetchall()
-            for row in cookies_rows:
-                row_data = dict(zip(COOKIE_ROW_COLUMN_NAMES, row))
-                cookies.append(
-                    {
-                        "url": self.build_cookie_url(
-                            row_data["host_key"],
-                            row_data["is_secure"],
-                            row_data["path"],
-                        ),
-                        "domain": row_data["host_key"],
-                        "name": row_data["name"],
-                        "value": row_data["encrypted_value"],
-                        "path": row_data["path"],
-                        "sameSite": SAME_SITE[row_data["samesite"]],
-                        "secure": bool(row_data["is_secure"]),
-                        "httpOnly": bool(row_data["is_httponly"]),
-                        "hostOnly": not row_data["host_key"].startswith("."),
-                        "session": not row_data["is_persistent"],
-                        "expirationDate": self.ldap_to_unix(row_data["expires_utc"]),
-                        "creationDate": self.ldap_to_unix(row_data["creation_utc"]),
-                    }
-                )
+            rows = db.execute(f"select {', '.join(SELECT_COLUMNS)} from cookies")
+            return CookieBatch.from_rows(rows)
         except Exception as error:
             log.exception("load_cookies_from_file %s", error)
             raise error
@@ -168,7 +76,8 @@ class CookiesManager:
             if db:
                 db.close()
 
-        return cookies
+    def load_cookies_from_file(self) -> List[Dict[str, Any]]:
+        return self.load_cookie_batch().to_api()
 
     def unix_to_ldap(self, unixtime: int) -> int:
         if unixtime == 0:
@@ -184,30 +93,10 @@ class CookiesManager:
         return int(sum_ * 1000000)
 
     def ldap_to_unix(self, ldap):
-        ldap_str = str(int(ldap))  # Convert to integer first to avoid decimals
-        ldap_length = len(ldap_str)
-
-        if ldap == 0 or ldap_length > 18:
-            return ldap
-
-        _ldap = ldap
-        if ldap_length < 18:
-            _ldap = int(
-                ldap_str + "0" * (18 - ldap_length)
-            )  # Padding zeros to the integer part
-
-        # Create a datetime object for January 1, 1601
-        win32_epoch = datetime.datetime(1601, 1, 1, tzinfo=datetime.timezone.utc)
-        # Convert this to a Unix timestamp in milliseconds
-        win32filetime_epoch = int(win32_epoch.timestamp() * 1000)
-
-        return (_ldap / 10000 + win32filetime_epoch) / 1000
+        return ldap_to_unix(ldap)
 
     def build_cookie_url(self, domain: str, secure: bool, path: str) -> str:
-        domain_without_dot = domain[1:] if domain.startswith(".") else domain
-        protocol = "https://" if secure else "http://"
-
-        return protocol + domain_without_dot + path
+        return build_cookie_url(domain, secure, path)
 
     def chunk(self, arr: List, chunk_size: int = 1) -> List[List]:
         if chunk_size <= 0:
@@ -234,39 +123,94 @@ class CookiesManager:
 
         return base_cookies_file_path
 
-    def write_cookies_to_file(self, cookies) -> None:
-        log.debug("write_cookies_to_file")
-        result_cookies = [
-            {"value": base64.b64encode(cookie["value"].encode()), **cookie}
-            for cookie in cookies  # plain
-            # {
-            #     **cookie,
-            #     "value": base64.b64encode(bytearray(cookie["value"]["data"])).decode('utf-8')
-            # } for cookie in cookies # encrypted
-        ]
+    def local_creation_dates(
+        self, db: sqlite3.Connection
+    ) -> Dict[Tuple[str, str, str, str], float]:
+        return {
+            (host_key, name, path, top_frame_site_key or ""): to_unix_seconds(created)
+            for host_key, name, path, top_frame_site_key, created in db.execute(
+                "select host_key, name, path, top_frame_site_key, creation_utc from cookies"
+            )
+        }
+
+    def drop_stale_cookies(
+        self,
+        db: sqlite3.Connection,
+        cookies: List[Dict],
+        report: MergeReport,
+        local: Optional[Dict[Tuple[str, str, str, str], float]] = None,
+    ) -> List[Dict]:
+        # a local cookie created after the server copy is the newer one;
+        # local is updated with the kept cookies so later batches see them
+        if local is None:
+            local = self.local_creation_dates(db)
+        result = []
+        for cookie in cookies:
+            key = (
+                cookie.get("domain", ""),
+                cookie["name"],
+                cookie.get("path", ""),
+                cookie.get("topFrameSiteKey", ""),
+            )
+            created = to_unix_seconds(cookie.get("creationDate"))
+            if key in local and created and local[key] > created:
+                report.stale += 1
+                continue
+            local[key] = created
+            result.append(cookie)
+        return result
 
+    def compact_local_cookies(
+        self, db: sqlite3.Connection, report: MergeReport
+    ) -> None:
+        now = self.merger.current_time()
+        expired = []
+        session = []
+        for rowid, expires_utc, is_persistent in db.execute(
+            "select rowid, expires_utc, is_persistent from cookies"
+        ):
+            if not is_persistent or not expires_utc:
+                if self.merger.drop_session:
+                    session.append((rowid,))
+            elif self.merger.drop_expired and to_unix_seconds(expires_utc) < now:
+                expired.append((rowid,))
+        db.executemany("delete from cookies where rowid = ?", expired + session)
+        report.expired += len(expired)
+        report.session += len(session)
+
+    def write_cookies_to_file(
+        self, cookies: Iterable[Dict], batch_size: int = 1000
+    ) -> MergeReport:
+        # cookies may be any iterable (e.g. GoLogin.iter_cookies()); it is
+        # merged and written batch_size cookies at a time in one transaction
+        log.debug("write_cookies_to_file")
+        report = MergeReport()
+        local = None
         db = self.get_db()
-        cursor = db.cursor()
 
         try:
-            if result_cookies:
-                chunk_insert_values = self.get_chunked_insert_values(result_cookies)
-                for query, query_params in chunk_insert_values:
-                    for params in query_params:
-                        cursor.execute(query, params)
-                        # res = cursor.execute(query, params)
+            for chunk in batched(cookies, batch_size):
+                if local is None:
+                    self.compact_local_cookies(db, report)
+                    local = self.local_creation_dates(db)
+                merged, chunk_report = self.merger.merge(chunk)
+                merged = self.drop_stale_cookies(db, merged, chunk_report, local)
+                chunk_report.kept = len(merged)
+                report.add(chunk_report)
+                db.executemany(
+                    INSERT_QUERY, CookieBatch.from_dicts(merged).sqlite_params()
+                )
 
-            else:
-                query = "delete from cookies"
-                cursor.execute(query)
+            if local is None:
+                # the server has no cookies for this profile
+                db.execute("delete from cookies")
 
             db.commit()
-            db.close()
-            self.load_cookies_from_file()
-            db.close()
+            log.debug("cookies compacted %s", report)
+            self.last_merge_report = report
+            return report
         except Exception as error:
             log.exception("write_cookies_to_file exception: %s", error)
             raise error
         finally:
-            if db:
-                db.close()
+            db.close()
@@ -0,0 +1,127 @@
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# Chrome stores times as microseconds since 1601-01-01
+WINDOWS_EPOCH_OFFSET = 11644473600
+CHROME_TIME_THRESHOLD = 10**14
+
+CookieKey = Tuple[str, str, str, str]
+
+
+def to_unix_seconds(value: Any) -> float:
+    # Cookies written by Chrome use Windows epoch microseconds, the ones this
+    # package writes (and the API returns) use unix seconds.
+    if not value:
+        return 0.0
+    seconds = float(value)
+    if seconds > CHROME_TIME_THRESHOLD:
+        return seconds / 1000000 - WINDOWS_EPOCH_OFFSET
+    return seconds
+
+
+def cookie_key(cookie: Dict[str, Any]) -> CookieKey:
+    return (
+        cookie.get("domain", ""),
+        cookie.get("name", ""),
+        cookie.get("path", ""),
+        cookie.get("topFrameSiteKey", ""),
+    )
+
+
+class MergeReport:
+    def __init__(self) -> None:
+        self.received = 0
+        self.kept = 0
+        self.duplicates = 0
+        self.expired = 0
+        self.session = 0
+        self.stale = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.duplicates + self.expired + self.session + self.stale
+
+    def add(self, other: "MergeReport") -> None:
+        self.received += other.received
+        self.kept += other.kept
+        self.duplicates += other.duplicates
+        self.expired += other.expired
+        self.session += other.session
+        self.stale += other.stale
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "received": self.received,
+            "kept": self.kept,
+            "duplicates": self.duplicates,
+            "expired": self.expired,
+            "session": self.session,
+            "stale": self.stale,
+        }
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={v}" for k, v in self.as_dict().items())
+        return f"MergeReport({fields})"
+
+
+class CookiesMerger:
+    def __init__(
+        self,
+        drop_expired: bool = True,
+        drop_session: bool = False,
+        now: Optional[float] = None,
+    ) -> None:
+        self.drop_expired = drop_expired
+        self.drop_session = drop_session
+        self.now = now
+
+    def current_time(self) -> float:
+        return time.time() if self.now is None else self.now
+
+    def is_session(self, cookie: Dict[str, Any]) -> bool:
+        return bool(cookie.get("session")) or not cookie.get("expirationDate")
+
+    def is_expired(self, cookie: Dict[str, Any], now: float) -> bool:
+        if self.is_session(cookie):
+            return False
+        return to_unix_seconds(cookie.get("expirationDate")) < now
+
+    def dropped_by_policy(
+        self, cookie: Dict[str, Any], now: float, report: MergeReport
+    ) -> bool:
+        if self.drop_session and self.is_session(cookie):
+            report.session += 1
+            return True
+        if self.drop_expired and self.is_expired(cookie, now):
+            report.expired += 1
+            return True
+        return False
+
+    def merge(
+        self, *sources: Iterable[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], MergeReport]:
+        # Later sources win ties, so pass local cookies before server ones.
+        report = MergeReport()
+        now = self.current_time()
+        merged: Dict[CookieKey, Dict[str, Any]] = {}
+        for source in sources:
+            for cookie in source:
+                report.received += 1
+                if self.dropped_by_policy(cookie, now, report):
+                    continue
+                key = cookie_key(cookie)
+                current = merged.get(key)
+                if current is not None:
+                    report.duplicates += 1
+                    if to_unix_seconds(cookie.get("creationDate")) < to_unix_seconds(
+                        current.get("creationDate")
+                    ):
+                        continue
+                merged[key] = cookie
+        report.kept = len(merged)
+        log.debug("cookies merged %s", report)
+        return list(merged.values()), report
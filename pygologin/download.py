@@ -0,0 +1,308 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests import Response
+
+from pygologin.exceptions import DownloadError
+from pygologin.instrumentation import count_retry
+from pygologin.transport import Transport
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+CHUNK_SIZE = 256 * 1024
+SEGMENT_THRESHOLD = 32 * 1024 * 1024
+
+CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+UNSATISFIABLE_RANGE_RE = re.compile(r"bytes \*/(\d+)")
+
+STREAM_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+def parse_content_range(value: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    match = CONTENT_RANGE_RE.match(value or "")
+    if match is None or match.group(3) == "*":
+        return None
+    return int(match.group(1)), int(match.group(2)), int(match.group(3))
+
+
+def expected_checksum(response: Response) -> Optional[Tuple[str, str]]:
+    sha256 = response.headers.get("X-Checksum-Sha256")
+    if sha256:
+        return "sha256", sha256.lower()
+    # Content-MD5 covers the body sent, only a slice of the object on a 206
+    md5 = response.headers.get("Content-MD5")
+    if md5 and response.status_code == 200:
+        return "md5", base64.b64decode(md5).hex()
+    return None
+
+
+def response_validator(response: Response) -> Optional[str]:
+    # If-Range needs a strong validator; weak ETags do not qualify
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def file_digest(path: str, algorithm: str) -> str:
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RangedDownload:
+    def __init__(
+        self,
+        transport: Transport,
+        url: str,
+        path: str,
+        headers: Optional[Dict[str, str]] = None,
+        endpoint: str = "files_gateway",
+        retries: Optional[int] = None,
+        segments: int = 1,
+        segment_threshold: int = SEGMENT_THRESHOLD,
+        expect_zip: bool = True,
+    ) -> None:
+        self.transport = transport
+        self.url = url
+        self.path = path
+        self.part_path = path + ".part"
+        # the ETag or Last-Modified of the object the .part file came from,
+        # and the checksum of the whole object from its first response
+        self.validator_path = path + ".part.validator"
+        self.headers = dict(headers or {})
+        self.endpoint = endpoint
+        self.retries = transport.retries if retries is None else retries
+        self.segments = max(1, segments)
+        self.segment_threshold = segment_threshold
+        self.expect_zip = expect_zip
+        self.total: Optional[int] = None
+        self.checksum: Optional[Tuple[str, str]] = None
+        self.validator: Optional[str] = None
+        self.resumed = 0
+
+    def _get(self, start: int = 0, end: Optional[int] = None) -> Response:
+        headers = dict(self.headers)
+        if start or end is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+            if self.validator:
+                # a newer version of the object comes back whole instead of
+                # having its tail spliced onto the old partial
+                headers["If-Range"] = self.validator
+        return self.transport.get(
+            self.url, endpoint=self.endpoint, headers=headers, stream=True
+        )
+
+    def _load_validator(self) -> Optional[str]:
+        try:
+            with open(self.validator_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            checksum = state.get("checksum")
+            self.checksum = (str(checksum[0]), str(checksum[1])) if checksum else None
+            return str(state["validator"]) or None
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            return None
+
+    def _save_validator(self, response: Response) -> None:
+        self.validator = response_validator(response)
+        if self.validator is None:
+            self._remove(self.validator_path)
+            return
+        with open(self.validator_path, "w", encoding="utf-8") as f:
+            json.dump({"validator": self.validator, "checksum": self.checksum}, f)
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def run(self) -> int:
+        offset = (
+            os.path.getsize(self.part_path) if os.path.exists(self.part_path) else 0
+        )
+        if offset:
+            self.validator = self._load_validator()
+            if self.validator is None:
+                # nothing tells which version of the object it belongs to
+                log.debug("discarding %s without a validator", self.part_path)
+                self._remove(self.part_path)
+                offset = 0
+            else:
+                log.debug("resuming %s at %d bytes", self.url, offset)
+                self.resumed += 1
+
+        attempt = 0
+        while True:
+            try:
+                offset = self._fetch(offset)
+            except STREAM_ERRORS as e:
+                offset = (
+                    os.path.getsize(self.part_path)
+                    if os.path.exists(self.part_path)
+                    else 0
+                )
+                if attempt >= self.retries:
+                    raise DownloadError(
+                        f"download interrupted at {offset} bytes: {e}"
+                    ) from e
+                log.debug("download interrupted at %d bytes: %s", offset, e)
+                count_retry()
+                time.sleep(self.transport.backoff(attempt))
+                attempt += 1
+                self.resumed += 1
+                continue
+
+            if self.total is None or offset >= self.total:
+                break
+            if attempt >= self.retries:
+                raise DownloadError(f"download stopped at {offset}/{self.total} bytes")
+            count_retry()
+            attempt += 1
+            self.resumed += 1
+
+        self.verify(offset)
+        os.replace(self.part_path, self.path)
+        self._remove(self.validator_path)
+        return offset
+
+    def _fetch(self, offset: int) -> int:
+        response = self._get(offset)
+        if response.status_code == 416:
+            with response:
+                match = UNSATISFIABLE_RANGE_RE.match(
+                    response.headers.get("Content-Range", "")
+                )
+            if match and int(match.group(1)) == offset:
+                # the part file already holds everything the server has
+                self.total = offset
+                return offset
+            # past the end of the object: stale, start over with a full GET
+            log.debug("discarding %s at %d bytes", self.part_path, offset)
+            self._remove(self.part_path)
+            self.validator = None
+            return self._fetch(0)
+
+        with response:
+            response.raise_for_status()
+
+            if self.checksum is None:
+                self.checksum = expected_checksum(response)
+
+            if response.status_code == 206:
+                content_range = parse_content_range(
+                    response.headers.get("Content-Range")
+                )
+                if content_range is None or content_range[0] != offset:
+                    raise DownloadError(
+                        "unexpected Content-Range "
+                        f"{response.headers.get('Content-Range')!r} for offset {offset}"
+                    )
+                self.total = content_range[2]
+                mode = "ab"
+            else:
+                # full body; any partial data we had is stale
+                length = response.headers.get("Content-Length")
+                self.total = int(length) if length is not None else None
+                offset = 0
+                mode = "wb"
+                self.checksum = expected_checksum(response)
+                self._save_validator(response)
+                if (
+                    self.segments > 1
+                    and self.total is not None
+                    and self.total >= self.segment_threshold
+                    and response.headers.get("Accept-Ranges") == "bytes"
+                ):
+                    response.close()
+                    return self._fetch_segments(self.total)
+
+            with open(self.part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    offset += len(chunk)
+        return offset
+
+    def _fetch_segments(self, total: int) -> int:
+        size = -(-total // self.segments)
+        bounds = [
+            (start, min(start + size, total) - 1) for start in range(0, total, size)
+        ]
+        # segments land in a sparse file of their own; only a complete one
+        # becomes the .part file, so a crash never leaves holes to resume
+        segments_path = self.path + ".segments"
+        with open(segments_path, "wb") as f:
+            f.truncate(total)
+
+        errors: List[BaseException] = []
+
+        def fetch(start: int, end: int) -> None:
+            position = start
+            attempt = 0
+            while position <= end:
+                try:
+                    response = self._get(position, end)
+                    with response, open(segments_path, "r+b") as f:
+                        if response.status_code != 206:
+                            raise DownloadError(
+                                f"segment {start}-{end}: HTTP {response.status_code}"
+                            )
+                        f.seek(position)
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            f.write(chunk)
+                            position += len(chunk)
+                    if position <= end:
+                        raise DownloadError(f"segment {start}-{end} ended early")
+                except (DownloadError,) + STREAM_ERRORS as e:
+                    if attempt >= self.retries:
+                        errors.append(e)
+                        return
+                    count_retry()
+                    time.sleep(self.transport.backoff(attempt))
+                    attempt += 1
+
+        threads = [
+            threading.Thread(target=fetch, args=bound, name=f"segment-{bound[0]}")
+            for bound in bounds
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            os.remove(segments_path)
+            raise DownloadError(f"segmented download failed: {errors[0]}")
+        os.replace(segments_path, self.part_path)
+        log.debug("downloaded %d bytes in %d segments", total, len(bounds))
+        return total
+
+    def verify(self, size: int) -> None:
+        if self.total is not None and size != self.total:
+            raise DownloadError(f"size mismatch: got {size}, expected {self.total}")
+        if self.checksum is not None:
+            algorithm, expected = self.checksum
+            actual = file_digest(self.part_path, algorithm)
+            if actual != expected:
+                os.remove(self.part_path)
+                self._remove(self.validator_path)
+                raise DownloadError(f"{algorithm} mismatch: {actual} != {expected}")
+        if self.expect_zip and size and not zipfile.is_zipfile(self.part_path):
+            os.remove(self.part_path)
+            self._remove(self.validator_path)
+            raise DownloadError("downloaded file is not a zip archive")
@@ -0,0 +1,249 @@
+import collections
+import gzip
+import json
+import logging
+import os
+import threading
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional
+
+from pygologin.instrumentation import OUTCOME_ERROR, PHASES, Span, percentile
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# createStartup() fetches the profile exactly once per start()
+START_PHASE = "getProfile"
+
+
+class EventLog:
+    # an instrumentation sink that appends one JSON object per span to a
+    # JSONL file, e.g. {"phase": "download", "profile_id": ..., "start": ...,
+    # "end": ..., "bytes": ..., "retries": ..., "outcome": ..., "error": ...,
+    # "depth": ...}; depth counts the spans it ran inside
+    def __init__(
+        self, path: str, max_bytes: Optional[int] = None, backups: int = 3
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.pid = os.getpid()
+        self._file: Optional[IO[str]] = None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def on_span(self, span: Span) -> None:
+        self.write(span.as_dict())
+
+    def write(self, event: Dict[str, Any]) -> None:
+        line = json.dumps({**event, "pid": self.pid}, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._open()
+            elif self.max_bytes and self._size + len(line) > self.max_bytes:
+                self._rotate()
+            assert self._file is not None
+            self._file.write(line)
+            self._size += len(line)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # line buffered, so a crash loses at most the event being written
+        self._file = open(self.path, "a", buffering=1, encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _rotate(self) -> None:
+        assert self._file is not None
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, self.path + ".1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_events(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # a line cut short by a crash or a rotation
+                    log.debug("skipping malformed line %s:%d", path, number)
+                    continue
+                if isinstance(event, dict) and "phase" in event:
+                    yield event
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    values.sort()
+    return {
+        "p50": percentile(values, 50, is_sorted=True),
+        "p95": percentile(values, 95, is_sorted=True),
+        "p99": percentile(values, 99, is_sorted=True),
+        "max": values[-1] if values else 0.0,
+    }
+
+
+def analyze(events: Iterable[Dict[str, Any]], top: int = 10) -> Dict[str, Any]:
+    durations: Dict[str, List[float]] = collections.defaultdict(list)
+    errors: Dict[str, "collections.Counter[str]"] = collections.defaultdict(
+        collections.Counter
+    )
+    phase_bytes: Dict[str, int] = collections.Counter()
+    phase_retries: Dict[str, int] = collections.Counter()
+    profile_seconds: Dict[str, float] = collections.defaultdict(float)
+    profile_starts: Dict[str, int] = collections.Counter()
+    profile_errors: Dict[str, int] = collections.Counter()
+    profile_proxy: Dict[str, str] = {}
+    proxy_durations: Dict[str, List[float]] = collections.defaultdict(list)
+    first = last = None
+    count = 0
+
+    for event in events:
+        count += 1
+        phase = event["phase"]
+        start = float(event.get("start") or 0)
+        end = float(event.get("end") or start)
+        duration = float(event.get("duration", end - start))
+        first = start if first is None else min(first, start)
+        last = end if last is None else max(last, end)
+        durations[phase].append(duration)
+        phase_bytes[phase] += int(event.get("bytes") or 0)
+        phase_retries[phase] += int(event.get("retries") or 0)
+        failed = event.get("outcome") == OUTCOME_ERROR
+        if failed:
+            errors[phase][event.get("error") or "unknown"] += 1
+        profile_id = event.get("profile_id")
+        if profile_id:
+            # nested phases are already part of their parent's duration
+            if not event.get("depth"):
+                profile_seconds[profile_id] += duration
+            profile_errors[profile_id] += failed
+            if phase == START_PHASE:
+                profile_starts[profile_id] += 1
+        proxy = event.get("proxy")
+        if proxy:
+            proxy_durations[proxy].append(duration)
+            if profile_id:
+                profile_proxy[profile_id] = proxy
+
+    window = (last - first) if first is not None and last is not None else 0.0
+    starts = sum(profile_starts.values())
+    order = {phase: index for index, phase in enumerate(PHASES)}
+    phases = {}
+    for phase in sorted(durations, key=lambda p: (order.get(p, len(order)), p)):
+        phases[phase] = {
+            "count": len(durations[phase]),
+            "errors": sum(errors[phase].values()),
+            **_distribution(durations[phase]),
+            "bytes": phase_bytes[phase],
+            "retries": phase_retries[phase],
+            "error_classes": dict(errors[phase].most_common()),
+        }
+
+    per_start = {
+        profile_id: seconds / max(1, profile_starts[profile_id])
+        for profile_id, seconds in profile_seconds.items()
+    }
+    slowest_profiles = [
+        {
+            "profile_id": profile_id,
+            "seconds_per_start": per_start[profile_id],
+            "starts": profile_starts[profile_id],
+            "errors": profile_errors[profile_id],
+            "proxy": profile_proxy.get(profile_id),
+        }
+        for profile_id in sorted(per_start, key=per_start.__getitem__, reverse=True)[
+            :top
+        ]
+    ]
+
+    # the API only sees a proxy through timezone lookups; what a slow proxy
+    # costs shows in the per-start time of the profiles behind it
+    proxies = []
+    for proxy, values in proxy_durations.items():
+        profiles = [p for p, used in profile_proxy.items() if used == proxy]
+        proxies.append(
+            {
+                "proxy": proxy,
+                "profiles": len(profiles),
+                "requests": len(values),
+                **_distribution(values),
+                "seconds_per_start": (
+                    sum(per_start[p] for p in profiles) / len(profiles)
+                    if profiles
+                    else 0.0
+                ),
+            }
+        )
+    proxies.sort(
+        key=lambda item: (item["seconds_per_start"], item["p95"]), reverse=True
+    )
+
+    return {
+        "events": count,
+        "window": window,
+        "starts": starts,
+        "starts_per_second": starts / window if window > 0 else 0.0,
+        "errors": sum(sum(counter.values()) for counter in errors.values()),
+        "phases": phases,
+        "slowest_profiles": slowest_profiles,
+        "slowest_proxies": proxies[:top],
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{report['events']} events over {report['window']:.1f}s: "
+        f"{report['starts']} starts ({report['starts_per_second']:.2f}/s), "
+        f"{report['errors']} errors",
+        "",
+        f"{'phase':<18}{'count':>8}{'errors':>8}{'p50':>9}{'p95':>9}{'p99':>9}"
+        f"{'retries':>9}{'MiB':>10}",
+    ]
+    for phase, stats in report["phases"].items():
+        lines.append(
+            f"{phase:<18}{stats['count']:>8}{stats['errors']:>8}"
+            f"{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}"
+            f"{stats['retries']:>9}{stats['bytes'] / 2**20:>10.1f}"
+        )
+        for error, error_count in stats["error_classes"].items():
+            lines.append(f"  {error}: {error_count}")
+    if report["slowest_profiles"]:
+        lines += ["", "slowest profiles (seconds per start):"]
+        for item in report["slowest_profiles"]:
+            proxy = f" via {item['proxy']}" if item["proxy"] else ""
+            lines.append(
+                f"  {item['profile_id']}  {item['seconds_per_start']:.2f}s"
+                f"  {item['starts']} starts, {item['errors']} errors{proxy}"
+            )
+    if report["slowest_proxies"]:
+        lines += [
+            "",
+            "slowest proxies (seconds per start of their profiles, "
+            "p50/p95 of timezone lookups through them):",
+        ]
+        for item in report["slowest_proxies"]:
+            lines.append(
+                f"  {item['proxy']}  {item['seconds_per_start']:.2f}s"
+                f"  {item['p50']:.3f}s/{item['p95']:.3f}s"
+                f"  {item['requests']} lookups, {item['profiles']} profiles"
+            )
+    return "\n".join(lines)
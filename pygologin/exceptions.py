@@ -9,3 +9,31 @@ class ProtocolException(Exception):
     @property
     def json(self) -> Dict[str, Any]:
         return self._json
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ProfileInUseError(Exception):
+    pass
+
+
+class CommitPendingError(ProfileInUseError):
+    pass
+
+
+class UploadError(Exception):
+    pass
+
+
+class AgentError(Exception):
+    pass
+
+
+class ProxyError(Exception):
+    pass
+
+
+class LeaseLostError(Exception):
+    pass
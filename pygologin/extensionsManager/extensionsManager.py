@@ -1,9 +1,11 @@
 import os
-import requests
-import urllib.request
 import pathlib
 import zipfile
 from sys import platform
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pygologin.transport import Transport
 
 HOMEDIR = pathlib.Path.home()
 CHROME_EXT_DIR_NAME = "chrome-extensions"
@@ -13,9 +15,12 @@ EXTENSION_URL = "https://clients2.google.com/service/update2/crx?response=redire
 
 
 class ExtensionsManager:
+    def __init__(self, transport: "Transport") -> None:
+        self.transport = transport
+
     def downloadExt(self, ids=[]):
         extUrl = EXTENSION_URL.replace("{ext_id}", ids)
-        uploadedProfileMetadata = getExtMetadata(extUrl)
+        uploadedProfileMetadata = getExtMetadata(extUrl, self.transport)
 
         reqPath = uploadedProfileMetadata["Location"]
         extVer = getExtVersion(reqPath)
@@ -27,7 +32,11 @@ class ExtensionsManager:
         else:
             fileName = ids + "@" + extVer + ".crx"
             pathExt = os.path.join(CHROME_EXTENSIONS_PATH, fileName)
-            urllib.request.urlretrieve(extUrl, pathExt)
+            response = self.transport.get(extUrl, endpoint="extensions", stream=True)
+            response.raise_for_status()
+            with open(pathExt, "wb") as crx:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    crx.write(chunk)
 
             f = open(pathExt, "rb")
             r = f.read()
@@ -94,8 +103,8 @@ def calcLength(a, b, c, d):
     return length
 
 
-def getExtMetadata(extUrl):
-    x = requests.head(extUrl)
+def getExtMetadata(extUrl, transport: "Transport"):
+    x = transport.head(extUrl, endpoint="extensions", allow_redirects=False)
 
     return x.headers
 
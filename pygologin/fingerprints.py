@@ -0,0 +1,105 @@
+import collections
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+Fingerprint = Dict[str, Any]
+
+
+class FingerprintPool:
+    # keeps up to size fingerprints per os type fetched ahead of create();
+    # each fingerprint is handed out once
+    def __init__(
+        self,
+        fetch: Callable[[str], Fingerprint],
+        size: int = 8,
+        low_water: Optional[int] = None,
+        workers: int = 2,
+    ) -> None:
+        self.fetch = fetch
+        self.size = size
+        self.low_water = max(1, size // 2) if low_water is None else low_water
+        self.workers = workers
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._ready: Dict[str, Deque[Fingerprint]] = collections.defaultdict(
+            collections.deque
+        )
+        self._pending: Dict[str, int] = collections.defaultdict(int)
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+
+    def get(self, os_type: str = "lin") -> Fingerprint:
+        with self._lock:
+            ready = self._ready[os_type]
+            fingerprint = ready.popleft() if ready else None
+            if fingerprint is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self._refill(os_type)
+        if fingerprint is None:
+            fingerprint = self.fetch(os_type)
+        return fingerprint
+
+    def prefill(self, os_types: Iterable[str] = ("lin",)) -> None:
+        for os_type in os_types:
+            self._refill(os_type, force=True)
+
+    def available(self, os_type: str = "lin") -> int:
+        with self._lock:
+            return len(self._ready[os_type])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "ready": {os_type: len(q) for os_type, q in self._ready.items()},
+                "pending": dict(self._pending),
+            }
+
+    def _refill(self, os_type: str, force: bool = False) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            queued = len(self._ready[os_type]) + self._pending[os_type]
+            if queued >= self.size or (not force and queued >= self.low_water):
+                return
+            missing = self.size - queued
+            self._pending[os_type] += missing
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="pygologin-fingerprints",
+                )
+            pool = self._pool
+        for _ in range(missing):
+            pool.submit(self._prefetch, os_type)
+
+    def _prefetch(self, os_type: str) -> None:
+        try:
+            fingerprint = self.fetch(os_type)
+        except Exception as e:
+            log.debug("prefetching a %s fingerprint failed: %s", os_type, e)
+            with self._lock:
+                self._pending[os_type] -= 1
+                self.errors += 1
+            return
+        with self._lock:
+            self._pending[os_type] -= 1
+            self._ready[os_type].append(fingerprint)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
@@ -1,26 +1,45 @@
+import copy
 import json
 import time
 import os
 import stat
 import sys
 import shutil
-from typing import Any, Dict, List, Union
-import requests
-import zipfile
-import subprocess
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Tuple, Union
 import pathlib
 import tempfile
 import math
 import socket
 import random
-import psutil
 import logging
 
-from requests import Response
-
-from pygologin.cookiesManager.cookiesManager import CookiesManager
-from pygologin.exceptions import ProtocolException
-from pygologin.extensionsManager.extensionsManager import ExtensionsManager
+from pygologin.cookiesManager.cookiesMerger import CookiesMerger
+from pygologin.exceptions import ProtocolException, ProxyError, UploadError
+from pygologin.instrumentation import Instrumentation
+from pygologin.proxies import profile_proxy, proxy_key, proxy_url
+from pygologin.staging import FileLock, ProfileLocks, replace_tree, staging_dir
+from pygologin.workspace import Workspace
+
+# requests, psutil, zipfile, subprocess and sqlite3 are imported where they
+# are used, so API-only callers do not pay for them at import time
+if TYPE_CHECKING:
+    import zipfile
+
+    from requests import Response
+
+    from pygologin.agent import AgentClient
+    from pygologin.cache import TTLCache
+    from pygologin.committer import Committer, CommitJob
+    from pygologin.cookiesManager.cookiesBulk import BulkResult
+    from pygologin.eventlog import EventLog
+    from pygologin.fingerprints import FingerprintPool
+    from pygologin.isolation import Isolation, Placement
+    from pygologin.leases import Lease, LeaseCoordinator
+    from pygologin.proxies import ProbeResult, ProxyProber
+    from pygologin.ratelimit import RateLimiter
+    from pygologin.staging import Flight
+    from pygologin.supervisor import Supervisor
+    from pygologin.transport import Transport
 
 
 API_URL = "https://api.gologin.com"
@@ -28,11 +47,194 @@ PROFILES_URL = "https://gprofiles-new.gologin.com/"
 GET_TIMEZONE_URL = "https://geo.myip.link"
 FILES_GATEWAY = "https://files-gateway.gologin.com"
 
+# helpers many GoLogin instances in one process should share rather than
+# each build their own pools and threads (see Runner and Agent)
+SHARED_ATTRIBUTES = (
+    "transport",
+    "instrumentation",
+    "event_log",
+    "workspace",
+    "profile_locks",
+    "profile_cache",
+    "timezone_cache",
+    "committer",
+    "supervisor",
+    "isolation",
+    "fingerprint_pool",
+    "leases",
+    "proxy_prober",
+)
+# what close() calls on each helper this instance built itself
+CLOSE_METHODS = (
+    ("committer", "join"),
+    ("supervisor", "stop"),
+    ("leases", "close"),
+    ("fingerprint_pool", "close"),
+    ("proxy_prober", "close"),
+    ("workspace", "stop_sweeper"),
+    ("event_log", "close"),
+    ("transport", "close"),
+)
+
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
 
 
+class PendingCommit:
+    # what zip, upload and cleanup of one profile need, taken when stop()
+    # queues the commit; the GoLogin instance may start another profile
+    # before the committer gets to it
+    def __init__(self, gl: "GoLogin", profile_id: str) -> None:
+        self.profile_id = profile_id
+        self.profile_path = os.path.join(gl.tmpdir, "gologin_" + profile_id)
+        self.profile_default_folder_path = os.path.join(self.profile_path, "Default")
+        self.profile_zip_path_upload = os.path.join(
+            gl.tmpdir, "gologin_" + profile_id + "_upload.zip"
+        )
+        self.local = gl.local
+        self.cleaningLocalCookies = gl.cleaningLocalCookies
+        self.access_token = gl.access_token
+        self.files_gateway = gl.files_gateway
+        current = profile_id == gl.profile_id
+        self.lease = gl.lease if current else None
+        self.workspace_lock = gl.workspace_lock if current else None
+        # helpers shared with the instance, safe to use from other threads
+        self.transport = gl.transport
+        self.instrumentation = gl.instrumentation
+        self.profile_locks = gl.profile_locks
+        self.leases = gl.leases
+        self.workspace = gl.workspace
+
+    def commitAndCleanup(self, strict: bool = False) -> None:
+        with self.profile_locks.flight(self.profile_id) as flight:
+            if strict and not os.path.isdir(self.profile_path):
+                # cleaned up before a crash lost the state file's removal;
+                # zipping nothing would upload an empty profile
+                log.warning("nothing to commit for %s", self.profile_id)
+                return
+            with self.instrumentation.span("sanitize", self.profile_id):
+                self.sanitizeProfile()
+            if self.local is False:
+                if self.lease is not None and self.leases is not None:
+                    # raises LeaseLostError if another host took the profile
+                    # over before the upload starts. The upload itself is not
+                    # fenced: the storage API knows nothing of leases, so a
+                    # lease that runs out during the upload goes unnoticed
+                    self.leases.renew(self.profile_id)
+                if not self.commitProfile() and strict:
+                    # keep the profile for the next attempt
+                    raise UploadError(f"uploading profile {self.profile_id} failed")
+                with self.instrumentation.span("cleanup", self.profile_id):
+                    os.remove(self.profile_zip_path_upload)
+                    shutil.rmtree(self.profile_path)
+                flight.invalidate()
+
+    def releaseWorkspace(self) -> None:
+        if self.workspace_lock is not None:
+            self.workspace.release(self.workspace_lock, self.profile_id)
+            self.workspace_lock = None
+            self.workspace.evict()
+
+    def releaseLease(self) -> None:
+        if self.lease is not None and self.leases is not None:
+            self.leases.release(self.profile_id)
+            self.lease = None
+
+    def commitProfile(self) -> bool:
+        import zipfile
+
+        log.debug("commitProfile")
+        with self.instrumentation.span("zip", self.profile_id) as span:
+            zipf = zipfile.ZipFile(
+                self.profile_zip_path_upload, "w", zipfile.ZIP_DEFLATED
+            )
+            self.zipdir(self.profile_default_folder_path, zipf)
+            zipf.writestr("First Run", "")
+            zipf.close()
+            if span.active:
+                span.add_bytes(os.path.getsize(self.profile_zip_path_upload))
+
+        if self.access_token is None:
+            raise ValueError("access_token is None")
+
+        headers = {
+            "Authorization": "Bearer " + self.access_token,
+            "User-Agent": "Selenium-API",
+            "Content-Type": "application/zip",
+            "browserId": self.profile_id,
+        }
+
+        with self.instrumentation.span("upload", self.profile_id) as span:
+            with open(self.profile_zip_path_upload, "rb") as data:
+                response = self.transport.put(
+                    self.files_gateway + "/upload",
+                    endpoint="files_gateway",
+                    data=data,
+                    headers=headers,
+                )
+            if span.active:
+                span.add_bytes(os.path.getsize(self.profile_zip_path_upload))
+            span.set("status_code", response.status_code)
+            if response.ok:
+                log.debug("commitProfile completed")
+            else:
+                span.fail("HTTP%s" % response.status_code)
+                log.error("commitProfile error")
+            return response.ok
+
+    def zipdir(self, path: str, ziph: "zipfile.ZipFile") -> None:
+        for root, dirs, files in os.walk(path):
+            for file in files:
+                path = os.path.join(root, file)
+                if not os.path.exists(path):
+                    continue
+                if stat.S_ISSOCK(os.stat(path).st_mode):
+                    continue
+                ziph.write(path, path.replace(self.profile_path, ""))
+
+    def sanitizeProfile(self) -> None:
+        if self.cleaningLocalCookies:
+            path_to_coockies = os.path.join(
+                self.profile_path, "Default", "Network", "Cookies"
+            )
+            if os.path.exists(path_to_coockies):  # gone on a commit retry
+                os.remove(path_to_coockies)
+
+        SEPARATOR = os.sep
+
+        remove_dirs = [
+            f"Default{SEPARATOR}Cache",
+            f"Default{SEPARATOR}Service Worker",
+            f"Default{SEPARATOR}Code Cache",
+            f"Default{SEPARATOR}GPUCache",
+            f"Default{SEPARATOR}Service Worker",
+            f"Default{SEPARATOR}Extensions",
+            f"Default{SEPARATOR}IndexedDB",
+            f"Default{SEPARATOR}GPUCache",
+            f"Default{SEPARATOR}DawnCache",
+            f"Default{SEPARATOR}fonts_config",
+            "GrShaderCache",
+            "ShaderCache",
+            "biahpgbdmdkfgndcmfiipgcebobojjkp",
+            "afalakplffnnnlkncjhbmahjfjhmlkal",
+            "cffkpbalmllkdoenhmdmpbkajipdjfam",
+            "Dictionaries",
+            "enkheaiicpeffbfgjiklngbpkilnbkoi",
+            "oofiananboodjbbmdelgdommihjbkfag",
+            "SafetyTips",
+            "fonts",
+        ]
+
+        for d in remove_dirs:
+            fpath = os.path.join(self.profile_path, d)
+            if os.path.exists(fpath):
+                try:
+                    shutil.rmtree(fpath)
+                except Exception:
+                    continue
+
+
 class GoLogin(object):
     def __init__(self, options: Dict[str, Any]) -> None:
         self.access_token: Union[str, None] = options.get("token")
@@ -48,14 +250,209 @@ class GoLogin(object):
         self.uploadCookiesToServer: bool = options.get("uploadCookiesToServer", False)
         self.writeCookiesFromServer: bool = options.get("writeCookiesFromServer", False)
         self.restore_last_session = options.get("restore_last_session", False)
+        self.cookiesMerger: CookiesMerger = CookiesMerger(
+            drop_expired=options.get("dropExpiredCookies", True),
+            drop_session=options.get("dropSessionCookies", False),
+        )
         self.executablePath: str = ""
         self.is_cloud_headless: bool = options.get("is_cloud_headless", True)
         self.is_new_cloud_browser: bool = options.get("is_new_cloud_browser", True)
+        self.api_url: str = options.get("api_url", API_URL)
+        self.profiles_url: str = options.get("profiles_url", PROFILES_URL)
+        self.timezone_url: str = options.get("timezone_url", GET_TIMEZONE_URL)
+        self.files_gateway: str = options.get("files_gateway", FILES_GATEWAY)
+        self.instrumentation: Instrumentation = (
+            options.get("instrumentation") or Instrumentation()
+        )
+        if options.get("on_span") is not None:
+            self.instrumentation.add_listener(options["on_span"])
+        self.event_log: Union["EventLog", str, None] = options.get("event_log")
+        if isinstance(self.event_log, str):
+            from pygologin.eventlog import EventLog
+
+            self.event_log = EventLog(
+                self.event_log, max_bytes=options.get("event_log_max_bytes")
+            )
+        if self.event_log is not None:
+            self.instrumentation.add_listener(self.event_log)
+        from pygologin.transport import Transport
+
+        self.rate_limiter: Union["RateLimiter", None] = options.get("rate_limiter")
+        if self.rate_limiter is None and options.get("rate_limits"):
+            from pygologin.ratelimit import RateLimiter
+
+            # every process with the same tmpdir shares the quota
+            self.rate_limiter = RateLimiter(
+                options["rate_limits"],
+                path=os.path.join(self.tmpdir, "pygologin-ratelimit.json"),
+            )
+        self.transport: "Transport" = options.get("transport") or Transport(
+            timeouts=options.get("timeouts"),
+            retries=options.get("retries", 3),
+            backoff_factor=options.get("backoff_factor", 0.5),
+            hedge=options.get("hedge", False),
+            hedge_delay=options.get("hedge_delay"),
+            rate_limiter=self.rate_limiter,
+        )
+        self.remote_poll_interval: float = options.get("remote_poll_interval", 0.25)
+        self.remote_timeout: Union[float, None] = options.get("remote_timeout")
+        self.cookies_via_cdp: bool = options.get("cookies_via_cdp", False)
+        self.cookies_batch_size: int = options.get("cookies_batch_size", 1000)
+        self.pending_cookies: Union[List[Dict[str, Any]], None] = None
+        self.workspace: Workspace = options.get("workspace") or Workspace(
+            self.tmpdir,
+            max_bytes=options.get("workspace_max_bytes"),
+            orphan_age=options.get("workspace_orphan_age", 3600),
+        )
+        if options.get("workspace_sweep_interval"):
+            self.workspace.start_sweeper(options["workspace_sweep_interval"])
+        self.workspace_lock: Union[str, None] = None
+        self.profile_locks: ProfileLocks = options.get("profile_locks") or ProfileLocks(
+            self.tmpdir, timeout=options.get("profile_lock_timeout", 600)
+        )
+        self.launch_lock: Union[FileLock, None] = None
+        self.committer: Union["Committer", None] = options.get("committer")
+        if self.committer is None and options.get("background_commit"):
+            from pygologin.committer import Committer
+
+            self.committer = Committer(
+                self.tmpdir,
+                workers=options.get("commit_workers", 2),
+                retries=options.get("commit_retries", 3),
+                on_complete=options.get("on_commit"),
+            )
+        self.commit_wait: float = options.get("commit_wait", 0)
+        self.leases: Union["LeaseCoordinator", None] = options.get("leases")
+        if self.leases is None and (
+            options.get("lease_url") or options.get("lease_db")
+        ):
+            from pygologin.leases import (
+                HTTPLeaseBackend,
+                LeaseCoordinator,
+                SQLiteLeaseBackend,
+            )
+
+            self.leases = LeaseCoordinator(
+                HTTPLeaseBackend(
+                    options["lease_url"],
+                    transport=self.transport,
+                    auth_token=options.get("lease_auth_token"),
+                )
+                if options.get("lease_url")
+                else SQLiteLeaseBackend(options["lease_db"]),
+                ttl=options.get("lease_ttl", 60),
+            )
+        self.lease_wait: float = options.get("lease_wait", 0)
+        self.lease: Union["Lease", None] = None
+        self.browser_params: List[str] = []
+        self.max_rss: Union[int, None] = options.get("max_rss")
+        self.max_cpu: Union[float, None] = options.get("max_cpu")
+        self.restart_on_crash: bool = options.get("restart_on_crash", False)
+        self.max_restarts: int = options.get("max_restarts", 3)
+        self.supervisor: Union["Supervisor", None] = options.get("supervisor")
+        if self.supervisor is None and (
+            self.max_rss or self.max_cpu or self.restart_on_crash
+        ):
+            from pygologin.supervisor import Supervisor
+
+            self.supervisor = Supervisor(
+                interval=options.get("supervise_interval", 1.0)
+            )
+        self.isolation: Union["Isolation", None] = options.get("isolation")
+        if self.isolation is None and (
+            options.get("memory_max")
+            or options.get("cpu_max")
+            or options.get("pids_max")
+            or options.get("cpu_affinity")
+        ):
+            from pygologin.isolation import CgroupV2, Isolation
+
+            self.isolation = Isolation(
+                memory_max=options.get("memory_max"),
+                cpu_max=options.get("cpu_max"),
+                pids_max=options.get("pids_max"),
+                cpus_per_browser=options.get("cpu_affinity", 0),
+                group=options.get("cgroup_group"),
+                cgroups=(
+                    CgroupV2(base=options["cgroup_base"])
+                    if options.get("cgroup_base")
+                    else None
+                ),
+            )
+        self.placement: Union["Placement", None] = None
+        self.fingerprint_pool: Union["FingerprintPool", None] = options.get(
+            "fingerprint_pool"
+        )
+        if self.fingerprint_pool is None and options.get("fingerprint_prefetch"):
+            from pygologin.fingerprints import FingerprintPool
+
+            self.fingerprint_pool = FingerprintPool(
+                lambda os_type: self.getRandomFingerprint({"os": os_type}),
+                size=options["fingerprint_prefetch"],
+                low_water=options.get("fingerprint_low_water"),
+            )
+        self.profile_cache: Union["TTLCache[Dict[str, Any]]", None] = options.get(
+            "profile_cache"
+        )
+        self.timezone_cache: Union["TTLCache[Dict[str, Any]]", None] = options.get(
+            "timezone_cache"
+        )
+        if self.profile_cache is None and options.get("profile_cache_ttl"):
+            from pygologin.cache import TTLCache
+
+            self.profile_cache = TTLCache(options["profile_cache_ttl"])
+        if self.timezone_cache is None and options.get("timezone_cache_ttl"):
+            from pygologin.cache import TTLCache
+
+            self.timezone_cache = TTLCache(options["timezone_cache_ttl"])
+        self.proxy_prober: Union["ProxyProber", None] = options.get("proxy_prober")
+        if self.proxy_prober is None and options.get("proxy_probe_ttl"):
+            from pygologin.cache import TTLCache
+            from pygologin.proxies import ProxyProber
+
+            if self.timezone_cache is None:
+                # so starts use the timezone the probe already looked up
+                self.timezone_cache = TTLCache(options["proxy_probe_ttl"])
+            self.proxy_prober = ProxyProber(
+                self.timezone_url,
+                transport=self.transport,
+                ttl=options["proxy_probe_ttl"],
+                slow=options.get("proxy_slow"),
+                timezone_cache=self.timezone_cache,
+            )
+        # built here rather than passed in, so close() shuts them down
+        self.owned_helpers: List[str] = [
+            name
+            for name, _ in CLOSE_METHODS
+            if getattr(self, name) is not None and options.get(name) is None
+        ]
+        self.agent: Union["AgentClient", None] = None
+        if options.get("agent"):
+            from pygologin.agent import FORWARDED_OPTIONS, AgentClient
+
+            agent = options["agent"]
+            self.agent = (
+                agent
+                if isinstance(agent, AgentClient)
+                else AgentClient(agent, auth_token=options.get("agent_auth_token"))
+            )
+            self.agent_options: Dict[str, Any] = {
+                key: options[key] for key in FORWARDED_OPTIONS if key in options
+            }
+        self.download_segments: int = options.get("download_segments", 1)
+        self.download_segment_threshold: int = options.get(
+            "download_segment_threshold", 32 * 1024 * 1024
+        )
 
         home = str(pathlib.Path.home())
         browser_gologin = os.path.join(home, ".gologin", "browser")
         try:
-            for orbita_browser in os.listdir(browser_gologin):
+            if options.get("executablePath"):
+                self.executablePath = options["executablePath"]
+                browser_gologin_dirs = []
+            else:
+                browser_gologin_dirs = os.listdir(browser_gologin)
+            for orbita_browser in browser_gologin_dirs:
                 if (
                     not orbita_browser.endswith(".zip")
                     and not orbita_browser.endswith(".tar.gz")
@@ -80,7 +477,7 @@ class GoLogin(object):
         except Exception:
             self.executablePath = ""
 
-        if not self.executablePath:
+        if not self.executablePath and self.agent is None:
             raise Exception(
                 f"Orbita executable file not found in HOME ({browser_gologin}). Is gologin installed on your system?"
             )
@@ -117,7 +514,9 @@ class GoLogin(object):
     def loadExtensions(self) -> Union[str, None]:
         profile = self.profile
         chromeExtensions = profile.get("chromeExtensions", [])
-        extensionsManagerInst = ExtensionsManager()
+        from pygologin.extensionsManager.extensionsManager import ExtensionsManager
+
+        extensionsManagerInst = ExtensionsManager(self.transport)
         pathToExt = ""
         profileExtensionsCheck = []
         for ext in chromeExtensions:
@@ -146,7 +545,7 @@ class GoLogin(object):
         with open(pref_file, "r", encoding="utf-8") as pfile:
             preferences = json.load(pfile)
 
-        noteExtExist = ExtensionsManager().extensionIsAlreadyExisted(
+        noteExtExist = extensionsManagerInst.extensionIsAlreadyExisted(
             preferences, profileExtensionsCheck
         )
 
@@ -156,13 +555,16 @@ class GoLogin(object):
             return pathToExt
 
     def spawnBrowser(self) -> str:
+        if self.profile_id is None:
+            raise ValueError("profile_id is None")
         proxy = self.proxy
         proxy_host = ""
+        proxy_server = ""
         if proxy:
             if proxy.get("mode") is None or proxy.get("mode") == "geolocation":
                 proxy["mode"] = "http"
-            proxy_host = proxy.get("host")
-            proxy = self.formatProxyUrl(proxy)
+            proxy_host = str(proxy.get("host"))
+            proxy_server = self.formatProxyUrl(proxy)
 
         tz = self.tz.get("timezone")
 
@@ -178,14 +580,15 @@ class GoLogin(object):
 
         chromeExtensions = self.profile.get("chromeExtensions", [])
         if chromeExtensions:
-            paths = self.loadExtensions()
+            with self.instrumentation.span("loadExtensions", self.profile_id):
+                paths = self.loadExtensions()
             if paths is not None:
                 extToParams = "--load-extension=" + paths
                 params.append(extToParams)
 
-        if proxy:
+        if proxy_server:
             hr_rules = "MAP * 0.0.0.0 , EXCLUDE %s" % (proxy_host)
-            params.append("--proxy-server=" + proxy)
+            params.append("--proxy-server=" + proxy_server)
             params.append("--host-resolver-rules=" + hr_rules)
 
         if self.restore_last_session:
@@ -194,40 +597,120 @@ class GoLogin(object):
         for param in self.extra_params:
             params.append(param)
 
+        self.browser_params = params
+        try:
+            with self.instrumentation.span("spawn", self.profile_id):
+                if self.isolation is not None and self.placement is None:
+                    self.placement = self.isolation.prepare(self.profile_id)
+                self.pid = self.launchBrowser()
+            if self.supervisor is not None:
+                self.supervisor.register(
+                    self.profile_id,
+                    self.pid,
+                    restart=self.launchBrowser if self.restart_on_crash else None,
+                    max_rss=self.max_rss,
+                    max_cpu=self.max_cpu,
+                    max_restarts=self.max_restarts,
+                )
+                self.supervisor.start()
+
+            try_count = 1
+            url = str(self.address) + ":" + str(self.port)
+            with self.instrumentation.span("devtools", self.profile_id) as span:
+                while try_count < 100:
+                    try:
+                        self.transport.get(
+                            "http://" + url + "/json", endpoint="devtools", retries=0
+                        ).content
+                        break
+                    except Exception:
+                        try_count += 1
+                        time.sleep(1)
+                span.set("tries", try_count)
+
+            if self.pending_cookies is not None:
+                with self.instrumentation.span(
+                    "injectCookies", self.profile_id
+                ) as span:
+                    span.set("cookies", len(self.pending_cookies))
+                    self.setBrowserCookies(self.pending_cookies)
+                self.pending_cookies = None
+        except BaseException:
+            # start() releases the locks; a browser left running would keep
+            # using a profile directory that is no longer protected
+            self.pending_cookies = None
+            self.killBrowser()
+            raise
+        return url
+
+    def killBrowser(self) -> None:
+        from pygologin.supervisor import kill_tree
+
+        if self.supervisor is not None and self.profile_id is not None:
+            browser = self.supervisor.unregister(self.profile_id)
+            if browser is not None:
+                self.pid = browser.pid
+            self.supervisor.stop_if_idle()
+        if self.pid:
+            kill_tree(self.pid)
+            self.pid = 0
+        if self.placement is not None and self.isolation is not None:
+            self.isolation.release(self.placement)
+            self.placement = None
+
+    def launchBrowser(self) -> int:
+        import subprocess
+
         if sys.platform == "darwin":
-            open_browser = subprocess.Popen(params)
-            self.pid = open_browser.pid
+            open_browser = subprocess.Popen(self.browser_params)
+        elif self.placement is not None and self.isolation is not None:
+            # cgroup, rlimits and CPU affinity are applied before exec, so
+            # every process the browser forks inherits them
+            open_browser = subprocess.Popen(
+                self.browser_params,
+                start_new_session=True,
+                preexec_fn=self.isolation.preexec(self.placement),
+            )
         else:
-            open_browser = subprocess.Popen(params, start_new_session=True)
-            self.pid = open_browser.pid
-
-        try_count = 1
-        url = str(self.address) + ":" + str(self.port)
-        while try_count < 100:
-            try:
-                requests.get("http://" + url + "/json").content
-                break
-            except Exception:
-                try_count += 1
-                time.sleep(1)
-        return url
+            open_browser = subprocess.Popen(self.browser_params, start_new_session=True)
+        self.pid = open_browser.pid
+        return self.pid
 
     def start(self) -> str:
         log.debug("start")
-        profile_path = self.createStartup()
-        if self.spawn_browser is True:
-            return self.spawnBrowser()
+        if self.agent is not None:
+            return self.startWithAgent()
+        try:
+            profile_path = self.createStartup()
+            if self.spawn_browser is True:
+                return self.spawnBrowser()
+        except BaseException:
+            self.releaseLaunchLock()
+            self.releaseLease()
+            self.releaseWorkspace()
+            raise
         return profile_path
 
-    def zipdir(self, path: str, ziph: zipfile.ZipFile) -> None:
-        for root, dirs, files in os.walk(path):
-            for file in files:
-                path = os.path.join(root, file)
-                if not os.path.exists(path):
-                    continue
-                if stat.S_ISSOCK(os.stat(path).st_mode):
-                    continue
-                ziph.write(path, path.replace(self.profile_path, ""))
+    def close(self) -> None:
+        # waits for queued commits, then stops the threads and pools this
+        # instance created; helpers passed in belong to whoever built them
+        for name, method in CLOSE_METHODS:
+            if name in self.owned_helpers:
+                getattr(getattr(self, name), method)()
+        self.owned_helpers = []
+
+    def releaseLaunchLock(self) -> None:
+        if self.launch_lock is not None:
+            self.launch_lock.release()
+            self.launch_lock = None
+
+    def releaseLease(self) -> None:
+        if self.lease is not None:
+            self.pendingCommit().releaseLease()
+            self.lease = None
+
+    def zipdir(self, path: str, ziph: "zipfile.ZipFile") -> None:
+        self.pendingCommit().zipdir(path, ziph)
 
     def waitUntilProfileUsing(self, try_count: int = 0) -> None:
         if try_count > 10:
@@ -241,46 +724,110 @@ class GoLogin(object):
                 log.debug("waiting chrome termination")
                 self.waitUntilProfileUsing(try_count + 1)
 
+    def startWithAgent(self) -> str:
+        # the agent prepares and launches the profile with its warm caches
+        if self.agent is None or self.profile_id is None:
+            raise ValueError("agent and profile_id are required")
+        result = self.agent.start(self.profile_id, self.agent_options)
+        self.pid = result.get("pid") or 0
+        if result.get("port"):
+            self.port = result["port"]
+        return result["url"] if self.spawn_browser else result["profile_path"]
+
     def stop(self) -> None:
+        if self.agent is not None:
+            self.agent.stop(self.profile_id)
+            log.debug("profile stopped by the agent")
+            return
+        if self.cookies_via_cdp and self.uploadCookiesToServer and self.pid:
+            try:
+                with self.instrumentation.span("extractCookies", self.profile_id):
+                    self.uploadCookies(self.getBrowserCookies())
+            except Exception as e:
+                log.exception("reading cookies over CDP failed: %s", e)
+        import psutil
+
+        if self.supervisor is not None and self.profile_id is not None:
+            browser = self.supervisor.unregister(self.profile_id)
+            if browser is not None:
+                self.pid = browser.pid  # restarted browsers have a new pid
+            # the next spawn starts it again
+            self.supervisor.stop_if_idle()
         for proc in psutil.process_iter(["pid"]):
             if proc.info.get("pid") == self.pid:
                 proc.kill()
         self.waitUntilProfileUsing()
-        self.sanitizeProfile()
-        if self.local is False:
-            self.commitProfile()
-            os.remove(self.profile_zip_path_upload)
-            shutil.rmtree(self.profile_path)
+        if self.placement is not None and self.isolation is not None:
+            self.isolation.release(self.placement)
+            self.placement = None
+        if self.committer is not None:
+            # the browser is gone; zip, upload and cleanup run in the
+            # background on a snapshot, so this instance can start another
+            # profile
+            pending = self.pendingCommit()
+
+            def finish(job: "CommitJob") -> None:
+                pending.releaseWorkspace()
+                pending.releaseLease()
+
+            self.committer.submit(
+                pending.profile_id,
+                lambda: pending.commitAndCleanup(strict=True),
+                on_complete=finish,
+            )
+            self.workspace_lock = None
+            self.lease = None
+            self.releaseLaunchLock()
+            log.debug("profile stopped, commit queued")
+            return
+        try:
+            self.commitAndCleanup()
+        finally:
+            self.releaseLaunchLock()
+            self.releaseLease()
+            self.releaseWorkspace()
         log.debug("profile stopped")
 
-    def commitProfile(self) -> None:
-        log.debug("commitProfile")
-        zipf = zipfile.ZipFile(self.profile_zip_path_upload, "w", zipfile.ZIP_DEFLATED)
-        self.zipdir(self.profile_default_folder_path, zipf)
-        zipf.writestr("First Run", "")
-        zipf.close()
+    def pendingCommit(self, profile_id: Union[str, None] = None) -> "PendingCommit":
+        profile_id = self.profile_id if profile_id is None else profile_id
+        if profile_id is None:
+            raise ValueError("profile_id is None")
+        return PendingCommit(self, profile_id)
 
-        if self.access_token is None:
-            raise ValueError("access_token is None")
+    def commitAndCleanup(self, strict: bool = False) -> None:
+        self.pendingCommit().commitAndCleanup(strict)
 
-        headers = {
-            "Authorization": "Bearer " + self.access_token,
-            "User-Agent": "Selenium-API",
-            "Content-Type": "application/zip",
-            "browserId": self.profile_id,
-        }
+    def releaseWorkspace(self) -> None:
+        if self.workspace_lock is not None:
+            self.pendingCommit().releaseWorkspace()
+            self.workspace_lock = None
 
-        response = requests.put(
-            FILES_GATEWAY + "/upload",
-            data=open(self.profile_zip_path_upload, "rb"),
-            headers=headers,
-        )
-        if response.ok:
-            log.debug("commitProfile completed")
-        else:
-            log.error("commitProfile error")
+    def recoverCommits(self) -> List["CommitJob"]:
+        # requeues commits that a crashed process left in tmpdir
+        if self.committer is None:
+            return []
+
+        def factory(profile_id: str) -> Any:
+            pending = self.pendingCommit(profile_id)
+
+            def commit() -> None:
+                if pending.leases is not None:
+                    pending.lease = pending.leases.acquire(profile_id)
+                try:
+                    pending.commitAndCleanup(strict=True)
+                finally:
+                    pending.releaseLease()
+
+            return commit
+
+        return self.committer.recover(factory)
+
+    def commitProfile(self) -> bool:
+        return self.pendingCommit().commitProfile()
 
     def commitProfileOld(self) -> None:
+        import zipfile
+
         zipf = zipfile.ZipFile(self.profile_zip_path_upload, "w", zipfile.ZIP_DEFLATED)
         self.zipdir(self.profile_path, zipf)
         zipf.close()
@@ -290,54 +837,18 @@ class GoLogin(object):
         if self.profile_id is None:
             raise ValueError("profile_id is None")
 
-        signedUrl = requests.get(
-            API_URL + "/browser/" + self.profile_id + "/storage-signature",
+        signedUrl = self.transport.get(
+            self.api_url + "/browser/" + self.profile_id + "/storage-signature",
             headers=self.headers(),
         ).content.decode("utf-8")
 
-        requests.put(signedUrl, data=open(self.profile_zip_path_upload, "rb"))
+        with open(self.profile_zip_path_upload, "rb") as data:
+            self.transport.put(signedUrl, endpoint="files_gateway", data=data)
 
         # print('commit profile complete')
 
     def sanitizeProfile(self) -> None:
-        if self.cleaningLocalCookies:
-            path_to_coockies = os.path.join(
-                self.profile_path, "Default", "Network", "Cookies"
-            )
-            os.remove(path_to_coockies)
-
-        SEPARATOR = os.sep
-
-        remove_dirs = [
-            f"Default{SEPARATOR}Cache",
-            f"Default{SEPARATOR}Service Worker",
-            f"Default{SEPARATOR}Code Cache",
-            f"Default{SEPARATOR}GPUCache",
-            f"Default{SEPARATOR}Service Worker",
-            f"Default{SEPARATOR}Extensions",
-            f"Default{SEPARATOR}IndexedDB",
-            f"Default{SEPARATOR}GPUCache",
-            f"Default{SEPARATOR}DawnCache",
-            f"Default{SEPARATOR}fonts_config",
-            "GrShaderCache",
-            "ShaderCache",
-            "biahpgbdmdkfgndcmfiipgcebobojjkp",
-            "afalakplffnnnlkncjhbmahjfjhmlkal",
-            "cffkpbalmllkdoenhmdmpbkajipdjfam",
-            "Dictionaries",
-            "enkheaiicpeffbfgjiklngbpkilnbkoi",
-            "oofiananboodjbbmdelgdommihjbkfag",
-            "SafetyTips",
-            "fonts",
-        ]
-
-        for d in remove_dirs:
-            fpath = os.path.join(self.profile_path, d)
-            if os.path.exists(fpath):
-                try:
-                    shutil.rmtree(fpath)
-                except Exception:
-                    continue
+        self.pendingCommit().sanitizeProfile()
 
     def formatProxyUrl(self, proxy: Dict[str, Any]) -> str:
         return (
@@ -349,44 +860,87 @@ class GoLogin(object):
         )
 
     def formatProxyUrlPassword(self, proxy: Dict[str, Any]) -> str:
-        mode = "socks5h" if proxy.get("mode") == "socks5" else proxy.get("mode", "http")
-        if proxy.get("username", "") == "":
-            return (
-                mode + "://" + proxy.get("host", "") + ":" + str(proxy.get("port", 80))
+        return proxy_url(proxy)
+
+    def getTimeZone(self) -> Dict[str, Any]:
+        if self.timezone_cache is None:
+            return self.fetchTimeZone()
+        return self.timezone_cache.get_or_load(
+            proxy_key(self.proxy), self.fetchTimeZone
+        )
+
+    def checkProxy(self, proxy: Union[Dict[str, Any], None]) -> None:
+        if proxy is None or self.proxy_prober is None:
+            return
+        result = self.proxy_prober.probe(proxy)
+        if not result.alive:
+            raise ProxyError(
+                f"proxy {result.host}:{result.key[2]} of profile {self.profile_id} "
+                f"is unreachable: {result.error}"
             )
-        else:
-            return (
-                mode
-                + "://"
-                + proxy.get("username", "")
-                + ":"
-                + proxy.get("password")
-                + "@"
-                + proxy.get("host", "")
-                + ":"
-                + str(proxy.get("port", 80))
+
+    def probeProxies(
+        self, profile_ids: List[str], refresh: bool = False
+    ) -> Dict[str, Union["ProbeResult", None]]:
+        # None for profiles without a proxy; see ProxyProber.rank()
+        from concurrent.futures import ThreadPoolExecutor
+
+        from pygologin.proxies import ProxyProber
+
+        prober = self.proxy_prober
+        if prober is None:
+            prober = self.proxy_prober = ProxyProber(
+                self.timezone_url,
+                transport=self.transport,
+                timezone_cache=self.timezone_cache,
             )
+        with ThreadPoolExecutor(max_workers=prober.workers) as pool:
+            profiles = list(pool.map(self.getProfile, profile_ids))
+        results = prober.probe_many(
+            [profile_proxy(profile) for profile in profiles], refresh=refresh
+        )
+        return dict(zip(profile_ids, results))
 
-    def getTimeZone(self) -> Dict[str, Any]:
+    def fetchTimeZone(self) -> Dict[str, Any]:
         proxy = self.proxy
-        if proxy:
-            proxies = {
-                "http": self.formatProxyUrlPassword(proxy),
-                "https": self.formatProxyUrlPassword(proxy),
-            }
-            data = requests.get(GET_TIMEZONE_URL, proxies=proxies)
-        else:
-            data = requests.get(GET_TIMEZONE_URL)
-        return json.loads(data.content.decode("utf-8"))
+        with self.instrumentation.span("getTimeZone", self.profile_id) as span:
+            if proxy:
+                proxies = {
+                    "http": self.formatProxyUrlPassword(proxy),
+                    "https": self.formatProxyUrlPassword(proxy),
+                }
+                span.set("proxy", proxy.get("host"))
+            else:
+                proxies = None
+            data = self.transport.get(
+                self.timezone_url,
+                endpoint="timezone",
+                name="getTimeZone",
+                hedge=self.transport.hedged("getTimeZone"),
+                proxies=proxies,
+            )
+            span.add_bytes(len(data.content))
+            return json.loads(data.content)
 
     def getProfile(self, profile_id: Union[str, None] = None) -> Dict[str, Any]:
         profile_id = self.profile_id if profile_id is None else profile_id
 
         if profile_id is None:
             raise ValueError("profile_id is None")
-
-        response = requests.get(
-            f"{API_URL}/browser/{profile_id}", headers=self.headers()
+        if self.profile_cache is not None:
+            # callers modify the profile they get, e.g. update()
+            profile = self.profile_cache.get_or_load(
+                profile_id, lambda: self.fetchProfile(profile_id)
+            )
+            return copy.deepcopy(profile)
+        return self.fetchProfile(profile_id)
+
+    def fetchProfile(self, profile_id: str) -> Dict[str, Any]:
+        response = self.transport.get(
+            f"{self.api_url}/browser/{profile_id}",
+            name="getProfile",
+            hedge=self.transport.hedged("getProfile"),
+            headers=self.headers(),
         )
         data: Dict[str, Any] = response.json()
         if data.get("statusCode") == 404:
@@ -397,10 +951,11 @@ class GoLogin(object):
         log.debug("downloadProfileZip")
         s3path = self.profile.get("s3Path", "")
         log.debug("s3path %s", s3path)
-        data = ""
 
         if self.access_token is None:
             raise ValueError("access_token is None")
+        if self.profile_id is None:
+            raise ValueError("profile_id is None")
 
         headers = {
             "Authorization": "Bearer " + self.access_token,
@@ -408,18 +963,34 @@ class GoLogin(object):
             "browserId": self.profile_id,
         }
 
-        data = requests.get(FILES_GATEWAY + "/download", headers=headers).content
+        with self.instrumentation.span("download", self.profile_id) as span:
+            # a .part file left by an interrupted transfer is resumed with Range
+            # and If-Range, so only a partial of the current version is kept
+            from pygologin.download import RangedDownload
+
+            download = RangedDownload(
+                self.transport,
+                self.files_gateway + "/download",
+                self.profile_zip_path,
+                headers=headers,
+                segments=self.download_segments,
+                segment_threshold=self.download_segment_threshold,
+            )
+            size = download.run()
+            span.add_bytes(size)
+            span.set("resumed", download.resumed)
 
-        if len(data) == 0:
-            log.debug("data is 0 - creating empty profile")
-            self.createEmptyProfile()
-        else:
-            with open(self.profile_zip_path, "wb") as f:
-                f.write(data)
+            if size == 0:
+                log.debug("data is 0 - creating empty profile")
+                span.set("empty", True)
+                self.createEmptyProfile()
 
         try:
             log.debug("extracting profile")
-            self.extractProfileZip()
+            with self.instrumentation.span("extract", self.profile_id) as span:
+                if span.active:
+                    span.add_bytes(os.path.getsize(self.profile_zip_path))
+                self.extractProfileZip()
         except Exception as e:
             log.exception("ERROR! %s", e)
             self.uploadEmptyProfile()
@@ -440,13 +1011,13 @@ class GoLogin(object):
             # print('downloading profile direct')
             if self.profile_id is None:
                 raise ValueError("profile_id is None")
-            data = requests.get(
-                API_URL + "/browser/" + self.profile_id, headers=self.headers()
+            data = self.transport.get(
+                self.api_url + "/browser/" + self.profile_id, headers=self.headers()
             ).content
         else:
             # print('downloading profile s3')
-            s3url = PROFILES_URL + s3path.replace(" ", "+")
-            data = requests.get(s3url).content
+            s3url = self.profiles_url + s3path.replace(" ", "+")
+            data = self.transport.get(s3url, endpoint="profiles").content
 
         if len(data) == 0:
             log.debug("data is 0 - creating fresh profile content")
@@ -476,7 +1047,9 @@ class GoLogin(object):
     def uploadEmptyProfile(self) -> None:
         log.debug("uploadEmptyProfile")
         upload_profile = open(r"./gologin_zeroprofile.zip", "wb")
-        source = requests.get(PROFILES_URL + "zero_profile.zip")
+        source = self.transport.get(
+            self.profiles_url + "zero_profile.zip", endpoint="profiles"
+        )
         upload_profile.write(source.content)
         upload_profile.close
 
@@ -492,13 +1065,28 @@ class GoLogin(object):
 
         if not os.path.exists(empty_profile):
             log.debug("downloading zero profile")
-            source = requests.get(PROFILES_URL + "zero_profile.zip")
+            source = self.transport.get(
+                self.profiles_url + "zero_profile.zip", endpoint="profiles"
+            )
             with open(self.profile_zip_path, "wb") as profile_zip:
                 profile_zip.write(source.content)
 
     def extractProfileZip(self) -> None:
-        with zipfile.ZipFile(self.profile_zip_path, "r") as zip_ref:
-            zip_ref.extractall(self.profile_path)
+        import zipfile
+
+        if self.profile_id is None:
+            raise ValueError("profile_id is None")
+
+        # extract next to the profile and swap it in, so a failed or
+        # interrupted extraction never leaves a half-written profile_path
+        staging = staging_dir(self.tmpdir, self.profile_id)
+        try:
+            with zipfile.ZipFile(self.profile_zip_path, "r") as zip_ref:
+                zip_ref.extractall(staging)
+            replace_tree(staging, self.profile_path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
         log.debug("profile extracted %s", self.profile_path)
         os.remove(self.profile_zip_path)
 
@@ -631,40 +1219,18 @@ class GoLogin(object):
                 profile["deviceMemory"] = preferences["gologin"]["deviceMemory"]
 
         proxy = self.profile.get("proxy")
-        # print('proxy=', proxy)
         if proxy and (proxy.get("mode") == "gologin" or proxy.get("mode") == "tor"):
-            autoProxyServer = profile.get("autoProxyServer")
-            splittedAutoProxyServer = autoProxyServer.split("://")
-            splittedProxyAddress = splittedAutoProxyServer[1].split(":")
-            port = splittedProxyAddress[1]
-
-            proxy = {
-                "mode": "http",
-                "host": splittedProxyAddress[0],
-                "port": port,
-                "username": profile.get("autoProxyUsername"),
-                "password": profile.get("autoProxyPassword"),
-                "timezone": profile.get("autoProxyTimezone", "us"),
-            }
-
             profile["proxy"]["username"] = profile.get("autoProxyUsername")
             profile["proxy"]["password"] = profile.get("autoProxyPassword")
 
-        if not proxy or proxy.get("mode") == "none":
+        self.proxy: Union[Dict[str, Any], None] = profile_proxy(profile)
+        if self.proxy is None:
             log.debug("no proxy")
-            proxy = None
-
-        if proxy and proxy.get("mode") == "geolocation":
-            proxy["mode"] = "http"
-
-        if proxy and proxy.get("mode") is None:
-            proxy["mode"] = "http"
-
-        self.proxy = proxy
         self.profile_name = profile.get("name")
         if self.profile_name is None:
-            log.debug("empty profile name")
-            log.debug("profile= %s", profile)
+            log.debug(
+                "profile %s has no name, keys %s", self.profile_id, sorted(profile)
+            )
             exit()
 
         gologin = self.convertPreferences(profile)
@@ -675,62 +1241,183 @@ class GoLogin(object):
         json.dump(preferences, pfile)
 
     def createStartup(self) -> str:
+        if self.profile_id is None:
+            raise ValueError("profile_id is None")
         log.debug("createStartup %s", self.profile_path)
-        if self.local is False and os.path.exists(self.profile_path):
-            try:
-                shutil.rmtree(self.profile_path)
-            except Exception:
-                log.error("error removing profile %s", self.profile_path)
-        self.profile = self.getProfile()
+        if self.committer is not None:
+            self.committer.guard(self.profile_id, timeout=self.commit_wait)
+        if self.leases is not None and self.lease is None:
+            # no other host may start or commit the profile while it runs here
+            self.lease = self.leases.acquire(self.profile_id, timeout=self.lease_wait)
+        if self.workspace_lock is None:
+            self.workspace_lock = self.workspace.acquire(self.profile_id)
+        self.workspace.evict()
+        # two browsers cannot share a user data dir, and a profile is not
+        # rewritten under a running one: fail before downloading anything
+        if self.spawn_browser:
+            if self.launch_lock is None:
+                self.launch_lock = self.profile_locks.launch(self.profile_id)
+        else:
+            self.profile_locks.check_launch(self.profile_id)
+        with self.profile_locks.flight(self.profile_id) as flight:
+            self.prepareProfile(flight)
+        return self.profile_path
+
+    def prepareProfile(self, flight: "Flight") -> None:
+        with self.instrumentation.span("getProfile", self.profile_id):
+            self.profile = self.getProfile()
+        # fail before the download rather than at getTimeZone()
+        self.checkProxy(profile_proxy(self.profile))
         if self.local is False:
-            self.downloadProfileZip()
-        self.updatePreferences()
+            if flight.fresh and os.path.isdir(self.profile_path):
+                # a concurrent start downloaded it while this one waited
+                log.debug("reusing profile prepared by another start")
+            else:
+                self.downloadProfileZip()
+                flight.done()
+        with self.instrumentation.span("updatePreferences", self.profile_id):
+            self.updatePreferences()
 
         log.debug("writeCookiesFromServer %s", self.writeCookiesFromServer)
         if self.writeCookiesFromServer:
-            self.downloadCookies()
+            if self.cookies_via_cdp and self.spawn_browser:
+                # injected with Network.setCookies once DevTools is up
+                self.pending_cookies, report = self.cookiesMerger.merge(
+                    self.iter_cookies()
+                )
+                log.debug("cookies to inject %s", report)
+            else:
+                self.downloadCookies()
             log.debug("cookies downloaded")
-        return self.profile_path
 
     def downloadCookies(self) -> None:
+        from pygologin.cookiesManager.cookiesManager import CookiesManager
+
         cookiesManagerInst = CookiesManager(
-            profile_id=self.profile_id, tmpdir=self.tmpdir
+            profile_id=self.profile_id, tmpdir=self.tmpdir, merger=self.cookiesMerger
         )
         try:
-            response = requests.get(
-                f"{API_URL}/browser/{self.profile_id}/cookies",
-                headers=self.headers(),
+            report = cookiesManagerInst.write_cookies_to_file(
+                self.iter_cookies(), batch_size=self.cookies_batch_size
             )
-
-            cookies = response.json()
-            log.debug("COOKIES LENGTH %s", len(cookies))
-            cookiesManagerInst.write_cookies_to_file(cookies)
+            log.debug("COOKIES LENGTH %s", report.received)
         except Exception as e:
             log.exception("downloadCookies exc %s %s", e, e.__traceback__.tb_lineno)
             raise e
 
-    def get_cookies(self, profile_id: Union[str, None] = None) -> Response:
+    def debuggerTargetUrl(self) -> str:
+        base = "http://" + str(self.address) + ":" + str(self.port)
+        targets = self.transport.get(
+            base + "/json", endpoint="devtools", retries=0
+        ).json()
+        for target in targets:
+            if target.get("type") == "page" and target.get("webSocketDebuggerUrl"):
+                return target["webSocketDebuggerUrl"]
+        # no open tab: the browser target only speaks Storage.*, not Network.*
+        raise ValueError("no page target to attach to at " + base)
+
+    def setBrowserCookies(self, cookies: List[Dict[str, Any]]) -> None:
+        from pygologin.cdp import CDPClient, to_cdp_cookie
+
+        with CDPClient(self.debuggerTargetUrl()) as client:
+            client.send(
+                "Network.setCookies",
+                {"cookies": [to_cdp_cookie(cookie) for cookie in cookies]},
+            )
+
+    def getBrowserCookies(self) -> List[Dict[str, Any]]:
+        from pygologin.cdp import CDPClient, from_cdp_cookie
+
+        with CDPClient(self.debuggerTargetUrl()) as client:
+            result = client.send("Network.getAllCookies")
+        return [from_cdp_cookie(cookie) for cookie in result.get("cookies", [])]
+
+    def iter_cookies(
+        self, profile_id: Union[str, None] = None
+    ) -> Iterator[Dict[str, Any]]:
+        # cookies one at a time, parsed as the response body arrives
+        from pygologin.jsonstream import iter_response_items
+
+        profile_id = self.profile_id if profile_id is None else profile_id
+        if profile_id is None:
+            raise ValueError("profile_id is None")
+        response = self.transport.get(
+            f"{self.api_url}/browser/{profile_id}/cookies",
+            name="getCookies",
+            headers=self.headers(),
+            stream=True,
+        )
+        return iter_response_items(response)
+
+    def get_cookies(self, profile_id: Union[str, None] = None) -> "Response":
         profile_id = self.profile_id if profile_id is None else profile_id
         if profile_id is None:
             raise ValueError("profile_id is None")
-        response = requests.get(
-            f"{API_URL}/browser/{self.profile_id}/cookies", headers=self.headers()
+        response = self.transport.get(
+            f"{self.api_url}/browser/{profile_id}/cookies",
+            name="getCookies",
+            headers=self.headers(),
         )
         return response
 
     def uploadCookies(
         self, cookies: List[Dict[str, Any]], profile_id: Union[str, None] = None
-    ) -> Response:
+    ) -> "Response":
         profile_id = self.profile_id if profile_id is None else profile_id
         if profile_id is None:
             raise ValueError("profile_id is None")
-        response = requests.post(
-            f"{API_URL}/browser/{self.profile_id}/cookies",
+        cookies, report = self.cookiesMerger.merge(cookies)
+        log.debug("uploading cookies %s", report)
+        response = self.transport.post(
+            f"{self.api_url}/browser/{profile_id}/cookies",
+            name="uploadCookies",
             headers=self.headers(),
             json=cookies,
         )
         return response
 
+    def downloadCookiesMany(
+        self,
+        profile_ids: List[str],
+        directory: Union[str, None] = None,
+        max_workers: int = 8,
+        rate: Union[float, None] = None,
+        on_result: Union[Callable[["BulkResult"], Any], None] = None,
+    ) -> Dict[str, "BulkResult"]:
+        # streams each profile's cookies into <directory>/<id>.json, or into
+        # its local Cookies DB when no directory is given
+        from pygologin.cookiesManager.cookiesBulk import CookiesBulk
+
+        return CookiesBulk(self, max_workers, rate).download(
+            profile_ids, directory, on_result
+        )
+
+    def uploadCookiesMany(
+        self,
+        profile_ids: List[str],
+        directory: Union[str, None] = None,
+        cookies: Union[Dict[str, List[Dict[str, Any]]], None] = None,
+        max_workers: int = 8,
+        rate: Union[float, None] = None,
+        on_result: Union[Callable[["BulkResult"], Any], None] = None,
+    ) -> Dict[str, "BulkResult"]:
+        from pygologin.cookiesManager.cookiesBulk import CookiesBulk
+
+        return CookiesBulk(self, max_workers, rate).upload(
+            profile_ids, directory, cookies, on_result
+        )
+
+    def clearCookiesMany(
+        self,
+        profile_ids: List[str],
+        max_workers: int = 8,
+        rate: Union[float, None] = None,
+        on_result: Union[Callable[["BulkResult"], Any], None] = None,
+    ) -> Dict[str, "BulkResult"]:
+        from pygologin.cookiesManager.cookiesBulk import CookiesBulk
+
+        return CookiesBulk(self, max_workers, rate).clear(profile_ids, on_result)
+
     def headers(self) -> Dict[str, str]:
         if self.access_token is None:
             raise ValueError("access_token is None")
@@ -742,28 +1429,41 @@ class GoLogin(object):
     def getRandomFingerprint(self, options: Dict[str, Any]) -> Dict[str, Any]:
         os_type = options.get("os", "lin")
         return json.loads(
-            requests.get(
-                API_URL + "/browser/fingerprint?os=" + os_type, headers=self.headers()
-            ).content.decode("utf-8")
+            self.transport.get(
+                self.api_url + "/browser/fingerprint?os=" + os_type,
+                headers=self.headers(),
+            ).content
         )
 
     def profiles(self) -> Dict[str, Any]:
         return json.loads(
-            requests.get(
-                API_URL + "/browser/v2", headers=self.headers()
-            ).content.decode("utf-8")
+            self.transport.get(
+                self.api_url + "/browser/v2", headers=self.headers()
+            ).content
+        )
+
+    def iter_profiles(self) -> Iterator[Dict[str, Any]]:
+        # profiles one at a time, parsed as the response body arrives
+        from pygologin.jsonstream import iter_response_items
+
+        response = self.transport.get(
+            self.api_url + "/browser/v2", headers=self.headers(), stream=True
         )
+        return iter_response_items(response, path=("profiles",))
 
     def createProfileRandomFingerprint(self, options: Dict[str, Any] = {}):
         response = json.loads(
-            requests.post(
-                API_URL + "/browser/quick", headers=self.headers(), json=options
-            ).content.decode("utf-8")
+            self.transport.post(
+                self.api_url + "/browser/quick", headers=self.headers(), json=options
+            ).content
         )
         return response
 
     def create(self, options: Dict[str, Any] = {}) -> str:
-        profile_options = self.getRandomFingerprint(options)
+        if self.fingerprint_pool is not None:
+            profile_options = self.fingerprint_pool.get(options.get("os", "lin"))
+        else:
+            profile_options = self.getRandomFingerprint(options)
         navigator = options.get("navigator")
         if options.get("navigator"):
             resolution = navigator.get("resolution")
@@ -833,8 +1533,8 @@ class GoLogin(object):
         for k, v in options.items():
             profile[k] = v
 
-        response = requests.post(
-            f"{API_URL}/browser", headers=self.headers(), json=profile
+        response = self.transport.post(
+            f"{self.api_url}/browser", headers=self.headers(), json=profile
         )
         data: Dict[str, Any] = response.json()
 
@@ -851,7 +1551,11 @@ class GoLogin(object):
         profile_id = self.profile_id if profile_id is None else profile_id
         if profile_id is None:
             raise ValueError("profile_id is None")
-        requests.delete(API_URL + "/browser/" + profile_id, headers=self.headers())
+        self.transport.delete(
+            self.api_url + "/browser/" + profile_id, headers=self.headers()
+        )
+        if self.profile_cache is not None:
+            self.profile_cache.invalidate(profile_id)
 
     def update(self, options: Dict[str, Any]) -> None:
         self.profile_id = options.get("id")
@@ -863,30 +1567,44 @@ class GoLogin(object):
         if self.profile_id is None:
             raise ValueError("profile_id is None")
 
-        requests.put(
-            API_URL + "/browser/" + self.profile_id,
+        self.transport.put(
+            self.api_url + "/browser/" + self.profile_id,
             headers=self.headers(),
             json=profile,
         ).content.decode("utf-8")
+        if self.profile_cache is not None:
+            self.profile_cache.invalidate(self.profile_id)
         # print("update", resp)
         # return json.loads(resp)
 
     def waitDebuggingUrl(
-        self, delay_s: int, remote_orbita_url: str, try_count: int = 3
+        self, delay_s: float, remote_orbita_url: str, try_count: int = 3
     ) -> Dict[str, str]:
+        # Poll early and often while the browser is likely to come up, then back
+        # off towards delay_s. The overall budget stays delay_s * try_count unless
+        # remote_timeout is set.
         url = remote_orbita_url + "/json/version"
+        timeout = self.remote_timeout
+        if timeout is None:
+            timeout = delay_s * try_count
+        deadline = time.monotonic() + timeout
+        interval = min(self.remote_poll_interval, delay_s) if delay_s else 0
         wsUrl = ""
-        try_number = 1
-        while wsUrl == "":
-            time.sleep(delay_s)
+        while True:
             try:
-                response = json.loads(requests.get(url).content)
+                response = json.loads(
+                    self.transport.get(url, endpoint="devtools", retries=0).content
+                )
                 wsUrl = response.get("webSocketDebuggerUrl", "")
             except Exception:
                 pass
-            if try_number >= try_count:
+            if wsUrl:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
                 return {"status": "failure", "wsUrl": wsUrl}
-            try_number += 1
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, delay_s)
 
         remote_orbita_url_without_protocol = remote_orbita_url.replace("https://", "")
         wsUrl = wsUrl.replace("ws://", "wss://").replace(
@@ -895,21 +1613,24 @@ class GoLogin(object):
 
         return {"status": "success", "wsUrl": wsUrl}
 
-    def startRemote(self, delay_s: int = 3) -> Dict[str, str]:
-        if self.profile_id is None:
+    def startRemote(
+        self, delay_s: float = 3, profile_id: Union[str, None] = None
+    ) -> Dict[str, str]:
+        profile_id = self.profile_id if profile_id is None else profile_id
+        if profile_id is None:
             raise ValueError("profile_id is None")
-        responseJson = requests.post(
-            API_URL + "/browser/" + self.profile_id + "/web",
+        responseJson = self.transport.post(
+            self.api_url + "/browser/" + profile_id + "/web",
             headers=self.headers(),
             json={
                 "isNewCloudBrowser": self.is_new_cloud_browser,
                 "isHeadless": self.is_cloud_headless,
             },
-        ).content.decode("utf-8")
+        ).content
         response = json.loads(responseJson)
         log.debug("profileResponse %s", response)
 
-        remote_orbita_url = "https://" + self.profile_id + ".orbita.gologin.com"
+        remote_orbita_url = "https://" + profile_id + ".orbita.gologin.com"
         if self.is_new_cloud_browser:
             if not response["remoteOrbitaUrl"]:
                 raise Exception("Couldn' start the remote browser")
@@ -917,14 +1638,51 @@ class GoLogin(object):
 
         return self.waitDebuggingUrl(delay_s, remote_orbita_url=remote_orbita_url)
 
-    def stopRemote(self) -> None:
-        if self.profile_id is None:
+    def stopRemote(self, profile_id: Union[str, None] = None) -> None:
+        profile_id = self.profile_id if profile_id is None else profile_id
+        if profile_id is None:
             raise ValueError("profile_id is None")
-        requests.delete(
-            API_URL + "/browser/" + self.profile_id + "/web",
+        response = self.transport.delete(
+            self.api_url + "/browser/" + profile_id + "/web",
             headers=self.headers(),
             params={"isNewCloudBrowser": self.is_new_cloud_browser},
         )
+        # so stopRemoteMany() only reports browsers that were really stopped
+        response.raise_for_status()
+
+    def startRemoteMany(
+        self, profile_ids: List[str], max_workers: int = 8, delay_s: float = 3
+    ) -> Iterator[Tuple[str, Dict[str, str]]]:
+        # yields (profile_id, result) in the order the browsers become ready
+        def start(profile_id: str) -> Dict[str, str]:
+            try:
+                return self.startRemote(delay_s, profile_id=profile_id)
+            except Exception as e:
+                log.debug("startRemote %s failed: %s", profile_id, e)
+                return {"status": "failure", "wsUrl": "", "error": str(e)}
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(start, pid): pid for pid in profile_ids}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def stopRemoteMany(
+        self, profile_ids: List[str], max_workers: int = 8
+    ) -> Dict[str, bool]:
+        def stop(profile_id: str) -> bool:
+            try:
+                self.stopRemote(profile_id)
+            except Exception as e:
+                log.debug("stopRemote %s failed: %s", profile_id, e)
+                return False
+            return True
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return dict(zip(profile_ids, pool.map(stop, profile_ids)))
 
     def clearCookies(self, profile_id: Union[str, None] = None) -> Dict[str, str]:
         self.cleaningLocalCookies = True
@@ -932,8 +1690,9 @@ class GoLogin(object):
         profile_id = self.profile_id if profile_id is None else profile_id
         if profile_id is None:
             raise ValueError("profile_id is None")
-        resp = requests.post(
-            API_URL + "/browser/" + profile_id + "/cookies?cleanCookies=true",
+        resp = self.transport.post(
+            self.api_url + "/browser/" + profile_id + "/cookies?cleanCookies=true",
+            name="clearCookies",
             headers=self.headers(),
             json=[],
         )
@@ -947,15 +1706,17 @@ class GoLogin(object):
         self,
         profile_id: Union[str, None] = None,
         proxy: Dict[str, Union[str, int]] = {"mode": "none"},
-    ) -> Response:
+    ) -> "Response":
         profile_id = self.profile_id if profile_id is None else profile_id
         if profile_id is None:
             raise ValueError("profile_id is None")
-        response = requests.patch(
-            f"{API_URL}/browser/{profile_id}/proxy",
+        response = self.transport.patch(
+            f"{self.api_url}/browser/{profile_id}/proxy",
             headers=self.headers(),
             json=proxy,
         )
+        if self.profile_cache is not None:
+            self.profile_cache.invalidate(profile_id)
         return response
 
 
@@ -0,0 +1,302 @@
+import bisect
+import collections
+import logging
+import threading
+import time
+from types import TracebackType
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Type, Union
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+PHASES = (
+    "getProfile",
+    "download",
+    "extract",
+    "updatePreferences",
+    "getTimeZone",
+    "loadExtensions",
+    "spawn",
+    "devtools",
+    "injectCookies",
+    "extractCookies",
+    "sanitize",
+    "zip",
+    "upload",
+    "cleanup",
+)
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+
+# recent observations kept per histogram for percentiles; counts and sums
+# cover everything observed
+DEFAULT_WINDOW = 1024
+
+# seconds, roughly what a Prometheus client would pick for network + disk work
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+_retries = threading.local()
+# how many spans are open on this thread; nested spans (getTimeZone inside
+# updatePreferences) must not be added to their parent's time again
+_nesting = threading.local()
+
+
+def count_retry() -> None:
+    # called by Transport and RangedDownload before each retry, so spans can
+    # report how many retries the work inside them needed on this thread
+    _retries.count = getattr(_retries, "count", 0) + 1
+
+
+def retry_count() -> int:
+    return getattr(_retries, "count", 0)
+
+
+class Span:
+    __slots__ = (
+        "phase",
+        "profile_id",
+        "start",
+        "end",
+        "duration",
+        "bytes",
+        "retries",
+        "outcome",
+        "error",
+        "depth",
+        "attributes",
+    )
+
+    # False on NOOP_SPAN; lets callers skip work only a listener would see
+    active = True
+
+    def __init__(self, phase: str, profile_id: Optional[str] = None) -> None:
+        self.phase = phase
+        self.profile_id = profile_id
+        # wall-clock timestamps for logs; duration comes from perf_counter so
+        # clock adjustments during a start cannot skew it
+        self.start = 0.0
+        self.end = 0.0
+        self.duration = 0.0
+        self.bytes = 0
+        self.retries = 0
+        self.outcome = OUTCOME_OK
+        self.error: Optional[str] = None
+        self.depth = 0
+        self.attributes: Dict[str, Any] = {}
+
+    def add_bytes(self, count: int) -> None:
+        self.bytes += count
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def fail(self, error: Optional[str] = None) -> None:
+        self.outcome = OUTCOME_ERROR
+        self.error = error
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "phase": self.phase,
+            "profile_id": self.profile_id,
+            "start": self.start,
+            "end": self.end,
+            "duration": self.duration,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "outcome": self.outcome,
+            "error": self.error,
+            "depth": self.depth,
+            **self.attributes,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"Span(phase={self.phase!r}, profile_id={self.profile_id!r}, "
+            f"duration={self.duration:.4f}, bytes={self.bytes}, outcome={self.outcome!r})"
+        )
+
+
+class _ActiveSpan:
+    __slots__ = ("_instrumentation", "span", "_retries", "_started")
+
+    def __init__(self, instrumentation: "Instrumentation", span: Span) -> None:
+        self._instrumentation = instrumentation
+        self.span = span
+        self._retries = 0
+        self._started = 0.0
+
+    def __enter__(self) -> Span:
+        self._retries = retry_count()
+        self.span.depth = getattr(_nesting, "depth", 0)
+        _nesting.depth = self.span.depth + 1
+        self.span.start = time.time()
+        self._started = time.perf_counter()
+        return self.span
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        span = self.span
+        span.duration = time.perf_counter() - self._started
+        span.end = span.start + span.duration
+        _nesting.depth = span.depth
+        span.retries = retry_count() - self._retries
+        if exc_type is not None:
+            span.outcome = OUTCOME_ERROR
+            span.error = exc_type.__name__
+        self._instrumentation.emit(span)
+
+
+class _NoopSpan:
+    # Shared by every phase while nothing is registered, so an uninstrumented
+    # start()/stop() does not allocate or read the clock.
+    __slots__ = ()
+
+    active = False
+    phase = ""
+    profile_id = None
+    bytes = 0
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        return None
+
+    def add_bytes(self, count: int) -> None:
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        return None
+
+    def fail(self, error: Optional[str] = None) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+Listener = Callable[[Span], None]
+
+
+class Instrumentation:
+    def __init__(self) -> None:
+        self._listeners: Tuple[Listener, ...] = ()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._listeners)
+
+    def add_listener(self, listener: Union[Listener, Any]) -> Listener:
+        # Accepts a plain callable or a sink object exposing on_span().
+        callback = getattr(listener, "on_span", listener)
+        if not callable(callback):
+            raise TypeError("listener must be callable or have an on_span method")
+        with self._lock:
+            # instances sharing one Instrumentation add the same sink
+            if callback not in self._listeners:
+                self._listeners = self._listeners + (callback,)
+        return callback
+
+    def remove_listener(self, listener: Union[Listener, Any]) -> None:
+        callback = getattr(listener, "on_span", listener)
+        with self._lock:
+            self._listeners = tuple(x for x in self._listeners if x != callback)
+
+    def span(
+        self, phase: str, profile_id: Optional[str] = None
+    ) -> Union[_ActiveSpan, _NoopSpan]:
+        if not self._listeners:
+            return NOOP_SPAN
+        return _ActiveSpan(self, Span(phase, profile_id))
+
+    def emit(self, span: Span) -> None:
+        for listener in self._listeners:
+            try:
+                listener(span)
+            except Exception as e:
+                log.exception("instrumentation listener failed: %s", e)
+
+
+class Histogram:
+    def __init__(
+        self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = DEFAULT_WINDOW
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._window: Deque[float] = collections.deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self._window.append(value)
+
+    def percentile(self, q: float) -> float:
+        # over the most recent observations only
+        return percentile(list(self._window), q)
+
+
+class HistogramSink:
+    def __init__(
+        self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = DEFAULT_WINDOW
+    ) -> None:
+        self._buckets = buckets
+        self._window = window
+        self._lock = threading.Lock()
+        self.durations: Dict[Tuple[str, str], Histogram] = {}
+        self.bytes: Dict[str, int] = {}
+
+    def on_span(self, span: Span) -> None:
+        key = (span.phase, span.outcome)
+        with self._lock:
+            histogram = self.durations.get(key)
+            if histogram is None:
+                histogram = self.durations[key] = Histogram(self._buckets, self._window)
+            histogram.observe(span.duration)
+            self.bytes[span.phase] = self.bytes.get(span.phase, 0) + span.bytes
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for (phase, outcome), histogram in sorted(self.durations.items()):
+                result[f"{phase}:{outcome}"] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "p50": histogram.percentile(50),
+                    "p95": histogram.percentile(95),
+                    "p99": histogram.percentile(99),
+                    "bytes": self.bytes.get(phase, 0),
+                }
+        return result
+
+
+def percentile(values: List[float], q: float, is_sorted: bool = False) -> float:
+    if not values:
+        return 0.0
+    data = values if is_sorted else sorted(values)
+    rank = (len(data) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(data) - 1)
+    return data[low] + (data[high] - data[low]) * (rank - low)
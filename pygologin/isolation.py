@@ -0,0 +1,335 @@
+import glob
+import logging
+import math
+import os
+import re
+import sys
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+NODE_ROOT = "/sys/devices/system/node"
+CPU_PERIOD = 100000
+CONTROLLERS = ("cpu", "memory", "pids")
+
+
+def parse_cpulist(value: str) -> List[int]:
+    # "0-3,8,10-11" -> [0, 1, 2, 3, 8, 10, 11]
+    cpus: List[int] = []
+    for part in value.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def own_cgroup(path: str = "/proc/self/cgroup") -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return line[3:].strip()
+    except OSError:
+        pass
+    return None
+
+
+class CgroupV2:
+    # creates <base>/<prefix>/<name> groups; base must be a cgroup v2
+    # directory we may write to, e.g. a systemd scope with Delegate=yes.
+    # If this process lives in base it moves to <base>/<leaf> first: a
+    # cgroup holding processes cannot enable controllers for its children
+    def __init__(
+        self,
+        root: str = CGROUP_ROOT,
+        base: Optional[str] = None,
+        prefix: str = "pygologin",
+        leaf: str = "supervisor",
+    ) -> None:
+        self.root = root
+        if base is None:
+            base = os.path.join(root, (own_cgroup() or "/").lstrip("/"))
+        self.base = base
+        self.parent = os.path.join(base, prefix)
+        self.leaf = os.path.join(base, leaf)
+        self._available: Optional[bool] = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        with self._lock:
+            if self._available is None:
+                self._available = self._setup()
+            return self._available
+
+    def _setup(self) -> bool:
+        controllers_path = os.path.join(self.base, "cgroup.controllers")
+        try:
+            with open(controllers_path, "r") as f:
+                controllers = set(f.read().split())
+        except OSError:
+            log.debug("no cgroup v2 hierarchy at %s", self.base)
+            return False
+        wanted = [c for c in CONTROLLERS if c in controllers]
+        try:
+            os.makedirs(self.parent, exist_ok=True)
+            if os.getpid() in self._procs(self.base):
+                os.makedirs(self.leaf, exist_ok=True)
+                self._write(os.path.join(self.leaf, "cgroup.procs"), str(os.getpid()))
+                log.debug("moved pid %d to %s", os.getpid(), self.leaf)
+            enable = " ".join("+" + c for c in wanted)
+            # still EBUSY if other processes are left in base
+            self._write(os.path.join(self.base, "cgroup.subtree_control"), enable)
+            self._write(os.path.join(self.parent, "cgroup.subtree_control"), enable)
+        except OSError as e:
+            log.debug("cannot delegate controllers under %s: %s", self.base, e)
+            return False
+        return True
+
+    def _procs(self, path: str) -> List[int]:
+        try:
+            with open(os.path.join(path, "cgroup.procs"), "r") as f:
+                return [int(pid) for pid in f.read().split()]
+        except (OSError, ValueError):
+            return []
+
+    def _write(self, path: str, value: str) -> None:
+        with open(path, "w") as f:
+            f.write(value)
+
+    def group(
+        self,
+        name: str,
+        memory_max: Optional[int] = None,
+        cpu_max: Optional[float] = None,
+        pids_max: Optional[int] = None,
+    ) -> str:
+        # cpu_max is in cores, e.g. 1.5
+        path = os.path.join(self.parent, re.sub(r"[^\w.-]", "_", name))
+        os.makedirs(path, exist_ok=True)
+        if memory_max is not None:
+            self._write(os.path.join(path, "memory.max"), str(memory_max))
+        if cpu_max is not None:
+            quota = max(1000, int(cpu_max * CPU_PERIOD))
+            self._write(os.path.join(path, "cpu.max"), f"{quota} {CPU_PERIOD}")
+        if pids_max is not None:
+            self._write(os.path.join(path, "pids.max"), str(pids_max))
+        return path
+
+    def remove(self, path: str) -> bool:
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            log.debug("cgroup %s not removed: %s", path, e)
+            return False
+        return True
+
+
+class CpuAllocator:
+    # hands out CPU sets, least loaded NUMA node first, then least loaded
+    # cores within it
+    def __init__(
+        self,
+        cpus: Optional[Iterable[int]] = None,
+        nodes: Optional[Dict[int, List[int]]] = None,
+    ) -> None:
+        if cpus is None:
+            if hasattr(os, "sched_getaffinity"):
+                cpus = os.sched_getaffinity(0)
+            else:
+                cpus = range(os.cpu_count() or 1)
+        usable = sorted(set(cpus))
+        if nodes is None:
+            nodes = self.read_nodes()
+        self.nodes: Dict[int, List[int]] = {}
+        for node, node_cpus in sorted(nodes.items()):
+            node_cpus = [cpu for cpu in node_cpus if cpu in usable]
+            if node_cpus:
+                self.nodes[node] = node_cpus
+        assigned = {cpu for node_cpus in self.nodes.values() for cpu in node_cpus}
+        leftover = [cpu for cpu in usable if cpu not in assigned]
+        if leftover:
+            self.nodes.setdefault(-1, []).extend(leftover)
+        self.load: Dict[int, int] = {cpu: 0 for cpu in usable}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def read_nodes(root: str = NODE_ROOT) -> Dict[int, List[int]]:
+        nodes = {}
+        for path in glob.glob(os.path.join(root, "node[0-9]*", "cpulist")):
+            node = int(os.path.basename(os.path.dirname(path))[4:])
+            try:
+                with open(path, "r") as f:
+                    nodes[node] = parse_cpulist(f.read())
+            except (OSError, ValueError):
+                continue
+        return nodes
+
+    def acquire(self, count: int = 1) -> List[int]:
+        with self._lock:
+            count = min(count, len(self.load))
+
+            def node_load(item: Tuple[int, List[int]]) -> Tuple[float, bool, int]:
+                # cpus outside any known node (-1) come after the real nodes
+                node, cpus = item
+                return sum(self.load[cpu] for cpu in cpus) / len(cpus), node < 0, node
+
+            candidates = [
+                item for item in self.nodes.items() if len(item[1]) >= count
+            ] or list(self.nodes.items())
+            _, node_cpus = min(candidates, key=node_load)
+            pool = node_cpus if len(node_cpus) >= count else list(self.load)
+            chosen = sorted(pool, key=lambda cpu: (self.load[cpu], cpu))[:count]
+            for cpu in chosen:
+                self.load[cpu] += 1
+            return sorted(chosen)
+
+    def release(self, cpus: Iterable[int]) -> None:
+        with self._lock:
+            for cpu in cpus:
+                if self.load.get(cpu, 0) > 0:
+                    self.load[cpu] -= 1
+
+    def usage(self) -> Dict[int, int]:
+        with self._lock:
+            return dict(self.load)
+
+
+class Placement:
+    __slots__ = ("profile_id", "cgroup", "owns_cgroup", "cpus", "rlimits")
+
+    def __init__(self, profile_id: str) -> None:
+        self.profile_id = profile_id
+        self.cgroup: Optional[str] = None
+        self.owns_cgroup = False
+        self.cpus: List[int] = []
+        self.rlimits: List[Tuple[int, int]] = []
+
+    def __repr__(self) -> str:
+        return (
+            f"Placement({self.profile_id!r}, cgroup={self.cgroup!r}, cpus={self.cpus})"
+        )
+
+
+class Isolation:
+    def __init__(
+        self,
+        memory_max: Optional[int] = None,
+        cpu_max: Optional[float] = None,
+        pids_max: Optional[int] = None,
+        cpus_per_browser: int = 0,
+        group: Optional[str] = None,
+        cgroups: Optional[CgroupV2] = None,
+        allocator: Optional[CpuAllocator] = None,
+    ) -> None:
+        # group puts every browser in one shared cgroup instead of one each
+        self.memory_max = memory_max
+        self.cpu_max = cpu_max
+        self.pids_max = pids_max
+        self.cpus_per_browser = cpus_per_browser
+        self.group = group
+        self.supported = sys.platform.startswith("linux")
+        self.cgroups = cgroups
+        if self.cgroups is None and self.supported:
+            self.cgroups = CgroupV2()
+        self.allocator = allocator
+        # without cgroups, cpu_max is enforced by pinning to that many CPUs
+        if (
+            self.allocator is None
+            and (cpus_per_browser or cpu_max is not None)
+            and self.supported
+        ):
+            self.allocator = CpuAllocator()
+        self._warned = False
+
+    def limited(self) -> bool:
+        return any(
+            value is not None
+            for value in (self.memory_max, self.cpu_max, self.pids_max)
+        )
+
+    def prepare(self, profile_id: str) -> Placement:
+        placement = Placement(profile_id)
+        if not self.supported:
+            return placement
+        cpus = self.cpus_per_browser
+        if self.limited():
+            if self.cgroups is not None and self.cgroups.available():
+                placement.cgroup = self.cgroups.group(
+                    self.group or profile_id,
+                    memory_max=self.memory_max,
+                    cpu_max=self.cpu_max,
+                    pids_max=self.pids_max,
+                )
+                placement.owns_cgroup = self.group is None
+            else:
+                cpus = self._fallback(placement, cpus)
+        if self.allocator is not None and cpus:
+            placement.cpus = self.allocator.acquire(cpus)
+        return placement
+
+    def _fallback(self, placement: Placement, cpus: int) -> int:
+        # returns how many CPUs to pin the browser to
+        import resource
+
+        if not self._warned:
+            log.warning(
+                "cgroup v2 delegation unavailable, using rlimits and CPU "
+                "affinity; pids_max counts every process of this user"
+            )
+            self._warned = True
+        if self.memory_max is not None:
+            # RLIMIT_DATA rather than RLIMIT_AS: V8 and PartitionAlloc
+            # reserve large PROT_NONE regions that only count towards AS
+            placement.rlimits.append(
+                (resource.RLIMIT_DATA, self.memory_max),
+            )
+        if self.pids_max is not None:
+            placement.rlimits.append((resource.RLIMIT_NPROC, self.pids_max))
+        if self.cpu_max is not None:
+            # whole cores only: 1.5 becomes 2
+            cores = max(1, math.ceil(self.cpu_max))
+            cpus = min(cpus, cores) if cpus else cores
+        return cpus
+
+    def preexec(self, placement: Placement) -> Optional[Callable[[], None]]:
+        # runs in the child between fork and exec: only plain os calls here
+        if placement.cgroup is None and not placement.rlimits and not placement.cpus:
+            return None
+        procs = (
+            os.path.join(placement.cgroup, "cgroup.procs")
+            if placement.cgroup is not None
+            else None
+        )
+        rlimits = list(placement.rlimits)
+        cpus = set(placement.cpus)
+        if rlimits:
+            import resource
+
+            setrlimit = resource.setrlimit
+
+        def apply() -> None:
+            if procs is not None:
+                fd = os.open(procs, os.O_WRONLY)
+                try:
+                    os.write(fd, b"0")  # "0" moves the writing process
+                finally:
+                    os.close(fd)
+            for limit, value in rlimits:
+                setrlimit(limit, (value, value))
+            if cpus:
+                os.sched_setaffinity(0, cpus)
+
+        return apply
+
+    def release(self, placement: Placement) -> None:
+        if self.allocator is not None and placement.cpus:
+            self.allocator.release(placement.cpus)
+            placement.cpus = []
+        if placement.owns_cgroup and placement.cgroup is not None:
+            if self.cgroups is not None:
+                self.cgroups.remove(placement.cgroup)
+            placement.cgroup = None
@@ -0,0 +1,141 @@
+import codecs
+import json
+import logging
+from typing import Any, Iterable, Iterator, List, Sequence, TypeVar
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+NUMBER_START = "-0123456789"
+NUMBER_CHARS = "-+.eE0123456789"
+
+T = TypeVar("T")
+
+
+class JSONStreamError(ValueError):
+    pass
+
+
+class _Reader:
+    # a text buffer over byte chunks; consumed text is dropped as items are
+    # parsed, so only the item being decoded is held in memory
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.json = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            text = self.decoder.decode(chunk)
+            if text:
+                self.buffer = self.buffer[self.pos :] + text
+                self.pos = 0
+                return True
+        self.buffer = self.buffer[self.pos :] + self.decoder.decode(b"", final=True)
+        self.pos = 0
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        # next non-whitespace character, "" at the end of the stream
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise JSONStreamError(
+                f"expected {char!r}, got {self.peek() or 'end of stream'!r}"
+            )
+        self.pos += 1
+
+    def value(self) -> Any:
+        char = self.peek()
+        if char and char in NUMBER_START:
+            # a number may continue in the next chunk; read up to a delimiter
+            end = self.pos
+            while True:
+                while end < len(self.buffer) and self.buffer[end] in NUMBER_CHARS:
+                    end += 1
+                if end < len(self.buffer):
+                    break
+                offset = end - self.pos
+                if not self.fill():
+                    break
+                end = self.pos + offset
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if not self.fill():
+                    raise JSONStreamError(f"truncated JSON: {e}") from e
+                continue
+            self.pos = end
+            return value
+
+
+def iter_items(chunks: Iterable[bytes], path: Sequence[str] = ()) -> Iterator[Any]:
+    # yields the elements of the array at path, e.g. ("profiles",) for
+    # {"profiles": [...]}; siblings along the path are parsed and dropped
+    reader = _Reader(chunks)
+    for key in path:
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                raise JSONStreamError(f"key {key!r} not found")
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.value()
+            if reader.peek() == ",":
+                reader.pos += 1
+    if reader.peek() == "n":
+        reader.value()  # null instead of an empty array
+        return
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value()
+        char = reader.peek()
+        reader.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise JSONStreamError(
+                f"expected ',' or ']', got {char or 'end of stream'!r}"
+            )
+
+
+def iter_response_items(
+    response: Any, path: Sequence[str] = (), chunk_size: int = CHUNK_SIZE
+) -> Iterator[Any]:
+    # response must be requested with stream=True
+    with response:
+        response.raise_for_status()
+        yield from iter_items(response.iter_content(chunk_size=chunk_size), path)
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    batch: List[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,441 @@
+import abc
+import contextlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from pygologin.exceptions import LeaseLostError, ProfileInUseError
+
+if TYPE_CHECKING:
+    import sqlite3
+
+    from pygologin.transport import Transport
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class Lease:
+    # token grows every time the profile changes hands, so a holder that
+    # stalled past its ttl can tell it was replaced
+    __slots__ = ("profile_id", "owner", "token", "expires")
+
+    def __init__(self, profile_id: str, owner: str, token: int, expires: float) -> None:
+        self.profile_id = profile_id
+        self.owner = owner
+        self.token = token
+        self.expires = expires
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.time())
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "owner": self.owner,
+            "token": self.token,
+            "expires": self.expires,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Lease":
+        return cls(
+            str(data["profile_id"]),
+            str(data["owner"]),
+            int(data["token"]),
+            float(data["expires"]),
+        )
+
+    def __repr__(self) -> str:
+        return f"Lease({self.profile_id!r}, owner={self.owner!r}, token={self.token})"
+
+
+def _grant(
+    current: Optional[Lease], profile_id: str, owner: str, ttl: float, now: float
+) -> Lease:
+    # returns the new lease, or current when someone else holds it; asking
+    # again as the holder extends the lease under the same token
+    if current is not None and current.owner and current.expires > now:
+        if current.owner != owner:
+            return current
+        return Lease(profile_id, owner, current.token, now + ttl)
+    token = current.token + 1 if current is not None else 1
+    return Lease(profile_id, owner, token, now + ttl)
+
+
+def _renewed(current: Optional[Lease], lease: Lease, ttl: float, now: float) -> Lease:
+    # an expired lease can still be renewed as long as nobody took it since
+    if current is None or current.owner != lease.owner or current.token != lease.token:
+        holder = f"{current.owner} (token {current.token})" if current else "nobody"
+        raise LeaseLostError(
+            f"lease {lease.token} on profile {lease.profile_id} was lost; "
+            f"it is now held by {holder}"
+        )
+    return Lease(lease.profile_id, lease.owner, lease.token, now + ttl)
+
+
+class LeaseBackend(abc.ABC):
+    # released leases stay behind with no owner so tokens keep growing
+    @abc.abstractmethod
+    def acquire(self, profile_id: str, owner: str, ttl: float) -> Lease: ...
+
+    @abc.abstractmethod
+    def renew(self, lease: Lease, ttl: float) -> Lease: ...
+
+    @abc.abstractmethod
+    def release(self, lease: Lease) -> bool: ...
+
+    @abc.abstractmethod
+    def get(self, profile_id: str) -> Optional[Lease]: ...
+
+
+class MemoryLeaseBackend(LeaseBackend):
+    # for a single process, and behind an HTTP lease endpoint
+    def __init__(self) -> None:
+        self.leases: Dict[str, Lease] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, profile_id: str, owner: str, ttl: float) -> Lease:
+        with self._lock:
+            lease = _grant(
+                self.leases.get(profile_id), profile_id, owner, ttl, time.time()
+            )
+            self.leases[profile_id] = lease
+            return lease
+
+    def renew(self, lease: Lease, ttl: float) -> Lease:
+        with self._lock:
+            renewed = _renewed(
+                self.leases.get(lease.profile_id), lease, ttl, time.time()
+            )
+            self.leases[lease.profile_id] = renewed
+            return renewed
+
+    def release(self, lease: Lease) -> bool:
+        with self._lock:
+            current = self.leases.get(lease.profile_id)
+            if (
+                current is None
+                or current.owner != lease.owner
+                or current.token != lease.token
+            ):
+                return False
+            self.leases[lease.profile_id] = Lease(lease.profile_id, "", lease.token, 0)
+            return True
+
+    def get(self, profile_id: str) -> Optional[Lease]:
+        with self._lock:
+            lease = self.leases.get(profile_id)
+        if lease is None or not lease.owner or lease.expires <= time.time():
+            return None
+        return lease
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    # one row per profile in a database file every host can open; each
+    # change runs in a BEGIN IMMEDIATE transaction, which SQLite serializes
+    # across processes with its file locks
+    def __init__(self, path: str, timeout: float = 30) -> None:
+        self.path = path
+        self.timeout = timeout
+        with self._transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS leases (profile_id TEXT PRIMARY KEY, "
+                "owner TEXT NOT NULL, token INTEGER NOT NULL, expires REAL NOT NULL)"
+            )
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator["sqlite3.Connection"]:
+        import sqlite3
+
+        db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def _read(self, db: "sqlite3.Connection", profile_id: str) -> Optional[Lease]:
+        row = db.execute(
+            "SELECT owner, token, expires FROM leases WHERE profile_id = ?",
+            (profile_id,),
+        ).fetchone()
+        return Lease(profile_id, row[0], row[1], row[2]) if row else None
+
+    def _write(self, db: "sqlite3.Connection", lease: Lease) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO leases (profile_id, owner, token, expires) "
+            "VALUES (?, ?, ?, ?)",
+            (lease.profile_id, lease.owner, lease.token, lease.expires),
+        )
+
+    def acquire(self, profile_id: str, owner: str, ttl: float) -> Lease:
+        with self._transaction() as db:
+            current = self._read(db, profile_id)
+            lease = _grant(current, profile_id, owner, ttl, time.time())
+            if lease is not current:
+                self._write(db, lease)
+            return lease
+
+    def renew(self, lease: Lease, ttl: float) -> Lease:
+        with self._transaction() as db:
+            renewed = _renewed(
+                self._read(db, lease.profile_id), lease, ttl, time.time()
+            )
+            self._write(db, renewed)
+            return renewed
+
+    def release(self, lease: Lease) -> bool:
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE leases SET owner = '', expires = 0 "
+                "WHERE profile_id = ? AND owner = ? AND token = ?",
+                (lease.profile_id, lease.owner, lease.token),
+            )
+            return cursor.rowcount > 0
+
+    def get(self, profile_id: str) -> Optional[Lease]:
+        with self._transaction() as db:
+            lease = self._read(db, profile_id)
+        if lease is None or not lease.owner or lease.expires <= time.time():
+            return None
+        return lease
+
+
+class HTTPLeaseBackend(LeaseBackend):
+    # a client for handle_lease_request() served under url, e.g. by an agent
+    # started with --lease-db or by pygologin.testing.StandInServer
+    def __init__(
+        self,
+        url: str,
+        transport: Optional["Transport"] = None,
+        auth_token: Optional[str] = None,
+    ) -> None:
+        if transport is None:
+            from pygologin.transport import Transport
+
+            transport = Transport()
+        self.url = url.rstrip("/")
+        self.transport = transport
+        self.auth_token = auth_token
+
+    def _call(self, profile_id: str, action: str, body: Dict[str, Any]) -> Any:
+        headers = {}
+        if self.auth_token:
+            headers["Authorization"] = "Bearer " + self.auth_token
+        # every call is safe to repeat: acquire returns the lease already
+        # granted to the same owner, and renew and release name the token
+        return self.transport.post(
+            f"{self.url}/{profile_id}/{action}",
+            name="lease",
+            idempotent=True,
+            json=body,
+            headers=headers,
+        )
+
+    def acquire(self, profile_id: str, owner: str, ttl: float) -> Lease:
+        response = self._call(profile_id, "acquire", {"owner": owner, "ttl": ttl})
+        if response.status_code != 409:
+            response.raise_for_status()
+        return Lease.from_dict(response.json()["lease"])
+
+    def renew(self, lease: Lease, ttl: float) -> Lease:
+        response = self._call(
+            lease.profile_id, "renew", {"lease": lease.as_dict(), "ttl": ttl}
+        )
+        if response.status_code == 409:
+            raise LeaseLostError(response.json().get("message", "lease lost"))
+        response.raise_for_status()
+        return Lease.from_dict(response.json()["lease"])
+
+    def release(self, lease: Lease) -> bool:
+        response = self._call(lease.profile_id, "release", {"lease": lease.as_dict()})
+        response.raise_for_status()
+        return bool(response.json()["released"])
+
+    def get(self, profile_id: str) -> Optional[Lease]:
+        headers = {}
+        if self.auth_token:
+            headers["Authorization"] = "Bearer " + self.auth_token
+        response = self.transport.get(
+            f"{self.url}/{profile_id}", name="lease", headers=headers
+        )
+        response.raise_for_status()
+        data = response.json()["lease"]
+        return Lease.from_dict(data) if data else None
+
+
+def handle_lease_request(
+    backend: LeaseBackend, method: str, parts: List[str], body: Dict[str, Any]
+) -> Tuple[int, Dict[str, Any]]:
+    # parts is the path below the lease url: [profile_id] or
+    # [profile_id, action]; raises KeyError for anything else
+    if len(parts) == 1 and method == "GET":
+        lease = backend.get(parts[0])
+        return 200, {"lease": lease.as_dict() if lease else None}
+    if len(parts) != 2 or method != "POST":
+        raise KeyError("/".join(parts))
+    profile_id, action = parts
+    if action == "acquire":
+        owner = str(body["owner"])
+        lease = backend.acquire(profile_id, owner, float(body["ttl"]))
+        return 200 if lease.owner == owner else 409, {"lease": lease.as_dict()}
+    if action == "renew":
+        try:
+            lease = backend.renew(Lease.from_dict(body["lease"]), float(body["ttl"]))
+        except LeaseLostError as e:
+            return 409, {"error": type(e).__name__, "message": str(e)}
+        return 200, {"lease": lease.as_dict()}
+    if action == "release":
+        return 200, {"released": backend.release(Lease.from_dict(body["lease"]))}
+    raise KeyError(action)
+
+
+class LeaseCoordinator:
+    # the leases this process holds, renewed every renew_interval (ttl / 3)
+    # on a background thread until released; on_lost(lease) is called when
+    # a renewal finds another holder. The thread exits while nothing is held
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        owner: Optional[str] = None,
+        ttl: float = 60,
+        renew_interval: Optional[float] = None,
+        on_lost: Optional[Callable[[Lease], Any]] = None,
+    ) -> None:
+        self.backend = backend
+        self.owner = (
+            owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+        self.ttl = ttl
+        self.renew_interval = renew_interval or ttl / 3
+        self.on_lost = on_lost
+        self.held: Dict[str, Lease] = {}
+        self.lost = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def acquire(self, profile_id: str, timeout: float = 0) -> Lease:
+        with self._lock:
+            if profile_id in self.held:
+                raise ProfileInUseError(
+                    f"profile {profile_id} is already leased by this process"
+                )
+        deadline = time.monotonic() + timeout
+        delay = min(1.0, self.ttl / 10)
+        while True:
+            lease = self.backend.acquire(profile_id, self.owner, self.ttl)
+            if lease.owner == self.owner:
+                break
+            if time.monotonic() >= deadline:
+                raise ProfileInUseError(
+                    f"profile {profile_id} is leased by {lease.owner} "
+                    f"for {lease.remaining:.0f}s more"
+                )
+            time.sleep(delay)
+        with self._lock:
+            self.held[profile_id] = lease
+            if self._thread is None:
+                self._stop = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._keepalive,
+                    args=(self._stop,),
+                    name="pygologin-leases",
+                    daemon=True,
+                )
+                self._thread.start()
+        log.debug("leased %s with token %d", profile_id, lease.token)
+        return lease
+
+    def renew(self, profile_id: str) -> Lease:
+        # raises LeaseLostError once another holder has the profile
+        with self._lock:
+            lease = self.held.get(profile_id)
+        renewed = self._renew(lease) if lease is not None else None
+        if renewed is None:
+            raise LeaseLostError(f"profile {profile_id} is not leased by this process")
+        return renewed
+
+    def _renew(self, lease: Lease) -> Optional[Lease]:
+        # None when the lease was released while this renewal was under way
+        try:
+            renewed = self.backend.renew(lease, self.ttl)
+        except LeaseLostError:
+            with self._lock:
+                if self.held.get(lease.profile_id) is not lease:
+                    return None
+                del self.held[lease.profile_id]
+                self.lost += 1
+            raise
+        with self._lock:
+            if self.held.get(lease.profile_id) is not lease:
+                return None
+            self.held[lease.profile_id] = renewed
+        return renewed
+
+    def release(self, profile_id: str) -> bool:
+        with self._lock:
+            lease = self.held.pop(profile_id, None)
+        if lease is None:
+            return False
+        try:
+            return self.backend.release(lease)
+        except Exception as e:
+            # it expires after ttl anyway
+            log.warning("releasing the lease on %s failed: %s", profile_id, e)
+            return False
+
+    def _keepalive(self, stop: threading.Event) -> None:
+        while not stop.wait(self.renew_interval):
+            with self._lock:
+                if not self.held:
+                    # the next acquire() starts another thread
+                    if self._thread is threading.current_thread():
+                        self._thread = None
+                    return
+                held = list(self.held.values())
+            for lease in held:
+                try:
+                    self._renew(lease)
+                except LeaseLostError as e:
+                    log.error("%s", e)
+                    if self.on_lost is not None:
+                        self.on_lost(lease)
+                except Exception as e:
+                    # the next round retries; the lease survives until ttl
+                    log.warning(
+                        "renewing the lease on %s failed: %s", lease.profile_id, e
+                    )
+
+    def close(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stop.set()
+        if thread is not None:
+            thread.join()
+        for profile_id in list(self.held):
+            self.release(profile_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"owner": self.owner, "held": len(self.held), "lost": self.lost}
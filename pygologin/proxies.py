@@ -0,0 +1,256 @@
+import json
+import logging
+import socket
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from pygologin.cache import TTLCache
+
+# requests (through Transport) and concurrent.futures are imported on first
+# probe, so GoLogin can use the formatting helpers without paying for them
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from pygologin.transport import Transport
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+ProxyKey = Tuple[Any, Any, Any, Any]
+
+
+def proxy_url(proxy: Dict[str, Any]) -> str:
+    # socks5h resolves hostnames on the proxy, as the browser does
+    mode: str = (
+        "socks5h" if proxy.get("mode") == "socks5" else proxy.get("mode", "http")
+    )
+    address: str = proxy.get("host", "") + ":" + str(proxy.get("port", 80))
+    if proxy.get("username", "") == "":
+        return mode + "://" + address
+    credentials: str = proxy.get("username", "") + ":" + proxy.get("password")
+    return mode + "://" + credentials + "@" + address
+
+
+def proxy_key(proxy: Optional[Dict[str, Any]]) -> ProxyKey:
+    # also the timezone cache key: one geo lookup per exit, not per profile
+    proxy = proxy or {}
+    return (
+        proxy.get("mode"),
+        proxy.get("host"),
+        proxy.get("port"),
+        proxy.get("username"),
+    )
+
+
+def profile_proxy(profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # the proxy a start of this profile goes through, or None for none
+    proxy: Optional[Dict[str, Any]] = profile.get("proxy")
+    if proxy and proxy.get("mode") in ("gologin", "tor"):
+        server = profile.get("autoProxyServer") or ""
+        host, _, port = server.split("://")[-1].partition(":")
+        return {
+            "mode": "http",
+            "host": host,
+            "port": port,
+            "username": profile.get("autoProxyUsername"),
+            "password": profile.get("autoProxyPassword"),
+            "timezone": profile.get("autoProxyTimezone", "us"),
+        }
+    if not proxy or proxy.get("mode") == "none":
+        return None
+    if proxy.get("mode") in (None, "geolocation"):
+        return {**proxy, "mode": "http"}
+    return proxy
+
+
+class ProbeResult:
+    # connect is the TCP handshake with the proxy, first_byte the time from
+    # sending the timezone request through it to the response headers
+    def __init__(self, proxy: Dict[str, Any]) -> None:
+        self.key = proxy_key(proxy)
+        self.host: Optional[str] = proxy.get("host")
+        self.alive = False
+        self.connect: Optional[float] = None
+        self.first_byte: Optional[float] = None
+        self.status: Optional[int] = None
+        self.error: Optional[str] = None
+        self.timezone: Optional[Dict[str, Any]] = None
+        self.checked = time.time()
+
+    @property
+    def latency(self) -> Optional[float]:
+        if self.connect is None or self.first_byte is None:
+            return None
+        return self.connect + self.first_byte
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": self.key[0],
+            "host": self.host,
+            "port": self.key[2],
+            "alive": self.alive,
+            "connect": self.connect,
+            "first_byte": self.first_byte,
+            "status": self.status,
+            "error": self.error,
+            "timezone": (self.timezone or {}).get("timezone"),
+            "checked": self.checked,
+        }
+
+    def __repr__(self) -> str:
+        state = f"{self.latency:.3f}s" if self.alive else f"dead: {self.error}"
+        return f"ProbeResult({self.host!r}, {state})"
+
+
+class ProxyProber:
+    # checks proxies concurrently with the request getTimeZone() makes at
+    # start; results are cached for ttl seconds (dead_ttl for failures) and
+    # every successful lookup is stored in timezone_cache for the start
+    def __init__(
+        self,
+        timezone_url: str,
+        transport: Optional["Transport"] = None,
+        timeout: float = 10.0,
+        workers: int = 16,
+        ttl: float = 300,
+        dead_ttl: Optional[float] = None,
+        slow: Optional[float] = None,
+        timezone_cache: Optional[TTLCache[Dict[str, Any]]] = None,
+    ) -> None:
+        self.timezone_url = timezone_url
+        self.timeout = timeout
+        self.workers = workers
+        self.dead_ttl = ttl if dead_ttl is None else dead_ttl
+        self.slow = slow
+        self.timezone_cache = timezone_cache
+        self.results: TTLCache[ProbeResult] = TTLCache(ttl)
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._pool: Optional["ThreadPoolExecutor"] = None
+
+    @property
+    def transport(self) -> "Transport":
+        with self._lock:
+            if self._transport is None:
+                from pygologin.transport import Transport
+
+                self._transport = Transport()
+            return self._transport
+
+    def usable(self, result: Optional[ProbeResult]) -> bool:
+        # None means the profile runs without a proxy
+        if result is None:
+            return True
+        if not result.alive:
+            return False
+        return self.slow is None or (result.latency or 0.0) <= self.slow
+
+    def probe(self, proxy: Dict[str, Any], refresh: bool = False) -> ProbeResult:
+        key = proxy_key(proxy)
+        if refresh:
+            self.results.invalidate(key)
+        checked: List[ProbeResult] = []
+
+        def load() -> ProbeResult:
+            checked.append(self.check(proxy))
+            return checked[0]
+
+        result = self.results.get_or_load(key, load)
+        if checked and not result.alive:
+            # get_or_load stored it for ttl; failures are rechecked sooner
+            self.results.put(key, result, self.dead_ttl)
+        return result
+
+    def check(self, proxy: Dict[str, Any]) -> ProbeResult:
+        result = ProbeResult(proxy)
+        try:
+            started = time.monotonic()
+            sock = socket.create_connection(
+                (proxy.get("host", ""), int(proxy.get("port", 80))), self.timeout
+            )
+            result.connect = time.monotonic() - started
+            sock.close()
+
+            url = proxy_url(proxy)
+            started = time.monotonic()
+            response = self.transport.get(
+                self.timezone_url,
+                endpoint="timezone",
+                name="probeProxy",
+                retries=0,
+                timeout=(self.timeout, self.timeout),
+                proxies={"http": url, "https": url},
+                stream=True,
+            )
+            # stream=True returns as soon as the headers are in
+            result.first_byte = time.monotonic() - started
+            with response:
+                result.status = response.status_code
+                if not response.ok:
+                    result.error = f"HTTP {response.status_code}"
+                    return result
+                result.timezone = json.loads(response.content)
+        # requests' exceptions are OSErrors; a bad timezone body a ValueError
+        except (OSError, ValueError) as e:
+            result.error = f"{type(e).__name__}: {e}"
+            log.debug("proxy %s failed its probe: %s", result.host, result.error)
+            return result
+        result.alive = True
+        if self.timezone_cache is not None and result.timezone is not None:
+            self.timezone_cache.put(result.key, result.timezone)
+        return result
+
+    def probe_many(
+        self, proxies: Iterable[Optional[Dict[str, Any]]], refresh: bool = False
+    ) -> List[Optional[ProbeResult]]:
+        # one check per distinct proxy; None entries (no proxy) map to None
+        from concurrent.futures import ThreadPoolExecutor
+
+        proxies = list(proxies)
+        unique: Dict[Hashable, Dict[str, Any]] = {}
+        for proxy in proxies:
+            if proxy:
+                unique.setdefault(proxy_key(proxy), proxy)
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="pygologin-probe"
+                )
+            pool = self._pool
+        futures = {
+            key: pool.submit(self.probe, proxy, refresh)
+            for key, proxy in unique.items()
+        }
+        results = {key: future.result() for key, future in futures.items()}
+        return [results[proxy_key(proxy)] if proxy else None for proxy in proxies]
+
+    def rank(
+        self, results: Dict[str, Optional[ProbeResult]]
+    ) -> Tuple[List[str], List[str]]:
+        # splits ids into (usable, fastest first with no-proxy ones leading,
+        # skipped) where skipped are dead or slower than self.slow
+        usable: List[str] = []
+        skipped: List[str] = []
+        for key, result in results.items():
+            (usable if self.usable(result) else skipped).append(key)
+        usable.sort(key=lambda key: getattr(results[key], "latency", None) or 0.0)
+        return usable, skipped
+
+    def stats(self) -> Dict[str, Any]:
+        return self.results.stats()
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
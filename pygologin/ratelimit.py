@@ -0,0 +1,154 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+from pygologin.staging import FileLock
+from pygologin.transport import parse_retry_after
+
+if TYPE_CHECKING:
+    from requests import Response
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# (requests per second, burst)
+Rate = Tuple[float, float]
+
+THROTTLE_STATUSES = frozenset((429, 503))
+
+
+def parse_rate_limit(headers: Mapping[str, str]) -> Optional[float]:
+    # seconds until the quota resets, when the server says none is left
+    remaining = headers.get("X-RateLimit-Remaining", headers.get("RateLimit-Remaining"))
+    reset = headers.get("X-RateLimit-Reset", headers.get("RateLimit-Reset"))
+    if remaining is None or reset is None:
+        return None
+    try:
+        if float(remaining) > 0:
+            return None
+        seconds = float(reset)
+    except ValueError:
+        return None
+    if seconds > 1e9:  # an epoch timestamp rather than a delay
+        seconds -= time.time()
+    return max(0.0, seconds)
+
+
+class RateLimiter:
+    # a token bucket per key, kept as a GCRA "theoretical arrival time", so a
+    # bucket is one float; with a path the buckets live in a JSON file under
+    # an advisory lock and every process on the host draws from the same ones
+    def __init__(
+        self,
+        rates: Mapping[str, Union[float, Rate]],
+        path: Optional[str] = None,
+        penalty: float = 1.0,
+        max_block: float = 60.0,
+    ) -> None:
+        self.rates: Dict[str, Rate] = {}
+        for key, rate in rates.items():
+            self.rates[key] = (
+                (float(rate), float(rate))
+                if isinstance(rate, (int, float))
+                else (float(rate[0]), float(rate[1]))
+            )
+        self.path = path
+        self.penalty = penalty
+        self.max_block = max_block
+        self.waits = 0
+        self.waited = 0.0
+        self.throttled = 0
+        self._state: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _shared(self) -> Iterator[Dict[str, float]]:
+        # the bucket state, written back when the block completes
+        if self.path is None:
+            with self._lock:
+                yield self._state
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock = FileLock(self.path)
+        lock.acquire(poll=0.001)
+        try:
+            assert lock.fd is not None
+            os.lseek(lock.fd, 0, os.SEEK_SET)
+            content = os.read(lock.fd, 1 << 16)
+            try:
+                state = json.loads(content) if content else {}
+            except ValueError:
+                state = {}  # cut short by a crash; the buckets start full
+            yield state
+            lock.write(json.dumps(state))
+        finally:
+            lock.release()
+
+    def _keys(self, keys: Tuple[str, ...]) -> List[str]:
+        return [key for key in keys if key in self.rates]
+
+    def acquire(self, *keys: str) -> float:
+        # reserves one request on every configured key and sleeps until it
+        # may be sent; returns the seconds waited
+        limited = self._keys(keys)
+        if not limited:
+            return 0.0
+        now = time.time()
+        wait = 0.0
+        with self._shared() as state:
+            for key in limited:
+                rate, burst = self.rates[key]
+                interval = 1.0 / rate
+                tat = max(state.get(key, 0.0), now)
+                wait = max(wait, tat - (burst - 1) * interval - now)
+                state[key] = tat + interval
+        if wait > 0:
+            with self._lock:
+                self.waits += 1
+                self.waited += wait
+            time.sleep(wait)
+        return wait
+
+    def observe(self, response: "Response", *keys: str) -> None:
+        limited = self._keys(keys)
+        if not limited:
+            return
+        delay = None
+        if response.status_code in THROTTLE_STATUSES:
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                with self._lock:
+                    self.throttled += 1
+                if delay is None:
+                    delay = self.penalty
+        reset = parse_rate_limit(response.headers)
+        if reset is not None:
+            delay = max(delay or 0.0, reset)
+        if delay:
+            self.block(delay, *limited)
+
+    def block(self, seconds: float, *keys: str) -> None:
+        # holds every process back for seconds, then lets requests through
+        # at the plain rate rather than in a burst
+        seconds = min(seconds, self.max_block)
+        log.debug("rate limited: holding %s back for %.2fs", ", ".join(keys), seconds)
+        now = time.time()
+        with self._shared() as state:
+            for key in self._keys(keys):
+                rate, burst = self.rates[key]
+                tolerance = (burst - 1) / rate
+                state[key] = max(state.get(key, 0.0), now + seconds + tolerance)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "waits": self.waits,
+                "waited": self.waited,
+                "throttled": self.throttled,
+            }
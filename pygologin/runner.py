@@ -0,0 +1,335 @@
+import importlib
+import logging
+import runpy
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import psutil
+
+from pygologin.cache import TTLCache
+from pygologin.exceptions import ProxyError
+from pygologin.gologin import SHARED_ATTRIBUTES, GoLogin
+from pygologin.instrumentation import percentile
+from pygologin.proxies import ProxyProber
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+Task = Callable[[GoLogin, str], Any]
+
+
+class PortAllocator:
+    def __init__(
+        self, start: int = 3500, end: int = 35000, address: str = "127.0.0.1"
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.address = address
+        self._next = start
+        self._in_use: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def _is_free(self, port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            try:
+                sock.bind((self.address, port))
+            except OSError:
+                return False
+        return True
+
+    def acquire(self) -> int:
+        with self._lock:
+            for _ in range(self.end - self.start):
+                port = self._next
+                self._next = self.start + (port + 1 - self.start) % (
+                    self.end - self.start
+                )
+                if port not in self._in_use and self._is_free(port):
+                    self._in_use.add(port)
+                    return port
+        raise RuntimeError(f"no free port in {self.start}-{self.end}")
+
+    def release(self, port: int) -> None:
+        with self._lock:
+            self._in_use.discard(port)
+
+
+class ResourceGate:
+    def __init__(
+        self,
+        max_cpu: float = 90.0,
+        max_memory: float = 90.0,
+        poll_interval: float = 0.5,
+    ) -> None:
+        self.max_cpu = max_cpu
+        self.max_memory = max_memory
+        self.poll_interval = poll_interval
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        # first cpu_percent() call with interval=None always returns 0.0
+        psutil.cpu_percent(interval=None)
+
+    def overloaded(self) -> bool:
+        return (
+            psutil.cpu_percent(interval=None) > self.max_cpu
+            or psutil.virtual_memory().percent > self.max_memory
+        )
+
+    def wait(self) -> None:
+        # serialised so only one waiter samples at a time and the others
+        # queue behind it instead of all starting the moment load dips
+        with self._lock:
+            started = time.monotonic()
+            while self.overloaded():
+                log.debug("host overloaded, delaying next start")
+                time.sleep(self.poll_interval)
+            self.waited += time.monotonic() - started
+
+
+class ProfileResult:
+    def __init__(self, profile_id: str) -> None:
+        self.profile_id = profile_id
+        self.ok = False
+        self.attempts = 0
+        self.start_latency = 0.0
+        self.total = 0.0
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    def __repr__(self) -> str:
+        return (
+            f"ProfileResult(profile_id={self.profile_id!r}, ok={self.ok}, "
+            f"attempts={self.attempts}, total={self.total:.3f})"
+        )
+
+
+class RunReport:
+    def __init__(self) -> None:
+        self.results: List[ProfileResult] = []
+        self.elapsed = 0.0
+        self.backpressure = 0.0
+
+    @property
+    def succeeded(self) -> List[ProfileResult]:
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self) -> List[ProfileResult]:
+        return [result for result in self.results if not result.ok]
+
+    def summary(self) -> Dict[str, float]:
+        starts = [result.start_latency for result in self.succeeded]
+        totals = [result.total for result in self.succeeded]
+        return {
+            "profiles": len(self.results),
+            "succeeded": len(self.succeeded),
+            "failed": len(self.failed),
+            "elapsed": self.elapsed,
+            "throughput": len(self.succeeded) / self.elapsed if self.elapsed else 0.0,
+            "backpressure": self.backpressure,
+            "start_p50": percentile(starts, 50),
+            "start_p95": percentile(starts, 95),
+            "start_p99": percentile(starts, 99),
+            "session_p50": percentile(totals, 50),
+            "session_p95": percentile(totals, 95),
+            "session_p99": percentile(totals, 99),
+        }
+
+    def format(self) -> str:
+        data = self.summary()
+        return (
+            "profiles=%(profiles)d succeeded=%(succeeded)d failed=%(failed)d "
+            "elapsed=%(elapsed).2fs throughput=%(throughput).2f/s "
+            "backpressure=%(backpressure).2fs\n"
+            "start   p50=%(start_p50).3fs p95=%(start_p95).3fs p99=%(start_p99).3fs\n"
+            "session p50=%(session_p50).3fs p95=%(session_p95).3fs "
+            "p99=%(session_p99).3fs" % data
+        )
+
+
+class Runner:
+    def __init__(
+        self,
+        options: Dict[str, Any],
+        task: Task,
+        concurrency: int = 4,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        ports: Optional[PortAllocator] = None,
+        gate: Optional[ResourceGate] = None,
+        prober: Optional[ProxyProber] = None,
+    ) -> None:
+        if prober is not None:
+            if prober.timezone_cache is None:
+                prober.timezone_cache = TTLCache(prober.results.ttl)
+            # starts reuse the probe results and the timezones they fetched
+            options = {
+                **options,
+                "proxy_prober": prober,
+                "timezone_cache": prober.timezone_cache,
+            }
+        # one set of pools, caches and supervisor threads for every session,
+        # and one CPU allocator so browsers are spread over the cores
+        self.base = GoLogin(options)
+        self.options = {
+            **options,
+            **{name: getattr(self.base, name) for name in SHARED_ATTRIBUTES},
+        }
+        self.prober = prober
+        self.task = task
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.ports = ports or PortAllocator(address=options.get("address", "127.0.0.1"))
+        self.gate = gate or ResourceGate()
+
+    def _kill(self, gl: GoLogin) -> None:
+        if not gl.pid:
+            return
+        try:
+            psutil.Process(gl.pid).kill()
+        except psutil.Error:
+            pass
+
+    def _abandon(self, gl: GoLogin) -> None:
+        # start() releases these itself when it fails; a retry must not be
+        # blocked by locks or a lease left behind if it did not
+        try:
+            self._kill(gl)
+        finally:
+            gl.releaseLaunchLock()
+            gl.releaseLease()
+            gl.releaseWorkspace()
+
+    def _session(self, profile_id: str) -> ProfileResult:
+        result = ProfileResult(profile_id)
+        started = time.monotonic()
+        port = self.ports.acquire()
+        try:
+            gl: Optional[GoLogin] = None
+            for attempt in range(self.retries + 1):
+                result.attempts = attempt + 1
+                self.gate.wait()
+                gl = GoLogin({**self.options, "profile_id": profile_id, "port": port})
+                try:
+                    debugger_address = gl.start()
+                    break
+                except Exception as e:
+                    log.warning(
+                        "start %s failed (attempt %d): %s", profile_id, attempt + 1, e
+                    )
+                    self._abandon(gl)
+                    result.error = e
+                    gl = None
+                    if attempt < self.retries:
+                        time.sleep(self.retry_delay * 2**attempt)
+            if gl is None:
+                return result
+
+            result.start_latency = time.monotonic() - started
+            result.error = None
+            try:
+                result.result = self.task(gl, debugger_address)
+                result.ok = True
+            except Exception as e:
+                log.exception("task for %s failed: %s", profile_id, e)
+                result.error = e
+            finally:
+                try:
+                    gl.stop()
+                except Exception as e:
+                    log.exception("stop %s failed: %s", profile_id, e)
+                    result.ok = False
+                    result.error = e
+        finally:
+            self.ports.release(port)
+            result.total = time.monotonic() - started
+        return result
+
+    def check_proxies(
+        self,
+        profile_ids: List[str],
+        report: RunReport,
+        on_result: Optional[Callable[[ProfileResult], None]] = None,
+    ) -> List[str]:
+        # returns the ids worth starting, fastest proxies first; the others
+        # are reported as failed without a start
+        assert self.prober is not None
+        results = self.base.probeProxies(profile_ids)
+        usable, skipped = self.prober.rank(results)
+        for profile_id in skipped:
+            probe = results[profile_id]
+            assert probe is not None
+            result = ProfileResult(profile_id)
+            if probe.alive:
+                result.error = ProxyError(
+                    f"proxy {probe.host} is too slow ({probe.latency:.2f}s)"
+                )
+            else:
+                result.error = ProxyError(
+                    f"proxy {probe.host} is unreachable: {probe.error}"
+                )
+            report.results.append(result)
+            if on_result is not None:
+                on_result(result)
+        return usable
+
+    def run(
+        self,
+        profile_ids: Iterable[str],
+        on_result: Optional[Callable[[ProfileResult], None]] = None,
+    ) -> RunReport:
+        report = RunReport()
+        started = time.monotonic()
+        if self.prober is not None:
+            profile_ids = self.check_proxies(list(profile_ids), report, on_result)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self._session, pid) for pid in profile_ids]
+            for future in as_completed(futures):
+                result = future.result()
+                report.results.append(result)
+                if on_result is not None:
+                    on_result(result)
+        report.elapsed = time.monotonic() - started
+        report.backpressure = self.gate.waited
+        return report
+
+    def close(self) -> None:
+        # waits for background commits and stops the shared helpers
+        self.base.close()
+
+    def __enter__(self) -> "Runner":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def load_entry_point(entry: str) -> Task:
+    module_name, _, attr = entry.partition(":")
+    if not attr:
+        raise ValueError("entry point must look like 'package.module:function'")
+    target: Any = importlib.import_module(module_name)
+    for part in attr.split("."):
+        target = getattr(target, part)
+    task: Task = target
+    return task
+
+
+def script_task(path: str) -> Task:
+    def run_script(gl: GoLogin, debugger_address: str) -> Any:
+        namespace = runpy.run_path(
+            path,
+            init_globals={
+                "gologin": gl,
+                "profile_id": gl.profile_id,
+                "debugger_address": debugger_address,
+            },
+            run_name="__pygologin__",
+        )
+        return namespace.get("result")
+
+    return run_script
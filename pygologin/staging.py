@@ -0,0 +1,255 @@
+import contextlib
+import glob
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from typing import Iterator, List, Optional
+
+from pygologin.exceptions import ProfileInUseError
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+PROFILE_PREFIX = "gologin_"
+LOCK_SUFFIX = ".flock"
+# gologin_<id>.browser.flock and gologin_<id>.download.flock
+LOCK_KINDS = ("browser", "download")
+# gologin_<id>.staging-<random> and gologin_<id>.old-<random> directories
+STAGING_MARKS = (".staging-", ".old-")
+PROBE_GRACE = 0.5
+
+
+class FileLock:
+    # an exclusive advisory lock on a file (flock, LockFileEx on Windows); it
+    # is held per open file, so it also excludes other instances in the same
+    # process, and the OS drops it when the holder dies
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.fd: Optional[int] = None
+
+    @property
+    def locked(self) -> bool:
+        return self.fd is not None
+
+    def acquire(
+        self,
+        blocking: bool = True,
+        timeout: Optional[float] = None,
+        poll: float = 0.05,
+        shared: bool = False,
+    ) -> bool:
+        # shared locks only exclude exclusive ones; Windows has no shared mode
+        if self.fd is not None:
+            raise RuntimeError(f"{self.path} is already held")
+        fd = self._open()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = poll
+        while True:
+            if self._try_lock(fd, shared):
+                if self._current(fd):
+                    self.fd = fd
+                    return True
+                # remove() unlinked the file while we waited on it
+                os.close(fd)
+                fd = self._open()
+                continue
+            if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                os.close(fd)
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    def _open(self) -> int:
+        return os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def _current(self, fd: int) -> bool:
+        if sys.platform == "win32":
+            return True  # an open file cannot be removed there
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(fd)
+        return (stat.st_dev, stat.st_ino) == (opened.st_dev, opened.st_ino)
+
+    def _try_lock(self, fd: int, shared: bool) -> bool:
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+
+                mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+                fcntl.flock(fd, mode | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    def release(self) -> None:
+        fd, self.fd = self.fd, None
+        if fd is None:
+            return
+        if sys.platform == "win32":
+            import msvcrt
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        os.close(fd)
+
+    def remove(self) -> bool:
+        # unlinks the file while holding it, so a waiter cannot go on to lock
+        # a file that is gone; False when someone else holds it
+        held = self.fd is not None
+        if not held:
+            if not os.path.exists(self.path) or not self.acquire(blocking=False):
+                return False
+        try:
+            os.remove(self.path)
+            return True
+        except OSError:
+            return False
+        finally:
+            if not held:
+                self.release()
+
+    def read(self) -> str:
+        try:
+            with open(self.path, "r") as f:
+                return f.read()
+        except OSError:
+            return ""  # missing, or locked by its holder on Windows
+
+    def write(self, text: str) -> None:
+        if self.fd is None:
+            raise RuntimeError(f"{self.path} is not held")
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.ftruncate(self.fd, 0)
+        os.write(self.fd, text.encode())
+        os.lseek(self.fd, 0, os.SEEK_SET)
+
+
+class Flight:
+    # one exclusive preparation of a profile directory; fresh is True when
+    # another start prepared it while this one was waiting
+    def __init__(self, lock: FileLock, since: float, waited: bool) -> None:
+        self.lock = lock
+        self.since = since
+        self.waited = waited
+        self.prepared_at: Optional[float] = None
+        content = lock.read().strip()
+        if content:
+            try:
+                self.prepared_at = float(content)
+            except ValueError:
+                pass
+
+    @property
+    def fresh(self) -> bool:
+        return (
+            self.waited
+            and self.prepared_at is not None
+            and self.prepared_at >= self.since
+        )
+
+    def done(self) -> None:
+        self.prepared_at = time.time()
+        self.lock.write(repr(self.prepared_at))
+
+    def invalidate(self) -> None:
+        self.prepared_at = None
+        self.lock.write("")
+
+
+class ProfileLocks:
+    # two locks per profile id in tmpdir: "download" serializes preparing and
+    # committing gologin_<id>, "browser" is held while a browser runs on it
+    def __init__(self, tmpdir: str, timeout: float = 600) -> None:
+        self.tmpdir = tmpdir
+        self.timeout = timeout
+
+    def lock_path(self, profile_id: str, kind: str) -> str:
+        return lock_path(self.tmpdir, profile_id, kind)
+
+    def launch(self, profile_id: str) -> FileLock:
+        os.makedirs(self.tmpdir, exist_ok=True)
+        lock = FileLock(self.lock_path(profile_id, "browser"))
+        # the short timeout only rides out check_launch() probes
+        if not lock.acquire(timeout=PROBE_GRACE):
+            raise self._in_use(profile_id, lock)
+        lock.write(str(os.getpid()))
+        return lock
+
+    def check_launch(self, profile_id: str) -> None:
+        os.makedirs(self.tmpdir, exist_ok=True)
+        lock = FileLock(self.lock_path(profile_id, "browser"))
+        if not lock.acquire(timeout=PROBE_GRACE, shared=True):
+            raise self._in_use(profile_id, lock)
+        lock.release()
+
+    def _in_use(self, profile_id: str, lock: FileLock) -> ProfileInUseError:
+        holder = lock.read().strip()
+        by = f" by pid {holder}" if holder else ""
+        return ProfileInUseError(
+            f"profile {profile_id} is already running{by} ({self.tmpdir}); "
+            "stop it before starting it again"
+        )
+
+    @contextlib.contextmanager
+    def flight(self, profile_id: str) -> Iterator[Flight]:
+        os.makedirs(self.tmpdir, exist_ok=True)
+        lock = FileLock(self.lock_path(profile_id, "download"))
+        since = time.time()
+        waited = not lock.acquire(blocking=False)
+        if waited:
+            log.debug("waiting for another start of %s", profile_id)
+            if not lock.acquire(timeout=self.timeout):
+                raise ProfileInUseError(
+                    f"profile {profile_id} has been prepared by another start "
+                    f"for over {self.timeout:g}s ({self.tmpdir})"
+                )
+        try:
+            remove_stale(self.tmpdir, profile_id)
+            yield Flight(lock, since, waited)
+        finally:
+            lock.release()
+
+
+def lock_path(tmpdir: str, profile_id: str, kind: str) -> str:
+    return os.path.join(tmpdir, f"{PROFILE_PREFIX}{profile_id}.{kind}{LOCK_SUFFIX}")
+
+
+def staging_dir(tmpdir: str, profile_id: str) -> str:
+    return tempfile.mkdtemp(
+        prefix=f"{PROFILE_PREFIX}{profile_id}{STAGING_MARKS[0]}", dir=tmpdir
+    )
+
+
+def stale_dirs(tmpdir: str, profile_id: str) -> List[str]:
+    base = glob.escape(os.path.join(tmpdir, PROFILE_PREFIX + profile_id))
+    return [path for mark in STAGING_MARKS for path in glob.glob(base + mark + "*")]
+
+
+def remove_stale(tmpdir: str, profile_id: str) -> None:
+    # only called under the download lock: whatever is left was abandoned by
+    # a start that crashed mid-extract
+    for path in stale_dirs(tmpdir, profile_id):
+        log.debug("removing abandoned %s", path)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def replace_tree(staging: str, path: str) -> None:
+    # path is either the old tree or the complete new one; a crash between
+    # the two renames leaves no tree, which the next start downloads again
+    old = None
+    if os.path.exists(path):
+        old = f"{path}{STAGING_MARKS[1]}{uuid.uuid4().hex[:8]}"
+        os.rename(path, old)
+    os.rename(staging, path)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
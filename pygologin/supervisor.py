@@ -0,0 +1,355 @@
+import collections
+import logging
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+RUNNING = "running"
+RESTARTING = "restarting"
+EXITED = "exited"
+KILLED = "killed"
+
+
+class BrowserSample:
+    __slots__ = (
+        "profile_id",
+        "pid",
+        "time",
+        "processes",
+        "rss",
+        "cpu_time",
+        "cpu_percent",
+        "fds",
+    )
+
+    def __init__(
+        self,
+        profile_id: str,
+        pid: int,
+        time: float,
+        processes: int,
+        rss: int,
+        cpu_time: float,
+        cpu_percent: float,
+        fds: int,
+    ) -> None:
+        self.profile_id = profile_id
+        self.pid = pid
+        self.time = time
+        self.processes = processes
+        self.rss = rss
+        self.cpu_time = cpu_time
+        self.cpu_percent = cpu_percent
+        self.fds = fds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class SupervisedBrowser:
+    def __init__(
+        self,
+        profile_id: str,
+        pid: int,
+        restart: Optional[Callable[[], int]] = None,
+        max_rss: Optional[int] = None,
+        max_cpu: Optional[float] = None,
+        cpu_grace: int = 3,
+        max_restarts: int = 3,
+        history: int = 60,
+    ) -> None:
+        self.profile_id = profile_id
+        self.pid = pid
+        self.restart = restart
+        self.max_rss = max_rss
+        self.max_cpu = max_cpu
+        self.cpu_grace = cpu_grace
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        self.status = RUNNING
+        self.reason: Optional[str] = None
+        self.samples: Deque[BrowserSample] = collections.deque(maxlen=history)
+        self.cpu_over = 0
+        self._last_cpu: Optional[float] = None
+        self._last_time: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        last = self.samples[-1].as_dict() if self.samples else {}
+        return {
+            **last,
+            "profile_id": self.profile_id,
+            "pid": self.pid,
+            "status": self.status,
+            "reason": self.reason,
+            "restarts": self.restarts,
+        }
+
+
+def process_tree(pid: int) -> List[Any]:
+    import psutil
+
+    root = psutil.Process(pid)
+    if root.status() == psutil.STATUS_ZOMBIE:
+        raise psutil.NoSuchProcess(pid)
+    return [root] + root.children(recursive=True)
+
+
+def kill_tree(pid: int) -> None:
+    import psutil
+
+    try:
+        processes = process_tree(pid)
+    except psutil.Error:
+        return
+    for process in reversed(processes):
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(processes, timeout=5)
+
+
+class Supervisor:
+    # samples every supervised browser's process tree each interval, kills
+    # browsers over their caps and restarts the ones that exited
+    def __init__(
+        self,
+        interval: float = 1.0,
+        history: int = 60,
+        on_event: Optional[Callable[[str, SupervisedBrowser], Any]] = None,
+    ) -> None:
+        self.interval = interval
+        self.history = history
+        self.on_event = on_event
+        self.browsers: Dict[str, SupervisedBrowser] = {}
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        # one event per thread, so a thread told to stop never resumes
+        self._stopping = threading.Event()
+
+    def register(
+        self,
+        profile_id: str,
+        pid: int,
+        restart: Optional[Callable[[], int]] = None,
+        max_rss: Optional[int] = None,
+        max_cpu: Optional[float] = None,
+        cpu_grace: int = 3,
+        max_restarts: int = 3,
+    ) -> SupervisedBrowser:
+        # restart() relaunches the browser on the same profile and returns
+        # the new pid; max_cpu is in percent of one core
+        browser = SupervisedBrowser(
+            profile_id,
+            pid,
+            restart=restart,
+            max_rss=max_rss,
+            max_cpu=max_cpu,
+            cpu_grace=cpu_grace,
+            max_restarts=max_restarts,
+            history=self.history,
+        )
+        with self._lock:
+            self.browsers[profile_id] = browser
+        return browser
+
+    def unregister(self, profile_id: str) -> Optional[SupervisedBrowser]:
+        with self._lock:
+            return self.browsers.pop(profile_id, None)
+
+    def sample(self, browser: SupervisedBrowser) -> Optional[BrowserSample]:
+        import psutil
+
+        try:
+            processes = process_tree(browser.pid)
+        except psutil.Error:
+            return None
+        rss = 0
+        cpu_time = 0.0
+        fds = 0
+        for process in processes:
+            try:
+                with process.oneshot():
+                    rss += process.memory_info().rss
+                    times = process.cpu_times()
+                    cpu_time += times.user + times.system
+                    if hasattr(process, "num_fds"):
+                        fds += process.num_fds()
+                    else:
+                        fds += process.num_handles()
+            except psutil.Error:
+                continue  # exited between listing and sampling
+
+        now = time.monotonic()
+        with self._lock:
+            cpu_percent = 0.0
+            if browser._last_cpu is not None and browser._last_time is not None:
+                elapsed = now - browser._last_time
+                if elapsed > 0:
+                    # children that exit take their CPU time with them
+                    cpu_percent = max(0.0, cpu_time - browser._last_cpu) / elapsed * 100
+            browser._last_cpu = cpu_time
+            browser._last_time = now
+            sample = BrowserSample(
+                browser.profile_id,
+                browser.pid,
+                time.time(),
+                len(processes),
+                rss,
+                cpu_time,
+                cpu_percent,
+                fds,
+            )
+            browser.samples.append(sample)
+        return sample
+
+    def _registered(self, browser: SupervisedBrowser) -> bool:
+        with self._lock:
+            return self.browsers.get(browser.profile_id) is browser
+
+    def check(self, browser: SupervisedBrowser) -> None:
+        sample = self.sample(browser)
+        if sample is None:
+            if browser.status == RUNNING:
+                browser.status = EXITED
+                browser.reason = browser.reason or "crashed"
+                self._emit("exited", browser)
+            self._maybe_restart(browser)
+            return
+
+        if browser.max_rss is not None and sample.rss > browser.max_rss:
+            self._kill(browser, "memory")
+            return
+        if browser.max_cpu is not None and sample.cpu_percent > browser.max_cpu:
+            browser.cpu_over += 1
+            if browser.cpu_over >= browser.cpu_grace:
+                self._kill(browser, "cpu")
+        else:
+            browser.cpu_over = 0
+
+    def _kill(self, browser: SupervisedBrowser, reason: str) -> None:
+        if not self._registered(browser):
+            return  # stop() is taking care of it
+        log.warning(
+            "killing browser %s (pid %s): over %s cap",
+            browser.profile_id,
+            browser.pid,
+            reason,
+        )
+        kill_tree(browser.pid)
+        browser.status = KILLED
+        browser.reason = reason
+        self._emit("killed", browser)
+        self._maybe_restart(browser)
+
+    def _maybe_restart(self, browser: SupervisedBrowser) -> None:
+        if browser.restart is None or browser.restarts >= browser.max_restarts:
+            return
+        if not self._registered(browser):
+            return
+        browser.status = RESTARTING
+        try:
+            pid = browser.restart()
+        except Exception as e:
+            log.exception("restarting %s failed: %s", browser.profile_id, e)
+            browser.status = EXITED
+            browser.reason = f"restart failed: {e}"
+            browser.restarts = browser.max_restarts
+            self._emit("restart_failed", browser)
+            return
+        with self._lock:
+            registered = self.browsers.get(browser.profile_id) is browser
+            if registered:
+                browser.restarts += 1
+                browser.pid = pid
+                browser.status = RUNNING
+                browser.reason = None
+                browser.cpu_over = 0
+                browser._last_cpu = browser._last_time = None
+        if not registered:
+            # stopped while the new browser was starting; nobody owns it
+            kill_tree(pid)
+            return
+        log.info("restarted browser %s as pid %s", browser.profile_id, pid)
+        self._emit("restarted", browser)
+
+    def _emit(self, event: str, browser: SupervisedBrowser) -> None:
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(event, browser)
+        except Exception as e:
+            log.exception("supervisor on_event failed: %s", e)
+
+    def poll(self) -> None:
+        # sampling, killing and restarting run outside the lock, so a slow
+        # browser does not hold up register()/unregister() of the others
+        with self._lock:
+            browsers = list(self.browsers.values())
+        for browser in browsers:
+            if not self._registered(browser):
+                continue  # unregistered meanwhile
+            self.check(browser)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                profile_id: browser.as_dict()
+                for profile_id, browser in self.browsers.items()
+            }
+
+    def samples(self, profile_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            browser = self.browsers.get(profile_id)
+            if browser is None:
+                return []
+            return [sample.as_dict() for sample in browser.samples]
+
+    def totals(self) -> Dict[str, float]:
+        metrics = self.metrics().values()
+        return {
+            "browsers": len(metrics),
+            "running": sum(1 for m in metrics if m["status"] == RUNNING),
+            "rss": sum(m.get("rss", 0) for m in metrics),
+            "cpu_percent": sum(m.get("cpu_percent", 0.0) for m in metrics),
+            "fds": sum(m.get("fds", 0) for m in metrics),
+            "restarts": sum(m["restarts"] for m in metrics),
+        }
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(
+                target=self._loop,
+                args=(self._stopping,),
+                name="pygologin-supervisor",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self, idle_only: bool = False) -> bool:
+        with self._lock:
+            if idle_only and self.browsers:
+                return False
+            thread, self._thread = self._thread, None
+            self._stopping.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        return True
+
+    def stop_if_idle(self) -> bool:
+        # stops the thread once no browser is supervised; the next start()
+        # brings up a new one
+        return self.stop(idle_only=True)
+
+    def _loop(self, stopping: threading.Event) -> None:
+        while not stopping.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                log.exception("supervisor poll failed: %s", e)
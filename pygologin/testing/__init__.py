@@ -0,0 +1,3 @@
+from .server import StandInServer
+
+__all__ = ("StandInServer",)
@@ -0,0 +1,298 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import stat
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from pygologin.cdp import (
+    OP_CLOSE,
+    OP_TEXT,
+    accept_key,
+    encode_frame,
+    read_message,
+)
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+ENV_PREFIX = "PYGOLOGIN_FAKE_ORBITA_"
+
+LAUNCHER = """#!{python}
+import sys
+from pygologin.testing.fake_orbita import main
+
+sys.exit(main())
+"""
+
+PROFILE_FILES = (
+    os.path.join("Default", "History"),
+    os.path.join("Default", "Favicons"),
+    os.path.join("Default", "Network", "Network Persistent State"),
+    "Local State",
+)
+
+
+def write_launcher(path: str) -> str:
+    with open(path, "w") as f:
+        f.write(LAUNCHER.format(python=sys.executable))
+    mode = os.stat(path).st_mode
+    os.chmod(path, mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    def env(name: str, default: str) -> str:
+        return os.environ.get(ENV_PREFIX + name, default)
+
+    parser = argparse.ArgumentParser(prog="fake-orbita", add_help=False)
+    parser.add_argument("--remote-debugging-port", type=int, default=9222)
+    parser.add_argument("--remote-debugging-address", default="127.0.0.1")
+    parser.add_argument("--user-data-dir", default=None)
+    parser.add_argument("--tz", default="")
+    parser.add_argument("--gologin-profile", default="")
+    parser.add_argument("--lang", default="en-US")
+    parser.add_argument("--proxy-server", default=None)
+    parser.add_argument("--load-extension", default=None)
+    parser.add_argument(
+        "--fake-startup-delay", type=float, default=float(env("STARTUP_DELAY", "0"))
+    )
+    parser.add_argument(
+        "--fake-churn-files", type=int, default=int(env("CHURN_FILES", "0"))
+    )
+    parser.add_argument(
+        "--fake-churn-bytes", type=int, default=int(env("CHURN_BYTES", "4096"))
+    )
+    parser.add_argument(
+        "--fake-churn-interval",
+        type=float,
+        default=float(env("CHURN_INTERVAL", "0.5")),
+    )
+    # every other Chrome switch (--password-store, --restore-last-session, ...)
+    # is accepted and ignored
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+class FakeOrbita:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.browser_id = str(uuid.uuid4())
+        self.target_id = uuid.uuid4().hex.upper()
+        self.stopped = threading.Event()
+        self.httpd: Optional[ThreadingHTTPServer] = None
+        self.cookies: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return int(self.args.remote_debugging_port)
+
+    @property
+    def ws_path(self) -> str:
+        return "/devtools/browser/" + self.browser_id
+
+    def version(self) -> Any:
+        return {
+            "Browser": "Orbita/120.0.0.0",
+            "Protocol-Version": "1.3",
+            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) Chrome/120.0.0.0",
+            "webSocketDebuggerUrl": f"ws://127.0.0.1:{self.port}{self.ws_path}",
+        }
+
+    def targets(self) -> List[Any]:
+        return [
+            {
+                "id": self.target_id,
+                "type": "page",
+                "title": "New Tab",
+                "url": "chrome://newtab/",
+                "webSocketDebuggerUrl": f"ws://127.0.0.1:{self.port}"
+                f"/devtools/page/{self.target_id}",
+            }
+        ]
+
+    def handle_cdp(self, method: str, params: Dict[str, Any]) -> Any:
+        # just enough of the Network/Storage domains for cookie round trips
+        if method in ("Network.setCookies", "Storage.setCookies"):
+            with self.lock:
+                for cookie in params.get("cookies", []):
+                    # host-only cookies come with a url instead of a domain
+                    domain = cookie.get("domain") or urlparse(cookie["url"]).hostname
+                    key = (domain, cookie["name"], cookie.get("path", "/"))
+                    expires = cookie.get("expires", -1)
+                    self.cookies[key] = {
+                        "name": cookie["name"],
+                        "value": cookie.get("value", ""),
+                        "domain": domain,
+                        "path": cookie.get("path", "/"),
+                        "expires": expires,
+                        "size": len(cookie["name"]) + len(cookie.get("value", "")),
+                        "httpOnly": cookie.get("httpOnly", False),
+                        "secure": cookie.get("secure", False),
+                        "session": expires <= 0,
+                        **(
+                            {"sameSite": cookie["sameSite"]}
+                            if "sameSite" in cookie
+                            else {}
+                        ),
+                    }
+            return {}
+        if method in ("Network.getAllCookies", "Storage.getCookies"):
+            with self.lock:
+                return {"cookies": list(self.cookies.values())}
+        if method in ("Network.clearBrowserCookies", "Storage.clearCookies"):
+            with self.lock:
+                self.cookies.clear()
+            return {}
+        if method == "Browser.getVersion":
+            return {"product": self.version()["Browser"]}
+        return {}
+
+    def profile_path(self, *parts: str) -> Optional[str]:
+        if not self.args.user_data_dir:
+            return None
+        return os.path.join(self.args.user_data_dir, *parts)
+
+    def touch_profile(self) -> None:
+        for name in PROFILE_FILES:
+            path = self.profile_path(name)
+            if path is None:
+                return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a"):
+                os.utime(path)
+
+    def write_devtools_active_port(self) -> None:
+        path = self.profile_path("DevToolsActivePort")
+        if path is None:
+            return
+        with open(path, "w") as f:
+            f.write(f"{self.port}\n{self.ws_path}")
+
+    def churn(self) -> None:
+        directory = self.profile_path("Default", "FakeChurn")
+        if directory is None or self.args.fake_churn_files <= 0:
+            return
+        os.makedirs(directory, exist_ok=True)
+        while not self.stopped.wait(self.args.fake_churn_interval):
+            for index in range(self.args.fake_churn_files):
+                path = os.path.join(directory, f"churn_{index}")
+                with open(path, "wb") as f:
+                    f.write(os.urandom(self.args.fake_churn_bytes))
+
+    def serve(self) -> None:
+        self.httpd = ThreadingHTTPServer(
+            (self.args.remote_debugging_address, self.port), _handler(self)
+        )
+        self.httpd.daemon_threads = True
+        self.write_devtools_active_port()
+        self.httpd.serve_forever()
+
+    def shutdown(self, *args: Any) -> None:
+        self.stopped.set()
+        if self.httpd is not None:
+            threading.Thread(target=self.httpd.shutdown, daemon=True).start()
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.shutdown)
+        signal.signal(signal.SIGINT, self.shutdown)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self.shutdown)
+
+        if self.args.fake_startup_delay > 0:
+            if self.stopped.wait(self.args.fake_startup_delay):
+                return 0
+
+        self.touch_profile()
+        threading.Thread(target=self.churn, name="churn", daemon=True).start()
+        try:
+            self.serve()
+        finally:
+            self.stopped.set()
+            path = self.profile_path("DevToolsActivePort")
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+        return 0
+
+
+def _handler(orbita: FakeOrbita) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            log.debug("fake-orbita %s", format % args)
+
+        def _send_json(self, status: int, data: Any) -> None:
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _websocket(self) -> None:
+            self.send_response(101, "Switching Protocols")
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header(
+                "Sec-WebSocket-Accept",
+                accept_key(self.headers.get("Sec-WebSocket-Key", "")),
+            )
+            self.end_headers()
+            self.wfile.flush()
+
+            def write(frame: bytes) -> None:
+                self.wfile.write(frame)
+                self.wfile.flush()
+
+            try:
+                while True:
+                    message = read_message(self.rfile, write, mask=False)
+                    if message is None:
+                        write(encode_frame(OP_CLOSE, b"", mask=False))
+                        break
+                    request = json.loads(message)
+                    result = orbita.handle_cdp(
+                        request.get("method", ""), request.get("params") or {}
+                    )
+                    reply = json.dumps({"id": request.get("id"), "result": result})
+                    write(encode_frame(OP_TEXT, reply.encode("utf-8"), mask=False))
+            except (ConnectionError, OSError):
+                pass
+            self.close_connection = True
+
+        def do_GET(self) -> None:
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if (
+                path.startswith("/devtools/")
+                and self.headers.get("Upgrade", "").lower() == "websocket"
+            ):
+                self._websocket()
+            elif path in ("/json", "/json/list"):
+                self._send_json(200, orbita.targets())
+            elif path == "/json/version":
+                self._send_json(200, orbita.version())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+    return Handler
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    started = time.monotonic()
+    code = FakeOrbita(args).run()
+    log.debug("fake orbita exited after %.3fs", time.monotonic() - started)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import argparse
+import logging
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from pygologin.gologin import GoLogin, getRandomPort
+from pygologin.instrumentation import HistogramSink, Instrumentation, percentile
+from pygologin.testing.fake_orbita import write_launcher
+from pygologin.testing.server import StandInServer
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class LevelReport:
+    def __init__(self, concurrency: int) -> None:
+        self.concurrency = concurrency
+        self.starts = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self.latencies: List[float] = []
+        self.phases: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def starts_per_second(self) -> float:
+        return self.starts / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "starts": self.starts,
+            "errors": self.errors,
+            "elapsed": self.elapsed,
+            "starts_per_second": self.starts_per_second,
+            "p50": percentile(self.latencies, 50),
+            "p95": percentile(self.latencies, 95),
+            "p99": percentile(self.latencies, 99),
+            "phases": self.phases,
+        }
+
+
+def run_level(
+    base_options: Dict[str, Any],
+    profile_ids: Sequence[str],
+    concurrency: int,
+    iterations: int,
+) -> LevelReport:
+    report = LevelReport(concurrency)
+    sink = HistogramSink()
+    instrumentation = Instrumentation()
+    instrumentation.add_listener(sink)
+
+    def session(profile_id: str) -> Optional[float]:
+        gl = GoLogin(
+            {
+                "port": getRandomPort(),
+                **base_options,
+                "profile_id": profile_id,
+                "instrumentation": instrumentation,
+            }
+        )
+        started = time.perf_counter()
+        try:
+            gl.start()
+            gl.stop()
+        except Exception as e:
+            log.debug("session %s failed: %s", profile_id, e)
+            return None
+        finally:
+            # its transport, pools and threads would otherwise pile up
+            gl.close()
+        return time.perf_counter() - started
+
+    # every worker takes the next iteration as soon as its last one is done,
+    # so concurrency sessions are in flight until the queue runs dry
+    work: "queue.Queue[int]" = queue.Queue()
+    for index in range(iterations):
+        work.put(index)
+    lock = threading.Lock()
+
+    def worker(slot: int) -> None:
+        # one profile per worker slot so concurrent sessions never share a dir
+        profile_id = profile_ids[slot % len(profile_ids)]
+        while True:
+            try:
+                work.get_nowait()
+            except queue.Empty:
+                return
+            latency = session(profile_id)
+            with lock:
+                if latency is None:
+                    report.errors += 1
+                else:
+                    report.starts += 1
+                    report.latencies.append(latency)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    report.elapsed = time.perf_counter() - started
+    report.phases = sink.summary()
+    return report
+
+
+def run_load(
+    server: StandInServer,
+    levels: Sequence[int] = (1, 2, 4, 8),
+    iterations: int = 16,
+    options: Optional[Dict[str, Any]] = None,
+    fake_orbita: bool = False,
+) -> List[LevelReport]:
+    profile_ids = [server.add_profile() for _ in range(max(levels))]
+    tmpdir = tempfile.mkdtemp(prefix="pygologin_load_")
+    base_options: Dict[str, Any] = {
+        "token": "standin-token",
+        "tmpdir": tmpdir,
+        "executablePath": sys.executable,
+        "spawn_browser": False,
+        **server.options(),
+    }
+    if fake_orbita:
+        base_options["executablePath"] = write_launcher(
+            os.path.join(tmpdir, "fake-orbita")
+        )
+        base_options["spawn_browser"] = True
+    base_options.update(options or {})
+    try:
+        return [
+            run_level(base_options, profile_ids, concurrency, iterations)
+            for concurrency in levels
+        ]
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def format_report(reports: Sequence[LevelReport]) -> str:
+    lines = []
+    for report in reports:
+        data = report.as_dict()
+        lines.append(
+            "concurrency=%(concurrency)d starts=%(starts)d errors=%(errors)d "
+            "starts/s=%(starts_per_second).2f p50=%(p50).3fs p95=%(p95).3fs "
+            "p99=%(p99).3fs" % data
+        )
+        for phase, stats in data["phases"].items():
+            lines.append(
+                "  %-24s n=%-5d p50=%.4fs p95=%.4fs p99=%.4fs bytes=%d"
+                % (
+                    phase,
+                    stats["count"],
+                    stats["p50"],
+                    stats["p95"],
+                    stats["p99"],
+                    stats["bytes"],
+                )
+            )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m pygologin.testing.load",
+        description="Sweep GoLogin.start/stop concurrency against a stand-in API",
+    )
+    parser.add_argument("--levels", default="1,2,4,8")
+    parser.add_argument("--iterations", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--profile-size", type=int, default=0)
+    parser.add_argument(
+        "--fake-orbita",
+        action="store_true",
+        help="spawn pygologin.testing.fake_orbita instead of skipping the browser",
+    )
+    parser.add_argument("--startup-delay", type=float, default=0.0)
+    parser.add_argument("--churn-files", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    levels = [int(level) for level in args.levels.split(",")]
+    with StandInServer(
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        profile_size=args.profile_size,
+    ) as server:
+        reports = run_load(
+            server,
+            levels=levels,
+            iterations=args.iterations,
+            options={
+                "extra_params": [
+                    f"--fake-startup-delay={args.startup_delay}",
+                    f"--fake-churn-files={args.churn_files}",
+                ]
+            },
+            fake_orbita=args.fake_orbita,
+        )
+    print(format_report(reports))
+
+
+if __name__ == "__main__":
+    main()
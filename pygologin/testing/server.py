@@ -0,0 +1,468 @@
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from pygologin.leases import MemoryLeaseBackend, handle_lease_request
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+TIMEZONE = {
+    "ip": "127.0.0.1",
+    "country": "US",
+    "timezone": "America/New_York",
+    "ll": [40.7128, -74.006],
+    "accuracy": 100,
+}
+
+
+def make_fingerprint(os_type: str = "lin") -> Dict[str, Any]:
+    return {
+        "os": os_type,
+        "navigator": {
+            "userAgent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "resolution": "1920x1080",
+            "language": "en-US,en;q=0.9",
+            "platform": "Linux x86_64",
+            "hardwareConcurrency": 8,
+            "deviceMemory": 8,
+        },
+        "fonts": ["Arial", "Verdana"],
+        "webGLMetadata": {"vendor": "Google Inc.", "renderer": "ANGLE"},
+        "webglParams": {},
+    }
+
+
+def make_profile(profile_id: str, name: Optional[str] = None) -> Dict[str, Any]:
+    fingerprint = make_fingerprint()
+    return {
+        "id": profile_id,
+        "name": name or "standin_" + profile_id,
+        "os": "lin",
+        "s3Path": "",
+        "chromeExtensions": [],
+        "proxy": {"mode": "none"},
+        "navigator": fingerprint["navigator"],
+        "geolocation": {
+            "mode": "prompt",
+            "fillBasedOnIp": True,
+            "latitude": 0,
+            "longitude": 0,
+            "accuracy": 10,
+        },
+        "webRTC": {"mode": "alerted", "fillBasedOnIp": True, "localIps": []},
+        "canvas": {"mode": "noise", "noise": 1.5},
+        "webGL": {"mode": "noise", "noise": 10.5, "getClientRectsNoise": 3.5},
+        "clientRects": {"mode": "noise"},
+        "audioContext": {"mode": "noise", "noise": 1e-8},
+        "webGLMetadata": {**fingerprint["webGLMetadata"], "mode": "mask"},
+    }
+
+
+def make_profile_zip(padding: int = 0) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr("Default/Preferences", json.dumps({"profile": {}}))
+        zipf.writestr("First Run", "")
+        if padding:
+            # random bytes do not compress, so the zip is roughly padding bytes
+            zipf.writestr("Default/padding.bin", os.urandom(padding))
+    return buffer.getvalue()
+
+
+class StandInServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        bandwidth: int = 0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        retry_after: Optional[float] = None,
+        truncate_rate: float = 0.0,
+        remote_startup: float = 0.0,
+        profile_size: int = 0,
+        seed: Optional[int] = None,
+        checksum: str = "sha256",
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.truncate_rate = truncate_rate
+        self.remote_startup = remote_startup
+        self.profile_size = profile_size
+        # "sha256": X-Checksum-Sha256 of the whole object on every response;
+        # "md5": Content-MD5 of the body sent, a range on a 206
+        self.checksum = checksum
+        self.random = random.Random(seed)
+
+        self.profiles: Dict[str, Dict[str, Any]] = {}
+        self.zips: Dict[str, bytes] = {}
+        self.cookies: Dict[str, List[Dict[str, Any]]] = {}
+        self.remote: Dict[str, float] = {}
+        self.requests: List[Tuple[str, str]] = []
+        # served under /leases for lease_url
+        self.leases = MemoryLeaseBackend()
+        self.lock = threading.Lock()
+
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def options(self) -> Dict[str, str]:
+        return {
+            "api_url": self.url,
+            "files_gateway": self.url,
+            "timezone_url": self.url + "/timezone",
+            "profiles_url": self.url + "/profiles/",
+        }
+
+    def add_profile(self, profile_id: Optional[str] = None, **fields: Any) -> str:
+        profile_id = profile_id or uuid.uuid4().hex[:24]
+        profile = make_profile(profile_id)
+        profile.update(fields)
+        with self.lock:
+            self.profiles[profile_id] = profile
+            self.zips.setdefault(profile_id, make_profile_zip(self.profile_size))
+            self.cookies.setdefault(profile_id, [])
+        return profile_id
+
+    def start(self) -> "StandInServer":
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _handler(self))
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="standin-server", daemon=True
+        )
+        self._thread.start()
+        log.debug("stand-in server listening on %s", self.url)
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    def should_truncate(self) -> bool:
+        return self.truncate_rate > 0 and self.random.random() < self.truncate_rate
+
+
+def _handler(server: StandInServer) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            log.debug("standin %s", format % args)
+
+        def do_GET(self) -> None:
+            self._dispatch("GET")
+
+        def do_POST(self) -> None:
+            self._dispatch("POST")
+
+        def do_PUT(self) -> None:
+            self._dispatch("PUT")
+
+        def do_PATCH(self) -> None:
+            self._dispatch("PATCH")
+
+        def do_DELETE(self) -> None:
+            self._dispatch("DELETE")
+
+        def do_HEAD(self) -> None:
+            self._dispatch("HEAD")
+
+        def _body(self) -> bytes:
+            self.body_read = True
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _json_body(self) -> Any:
+            body = self._body()
+            return json.loads(body) if body else None
+
+        def _send(
+            self,
+            status: int,
+            body: bytes = b"",
+            content_type: str = "application/json",
+            headers: Optional[Dict[str, str]] = None,
+        ) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            if self.command == "HEAD" or not body:
+                return
+            self._write_throttled(body)
+
+        def _write_throttled(self, body: bytes) -> None:
+            if not server.bandwidth:
+                self.wfile.write(body)
+                return
+            # 10 slices per second keeps the rate smooth without busy looping
+            chunk = max(1, server.bandwidth // 10)
+            for offset in range(0, len(body), chunk):
+                self.wfile.write(body[offset : offset + chunk])
+                time.sleep(0.1)
+
+        def _send_json(self, status: int, data: Any) -> None:
+            self._send(status, json.dumps(data).encode("utf-8"))
+
+        def _send_file(self, data: bytes) -> None:
+            digest = hashlib.sha256(data).hexdigest()
+            headers = {"Accept-Ranges": "bytes", "ETag": f'"{digest[:16]}"'}
+            if server.checksum == "sha256":
+                headers["X-Checksum-Sha256"] = digest
+            status = 200
+            body = data
+            range_header = self.headers.get("Range", "")
+            if_range = self.headers.get("If-Range")
+            if if_range is not None and if_range != headers["ETag"]:
+                range_header = ""  # changed since: the whole object
+            if range_header.startswith("bytes="):
+                first, _, last = range_header[6:].partition("-")
+                start = int(first or 0)
+                end = min(int(last), len(data) - 1) if last else len(data) - 1
+                if start >= len(data):
+                    headers["Content-Range"] = f"bytes */{len(data)}"
+                    self._send(416, headers=headers)
+                    return
+                status = 206
+                body = data[start : end + 1]
+                headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            if server.checksum == "md5":
+                headers["Content-MD5"] = base64.b64encode(
+                    hashlib.md5(body).digest()
+                ).decode()
+
+            if body and server.should_truncate():
+                # advertise the full length, send half, then drop the connection
+                self.send_response(status)
+                self.send_header("Content-Type", "application/zip")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body[: len(body) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self._send(status, body, "application/zip", headers)
+
+        def _dispatch(self, method: str) -> None:
+            parsed = urlparse(self.path)
+            path = parsed.path.rstrip("/") or "/"
+            query = parse_qs(parsed.query)
+            with server.lock:
+                server.requests.append((method, path))
+
+            if server.latency:
+                time.sleep(server.latency)
+
+            if server.should_fail():
+                self._body()
+                headers = {}
+                if server.retry_after is not None:
+                    headers["Retry-After"] = str(server.retry_after)
+                self._send(
+                    server.error_status,
+                    json.dumps({"statusCode": server.error_status}).encode(),
+                    headers=headers,
+                )
+                return
+
+            self.body_read = False
+            try:
+                self._route(method, path, query)
+            except KeyError:
+                if not self.body_read:
+                    # left unread, it would be parsed as the next request
+                    # on this keep-alive connection
+                    self._body()
+                self._send_json(
+                    404,
+                    {"statusCode": 404, "error": "Not Found", "message": path},
+                )
+
+        def _route(self, method: str, path: str, query: Dict[str, List[str]]) -> None:
+            parts = path.strip("/").split("/")
+
+            if path == "/timezone":
+                self._send_json(200, TIMEZONE)
+                return
+
+            if parts[0] == "leases":
+                status, data = handle_lease_request(
+                    server.leases, method, parts[1:], self._json_body() or {}
+                )
+                self._send_json(status, data)
+                return
+
+            if path == "/profiles/zero_profile.zip":
+                self._send(200, make_profile_zip(), "application/zip")
+                return
+
+            if path == "/download":
+                profile_id = self.headers.get("browserId", "")
+                self._send_file(server.zips.get(profile_id, b""))
+                return
+
+            if path == "/upload":
+                profile_id = self.headers.get("browserId", "")
+                upload = self._body()
+                with server.lock:
+                    server.zips[profile_id] = upload
+                self._send_json(200, {"status": "ok"})
+                return
+
+            if parts[0] == "orbita" and len(parts) >= 3 and parts[2] == "json":
+                profile_id = parts[1]
+                started = server.remote[profile_id]
+                if time.monotonic() - started < server.remote_startup:
+                    self._send_json(502, {"message": "browser is starting"})
+                    return
+                self._send_json(
+                    200,
+                    {
+                        "Browser": "Chrome/120.0.0.0",
+                        "webSocketDebuggerUrl": f"ws://localhost:{server.port}"
+                        f"/devtools/browser/{profile_id}",
+                    },
+                )
+                return
+
+            if parts[0] != "browser":
+                raise KeyError(path)
+
+            if len(parts) == 1:
+                if method == "POST":
+                    self._create(self._json_body() or {})
+                    return
+                raise KeyError(path)
+
+            if parts[1] == "v2" and len(parts) == 2:
+                with server.lock:
+                    profiles = list(server.profiles.values())
+                self._send_json(
+                    200, {"profiles": profiles, "allProfilesCount": len(profiles)}
+                )
+                return
+
+            if parts[1] == "fingerprint" and len(parts) == 2:
+                self._send_json(200, make_fingerprint(query.get("os", ["lin"])[0]))
+                return
+
+            if parts[1] == "quick" and len(parts) == 2:
+                self._create(self._json_body() or {})
+                return
+
+            profile_id = parts[1]
+            action = parts[2] if len(parts) > 2 else ""
+
+            if action == "":
+                if method == "GET":
+                    self._send_json(200, server.profiles[profile_id])
+                elif method == "PUT":
+                    data = self._json_body() or {}
+                    with server.lock:
+                        server.profiles[profile_id].update(data)
+                    self._send_json(200, server.profiles[profile_id])
+                elif method == "DELETE":
+                    with server.lock:
+                        server.profiles.pop(profile_id)
+                        server.zips.pop(profile_id, None)
+                        server.cookies.pop(profile_id, None)
+                    self._send(204)
+                else:
+                    raise KeyError(path)
+                return
+
+            if action == "cookies":
+                if method == "GET":
+                    self._send_json(200, server.cookies[profile_id])
+                    return
+                cookies = self._json_body() or []
+                with server.lock:
+                    if profile_id not in server.profiles:
+                        raise KeyError(profile_id)
+                    if query.get("cleanCookies") == ["true"]:
+                        server.cookies[profile_id] = []
+                    else:
+                        server.cookies[profile_id] = cookies
+                self._send(204)
+                return
+
+            if action == "proxy" and method == "PATCH":
+                proxy = self._json_body() or {}
+                with server.lock:
+                    server.profiles[profile_id]["proxy"] = proxy
+                self._send_json(200, server.profiles[profile_id])
+                return
+
+            if action == "web":
+                if profile_id not in server.profiles:
+                    raise KeyError(profile_id)
+                if method == "POST":
+                    self._body()
+                    with server.lock:
+                        server.remote[profile_id] = time.monotonic()
+                    self._send_json(
+                        202,
+                        {
+                            "status": "success",
+                            "remoteOrbitaUrl": f"{server.url}/orbita/{profile_id}",
+                        },
+                    )
+                elif method == "DELETE":
+                    with server.lock:
+                        server.remote.pop(profile_id, None)
+                    self._send(204)
+                else:
+                    raise KeyError(path)
+                return
+
+            raise KeyError(path)
+
+        def _create(self, data: Dict[str, Any]) -> None:
+            profile_id = uuid.uuid4().hex[:24]
+            fields = {k: v for k, v in data.items() if k != "profile"}
+            server.add_profile(profile_id, **fields)
+            self._send_json(201, {"id": profile_id, **server.profiles[profile_id]})
+
+    return Handler
@@ -0,0 +1,332 @@
+import collections
+import datetime
+import email.utils
+import logging
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, Optional, Tuple, Union
+
+import requests
+from requests import Response
+
+from pygologin.instrumentation import count_retry, percentile
+
+if TYPE_CHECKING:
+    from pygologin.ratelimit import RateLimiter
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+Timeout = Tuple[float, float]
+
+# (connect, read) seconds per endpoint class
+DEFAULT_TIMEOUTS: Dict[str, Timeout] = {
+    "api": (10.0, 60.0),
+    "files_gateway": (10.0, 300.0),
+    "profiles": (10.0, 120.0),
+    "timezone": (10.0, 20.0),
+    "extensions": (10.0, 60.0),
+    "devtools": (1.0, 5.0),
+}
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "PUT", "DELETE", "OPTIONS"))
+# A 429 means the request was rejected before any work, so even a POST may be
+# repeated. A 503 may come after the work was done; a POST only retries it when
+# the server asks to be called again with Retry-After.
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (date - now).total_seconds())
+
+
+class Transport:
+    def __init__(
+        self,
+        timeouts: Optional[Dict[str, Union[float, Timeout]]] = None,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 30.0,
+        hedge: Union[bool, Iterable[str]] = False,
+        hedge_delay: Optional[float] = None,
+        session: Optional[requests.Session] = None,
+        rate_limiter: Optional["RateLimiter"] = None,
+    ) -> None:
+        self.timeouts: Dict[str, Timeout] = dict(DEFAULT_TIMEOUTS)
+        for endpoint, timeout in (timeouts or {}).items():
+            self.timeouts[endpoint] = (
+                (float(timeout), float(timeout))
+                if isinstance(timeout, (int, float))
+                else (float(timeout[0]), float(timeout[1]))
+            )
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self._session = session
+        self._local = threading.local()
+        self._sessions: "weakref.WeakSet[requests.Session]" = weakref.WeakSet()
+        self.rate_limiter = rate_limiter
+        self._latencies: Dict[str, Deque[float]] = collections.defaultdict(
+            lambda: collections.deque(maxlen=HEDGE_WINDOW)
+        )
+        self._lock = threading.Lock()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def session(self) -> requests.Session:
+        # requests.Session is not thread-safe (cookie jar, adapters), and the
+        # bulk, hedge and probe pools all send through one Transport, so each
+        # thread gets its own session. A session passed in is used by every
+        # thread; it is then up to the caller to make that safe.
+        if self._session is not None:
+            return self._session
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            with self._lock:
+                self._sessions.add(session)
+        return session
+
+    def hedged(self, name: str) -> bool:
+        if isinstance(self.hedge, bool):
+            return self.hedge
+        return name in self.hedge
+
+    def timeout(self, endpoint: str) -> Timeout:
+        return self.timeouts.get(endpoint, self.timeouts["api"])
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter: uniform(0, min(cap, base * 2 ** attempt))
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_factor * (2**attempt))
+        )
+
+    def observe(self, name: str, latency: float) -> None:
+        with self._lock:
+            self._latencies[name].append(latency)
+
+    def p95(self, name: str) -> Optional[float]:
+        with self._lock:
+            samples = list(self._latencies[name])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(samples, 95)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        endpoint: str = "api",
+        idempotent: Optional[bool] = None,
+        retries: Optional[int] = None,
+        hedge: bool = False,
+        name: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Response:
+        # name keys the latency window used for hedging; defaults to endpoint.
+        # Both are rate limiter keys, so a limit may be per class or per call
+        method = method.upper()
+        name = name or endpoint
+        kwargs.setdefault("timeout", self.timeout(endpoint))
+        limits = (endpoint, name)
+        if hedge and not kwargs.get("stream") and kwargs.get("data") is None:
+            return self._hedged(method, url, name, idempotent, retries, kwargs, limits)
+        return self._request(method, url, name, idempotent, retries, kwargs, limits)
+
+    def get(self, url: str, **kwargs: Any) -> Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs: Any) -> Response:
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs: Any) -> Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        name: str,
+        idempotent: Optional[bool],
+        retries: Optional[int],
+        kwargs: Dict[str, Any],
+        limits: Tuple[str, ...] = (),
+    ) -> Response:
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        retries = self.retries if retries is None else retries
+        body: Any = kwargs.get("data")
+        body_position = body.tell() if hasattr(body, "tell") else None
+
+        attempt = 0
+        while True:
+            if attempt and body_position is not None:
+                body.seek(body_position)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(*limits)
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent or attempt >= retries:
+                    raise
+                delay = self.backoff(attempt)
+                log.debug(
+                    "%s %s failed (%s), retry %d in %.2fs",
+                    method,
+                    url,
+                    e.__class__.__name__,
+                    attempt + 1,
+                    delay,
+                )
+            else:
+                self.observe(name, time.monotonic() - started)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.observe(response, *limits)
+                response.retries = attempt  # type: ignore[attr-defined]
+                status = response.status_code
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if idempotent:
+                    retryable = status in RETRY_STATUSES
+                else:
+                    retryable = status == 429 or (
+                        status == 503 and retry_after is not None
+                    )
+                if not retryable or attempt >= retries:
+                    return response
+                delay = (
+                    min(retry_after, self.backoff_max)
+                    if retry_after is not None
+                    else self.backoff(attempt)
+                )
+                log.debug(
+                    "%s %s returned %s, retry %d in %.2fs",
+                    method,
+                    url,
+                    status,
+                    attempt + 1,
+                    delay,
+                )
+                response.close()
+            count_retry()
+            time.sleep(delay)
+            attempt += 1
+
+    def _hedged(
+        self,
+        method: str,
+        url: str,
+        name: str,
+        idempotent: Optional[bool],
+        retries: Optional[int],
+        kwargs: Dict[str, Any],
+        limits: Tuple[str, ...] = (),
+    ) -> Response:
+        delay = self.hedge_delay if self.hedge_delay is not None else self.p95(name)
+        if delay is None:
+            return self._request(method, url, name, idempotent, retries, kwargs, limits)
+
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=16, thread_name_prefix="pygologin-hedge"
+                )
+            pool = self._hedge_pool
+
+        def send() -> Response:
+            return self._request(method, url, name, idempotent, retries, kwargs, limits)
+
+        primary = pool.submit(send)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+        except Exception:
+            # the primary failed quickly; the hedge becomes a plain retry
+            return send()
+
+        log.debug("%s %s slower than %.3fs, sending hedge", method, url, delay)
+        pending = {primary, pool.submit(send)}
+        fallback: Optional[Response] = None
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = self._result(future)
+                if not isinstance(result, Response):
+                    error = result
+                elif result.ok:
+                    if fallback is not None:
+                        fallback.close()
+                    for loser in pending:
+                        self._discard(loser)
+                    return result
+                elif fallback is None:
+                    fallback = result
+                else:
+                    result.close()
+        if fallback is not None:
+            return fallback
+        assert error is not None
+        raise error
+
+    def _result(self, future: "Future[Response]") -> Union[Response, BaseException]:
+        try:
+            return future.result()
+        except Exception as e:
+            return e
+
+    def _discard(self, future: "Future[Response]") -> None:
+        # release the loser's connection back to the pool once it answers
+        if future.cancel():
+            return
+
+        def close(future: "Future[Response]") -> None:
+            result = self._result(future)
+            if isinstance(result, Response):
+                result.close()
+
+        future.add_done_callback(close)
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.close()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
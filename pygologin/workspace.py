@@ -0,0 +1,307 @@
+import glob
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from pygologin.staging import LOCK_KINDS, STAGING_MARKS, FileLock, lock_path
+from pygologin.staging import LOCK_SUFFIX as FLOCK_SUFFIX
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+PROFILE_PREFIX = "gologin_"
+LOCK_SUFFIX = ".lock"
+# state file of a commit queued by pygologin.committer.Committer
+COMMIT_SUFFIX = ".commit"
+# files start()/stop() leave next to the profile directory
+ORPHAN_SUFFIXES = (
+    "_upload.zip",
+    ".zip",
+    ".zip.part",
+    ".zip.part.validator",
+    ".zip.segments",
+)
+# ProfileLocks files, orphaned once their profile directory is gone
+FLOCK_SUFFIXES = tuple(f".{kind}{FLOCK_SUFFIX}" for kind in LOCK_KINDS)
+
+
+def pid_alive(pid: int) -> bool:
+    import psutil
+
+    return psutil.pid_exists(pid)
+
+
+def tree_size(path: str) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+    return total
+
+
+class ProfileEntry:
+    __slots__ = ("profile_id", "path", "size", "last_used", "locked")
+
+    def __init__(
+        self, profile_id: str, path: str, size: int, last_used: float, locked: bool
+    ) -> None:
+        self.profile_id = profile_id
+        self.path = path
+        self.size = size
+        self.last_used = last_used
+        self.locked = locked
+
+    def __repr__(self) -> str:
+        return (
+            f"ProfileEntry({self.profile_id!r}, size={self.size}, locked={self.locked})"
+        )
+
+
+class Workspace:
+    def __init__(
+        self,
+        tmpdir: str,
+        max_bytes: Optional[int] = None,
+        orphan_age: float = 3600,
+        sweep_interval: Optional[float] = None,
+    ) -> None:
+        self.tmpdir = tmpdir
+        self.max_bytes = max_bytes
+        self.orphan_age = orphan_age
+        self.sweep_interval = sweep_interval
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self.swept = 0
+        self.swept_bytes = 0
+        self._lock = threading.Lock()
+        # profile_id -> (mtime of the directory, size); release() bumps the
+        # mtime, so a profile used through pygologin is measured again
+        self._sizes: Dict[str, Tuple[float, int]] = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def profile_path(self, profile_id: str) -> str:
+        return os.path.join(self.tmpdir, PROFILE_PREFIX + profile_id)
+
+    def acquire(self, profile_id: str) -> str:
+        # a lock file per holder, so the profile is protected from eviction
+        # until every start() that uses it has stopped
+        path = os.path.join(
+            self.tmpdir,
+            f"{PROFILE_PREFIX}{profile_id}.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+            + LOCK_SUFFIX,
+        )
+        os.makedirs(self.tmpdir, exist_ok=True)
+        with open(path, "x") as f:
+            f.write(str(os.getpid()))
+        return path
+
+    def release(self, lock_path: str, profile_id: str) -> None:
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+        self.touch(profile_id)
+
+    def touch(self, profile_id: str) -> None:
+        path = self.profile_path(profile_id)
+        if os.path.isdir(path):
+            os.utime(path)
+
+    def lock_files(self, profile_id: str) -> List[str]:
+        pattern = glob.escape(PROFILE_PREFIX + profile_id) + ".*" + LOCK_SUFFIX
+        return glob.glob(os.path.join(glob.escape(self.tmpdir), pattern))
+
+    def is_locked(self, profile_id: str) -> bool:
+        # a profile waiting for its commit holds changes not uploaded yet
+        locked = os.path.exists(self.profile_path(profile_id) + COMMIT_SUFFIX)
+        for path in self.lock_files(profile_id):
+            try:
+                pid = int(os.path.basename(path).split(".")[-3])
+            except (IndexError, ValueError):
+                continue
+            if pid_alive(pid):
+                locked = True
+            else:
+                log.debug("removing stale lock %s", path)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return locked
+
+    def entries(self) -> List[ProfileEntry]:
+        result: List[ProfileEntry] = []
+        try:
+            scan = os.scandir(self.tmpdir)
+        except FileNotFoundError:
+            return result
+        with scan:
+            for entry in scan:
+                if not entry.name.startswith(PROFILE_PREFIX) or not entry.is_dir():
+                    continue
+                if any(mark in entry.name for mark in STAGING_MARKS):
+                    continue  # owned by an extraction in progress
+                profile_id = entry.name[len(PROFILE_PREFIX) :]
+                mtime = entry.stat().st_mtime
+                cached = self._sizes.get(profile_id)
+                if cached is None or cached[0] != mtime:
+                    cached = (mtime, tree_size(entry.path))
+                    self._sizes[profile_id] = cached
+                result.append(
+                    ProfileEntry(
+                        profile_id,
+                        entry.path,
+                        cached[1],
+                        mtime,
+                        self.is_locked(profile_id),
+                    )
+                )
+        return result
+
+    def evict(self, reserve: int = 0) -> List[str]:
+        # drop least recently used, unlocked profiles until the budget holds
+        if self.max_bytes is None:
+            return []
+        evicted = []
+        with self._lock:
+            entries = self.entries()
+            total = sum(entry.size for entry in entries)
+            for entry in sorted(entries, key=lambda e: e.last_used):
+                if total + reserve <= self.max_bytes:
+                    break
+                if entry.locked:
+                    continue
+                download = FileLock(
+                    lock_path(self.tmpdir, entry.profile_id, "download")
+                )
+                if not download.acquire(blocking=False):
+                    continue  # being prepared or committed
+                try:
+                    log.debug("evicting %s (%d bytes)", entry.path, entry.size)
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    FileLock(
+                        lock_path(self.tmpdir, entry.profile_id, "browser")
+                    ).remove()
+                    download.remove()
+                finally:
+                    download.release()
+                self._sizes.pop(entry.profile_id, None)
+                total -= entry.size
+                self.evicted += 1
+                self.evicted_bytes += entry.size
+                evicted.append(entry.profile_id)
+            if total + reserve > self.max_bytes:
+                log.warning(
+                    "workspace %s over budget: %d of %d bytes in use",
+                    self.tmpdir,
+                    total,
+                    self.max_bytes,
+                )
+        return evicted
+
+    def orphans(self, max_age: Optional[float] = None) -> List[str]:
+        max_age = self.orphan_age if max_age is None else max_age
+        deadline = time.time() - max_age
+        result = []
+        for suffix in ORPHAN_SUFFIXES + FLOCK_SUFFIXES:
+            pattern = os.path.join(
+                glob.escape(self.tmpdir), PROFILE_PREFIX + "*" + suffix
+            )
+            for path in glob.glob(pattern):
+                name = os.path.basename(path)
+                profile_id = name[len(PROFILE_PREFIX) : -len(suffix)]
+                if suffix == ".zip" and profile_id.endswith("_upload"):
+                    continue  # matched by "_upload.zip"
+                if suffix in FLOCK_SUFFIXES and os.path.isdir(
+                    self.profile_path(profile_id)
+                ):
+                    continue
+                try:
+                    if os.path.getmtime(path) > deadline:
+                        continue
+                except FileNotFoundError:
+                    continue
+                if not self.is_locked(profile_id):
+                    result.append(path)
+        return result
+
+    def sweep(self, max_age: Optional[float] = None) -> List[str]:
+        swept = []
+        for path in self.orphans(max_age):
+            try:
+                size = os.path.getsize(path)
+                if path.endswith(FLOCK_SUFFIX):
+                    # only while nobody holds it
+                    if not FileLock(path).remove():
+                        continue
+                else:
+                    os.remove(path)
+            except OSError:
+                continue
+            log.debug("removed orphaned %s", path)
+            with self._lock:
+                self.swept += 1
+                self.swept_bytes += size
+            swept.append(path)
+        return swept
+
+    def usage(self) -> Dict[str, int]:
+        entries = self.entries()
+        orphans = self.orphans(0)
+        return {
+            "profiles": len(entries),
+            "bytes": sum(entry.size for entry in entries),
+            "locked": sum(1 for entry in entries if entry.locked),
+            "max_bytes": self.max_bytes or 0,
+            "orphans": len(orphans),
+            "orphan_bytes": sum(os.path.getsize(path) for path in orphans),
+            "evicted": self.evicted,
+            "evicted_bytes": self.evicted_bytes,
+            "swept": self.swept,
+            "swept_bytes": self.swept_bytes,
+        }
+
+    def start_sweeper(self, interval: Optional[float] = None) -> None:
+        interval = interval or self.sweep_interval or 300
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._stopping.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop,
+                args=(interval,),
+                name="pygologin-workspace-sweeper",
+                daemon=True,
+            )
+            self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stopping.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def _sweep_loop(self, interval: float) -> None:
+        while not self._stopping.wait(interval):
+            try:
+                self.sweep()
+                self.evict()
+            except Exception as e:
+                log.exception("workspace sweep failed: %s", e)
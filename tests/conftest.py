@@ -1,6 +1,10 @@
 import os
+from typing import Iterator
+
 import pytest
 
+from pygologin.testing import StandInServer
+
 
 @pytest.fixture()
 def access_token() -> str:
@@ -16,3 +20,9 @@ def profile_id() -> str:
     if not profile_id:
         raise ValueError("PROFILE_ID environment variable is not set")
     return profile_id
+
+
+@pytest.fixture()
+def server() -> Iterator[StandInServer]:
+    with StandInServer() as server:
+        yield server
@@ -0,0 +1,209 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+import requests
+
+from pygologin import GoLogin
+from pygologin.agent import Agent, AgentClient
+from pygologin.exceptions import AgentError, ProfileInUseError
+from pygologin.testing import StandInServer
+from pygologin.testing.fake_orbita import write_launcher
+
+
+def agent_options(server: StandInServer, tmp_path: Path) -> Dict[str, Any]:
+    return {
+        "token": "standin-token",
+        "tmpdir": str(tmp_path / "agent"),
+        "executablePath": write_launcher(str(tmp_path / "fake-orbita")),
+        **server.options(),
+    }
+
+
+class DropPostHandler(BaseHTTPRequestHandler):
+    # answers GETs, and hangs up on a POST after reading it, like an agent
+    # that died right after starting the profile
+    protocol_version = "HTTP/1.1"
+    posts: List[str] = []
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.posts.append(self.path)
+        self.close_connection = True
+
+
+@pytest.fixture()
+def drop_post() -> Iterator[str]:
+    DropPostHandler.posts = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), DropPostHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestAgentClient:
+    def test_post_is_not_resent(self, drop_post: str) -> None:
+        client = AgentClient(drop_post, auth_token="t")
+        client.health()
+        with pytest.raises(AgentError, match="dropped the connection"):
+            client.start("p1")
+        assert DropPostHandler.posts == ["/start"]
+
+    def test_idle_closed_connection_is_replaced(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        with Agent(agent_options(server, tmp_path), port=0) as agent:
+            client = AgentClient(agent.address, agent.auth_token, client="first")
+            client.health()
+            # what the agent's idle timeout does to a keep-alive connection
+            client._local.connection.sock.shutdown(socket.SHUT_RD)
+            assert client.lease("p1")["owner"] == "first"
+
+
+class TestAgent:
+    def test_thin_client_start_stop(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        profile_id = server.add_profile()
+        with Agent(agent_options(server, tmp_path), port=0) as agent:
+            # the client has no Orbita of its own
+            client = {"agent": agent.address, "agent_auth_token": agent.auth_token}
+            gl = GoLogin({"profile_id": profile_id, **client})
+            url = gl.start()
+            assert requests.get(f"http://{url}/json/version").ok
+            assert [b["profile_id"] for b in gl.agent.browsers()] == [profile_id]
+
+            other = GoLogin({"profile_id": profile_id, **client})
+            with pytest.raises(ProfileInUseError, match="already running"):
+                other.start()
+
+            gl.stop()
+            assert gl.agent.browsers() == []
+            gl.start()
+            gl.stop()
+            stats = gl.agent.stats()
+            assert (stats["starts"], stats["stops"]) == (2, 2)
+            assert stats["profile_cache"]["hits"] == 1
+            assert stats["timezone_cache"]["hits"] == 1
+        assert server.requests.count(("GET", f"/browser/{profile_id}")) == 1
+
+    def test_unix_socket_and_auth(self, server: StandInServer, tmp_path: Path) -> None:
+        socket_path = str(tmp_path / "agent.sock")
+        profile_id = server.add_profile()
+        with Agent(
+            agent_options(server, tmp_path),
+            socket_path=socket_path,
+            auth_token="s3cret",
+        ) as agent:
+            assert agent.address == "unix://" + socket_path
+            with pytest.raises(AgentError, match="401"):
+                AgentClient(agent.address).health()
+
+            client = AgentClient(agent.address, auth_token="s3cret")
+            assert client.health()["status"] == "ok"
+            result = client.start(profile_id, {"spawn_browser": False})
+            assert Path(result["profile_path"], "Default", "Preferences").exists()
+            client.stop(profile_id)
+            with pytest.raises(AgentError, match="404"):
+                client.stop(profile_id)
+
+    def test_leases(self, server: StandInServer, tmp_path: Path) -> None:
+        profile_id = server.add_profile()
+        with Agent(agent_options(server, tmp_path), port=0) as agent:
+            first = AgentClient(agent.address, agent.auth_token, client="first")
+            second = AgentClient(agent.address, agent.auth_token, client="second")
+            lease = first.lease(profile_id, ttl=30)
+            assert first.lease(profile_id, ttl=30)["token"] == lease["token"]
+            with pytest.raises(ProfileInUseError, match="leased by first"):
+                second.lease(profile_id)
+            with pytest.raises(ProfileInUseError):
+                second.start(profile_id, {"spawn_browser": False})
+
+            first.start(profile_id, {"spawn_browser": False}, lease=lease["token"])
+            first.stop(profile_id)
+            assert first.release(profile_id, lease["token"])["released"]
+            assert not first.release(profile_id, lease["token"])["released"]
+            taken = second.lease(profile_id)
+            # the backend's fencing token grows when the profile changes hands
+            assert taken["owner"] == "second" and taken["token"] > lease["token"]
+            with pytest.raises(ProfileInUseError):
+                first.start(profile_id, {"spawn_browser": False}, lease=lease["token"])
+
+    def test_tcp_requests_are_guarded(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        token_file = str(tmp_path / "agent.token")
+        with Agent(
+            agent_options(server, tmp_path), port=0, token_file=token_file
+        ) as agent:
+            assert agent.auth_token
+            assert Path(token_file).read_text() == agent.auth_token
+            assert Path(token_file).stat().st_mode & 0o077 == 0
+            url = agent.address + "/lease"
+            body = '{"profile_id": "p1", "owner": "evil"}'
+            auth = {"Authorization": "Bearer " + agent.auth_token}
+            json_type = {"Content-Type": "application/json"}
+
+            # a web page: simple cross-origin POST, no credentials
+            page = requests.post(
+                url,
+                data=body,
+                headers={
+                    "Content-Type": "text/plain",
+                    "Origin": "https://evil.example",
+                },
+            )
+            assert page.status_code == 403
+            assert requests.post(url, data=body, headers=json_type).status_code == 401
+            text = requests.post(
+                url, data=body, headers={**auth, "Content-Type": "text/plain"}
+            )
+            assert text.status_code == 415
+            rebound = requests.post(
+                url, data=body, headers={**auth, **json_type, "Host": "evil.example"}
+            )
+            assert rebound.status_code == 403
+            assert agent.leases.get("p1") is None
+
+            ok = requests.post(url, data=body, headers={**auth, **json_type})
+            assert ok.status_code == 200
+        assert not Path(token_file).exists()
+
+    def test_client_cannot_set_agent_options(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        with Agent(agent_options(server, tmp_path), port=0) as agent:
+            gl = agent.gologin(
+                server.add_profile(),
+                {
+                    "token": "someone-else",
+                    "extra_params": ["--renderer-cmd-prefix=touch /tmp/x"],
+                    "spawn_browser": False,
+                },
+            )
+            assert gl.access_token == "standin-token"
+            assert gl.extra_params == []
+            assert gl.spawn_browser is False
+
+
+def test_agent_subcommand_parses() -> None:
+    from pygologin.__main__ import build_parser
+
+    args = build_parser().parse_args(["agent", "--socket", "/tmp/a.sock"])
+    assert args.socket == "/tmp/a.sock"
+    assert args.handler.__name__ == "agent"
@@ -0,0 +1,41 @@
+import threading
+import time
+
+from pygologin.cache import TTLCache
+
+
+class TestTTLCache:
+    def test_expiry_and_lru(self) -> None:
+        cache: TTLCache[int] = TTLCache(ttl=0.1, max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)  # evicts b, the least recently used
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+        time.sleep(0.15)
+        assert cache.get("a") is None
+        assert cache.stats() == {"entries": 1, "hits": 2, "misses": 2}
+
+    def test_concurrent_loads_share_one_call(self) -> None:
+        cache: TTLCache[str] = TTLCache(ttl=60)
+        calls = []
+
+        def load() -> str:
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.get_or_load("k", load))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == ["value"] * 5
+        assert len(calls) == 1
@@ -0,0 +1,169 @@
+import io
+import os
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import psutil
+import pytest
+import requests
+
+from pygologin import GoLogin, getRandomPort
+from pygologin.cdp import (
+    OP_TEXT,
+    CDPClient,
+    encode_frame,
+    from_cdp_cookie,
+    read_frame,
+    to_cdp_cookie,
+)
+from pygologin.testing import StandInServer
+from pygologin.testing.fake_orbita import write_launcher
+
+COOKIE = {
+    "domain": ".example.com",
+    "name": "sid",
+    "value": "abc",
+    "path": "/",
+    "sameSite": "lax",
+    "secure": True,
+    "httpOnly": True,
+    "session": False,
+    "expirationDate": 2000000000,
+}
+
+
+@pytest.fixture()
+def launcher(tmp_path: Path) -> str:
+    return write_launcher(str(tmp_path / "fake-orbita"))
+
+
+def test_frame_roundtrip() -> None:
+    for size in (0, 10, 300, 70000):
+        payload = os.urandom(size)
+        frame = encode_frame(OP_TEXT, payload, mask=True)
+        assert read_frame(io.BytesIO(frame)) == (True, OP_TEXT, payload)
+
+
+def test_cookie_conversion() -> None:
+    cdp = to_cdp_cookie(COOKIE)
+    assert cdp["sameSite"] == "Lax"
+    assert cdp["expires"] == 2000000000
+
+    cookie = from_cdp_cookie({**cdp, "session": False})
+    assert cookie["sameSite"] == "lax"
+    assert cookie["url"] == "https://example.com/"
+    assert cookie["expirationDate"] == 2000000000
+
+
+def test_host_only_cookie_uses_url() -> None:
+    cdp = to_cdp_cookie({**COOKIE, "domain": "www.example.com", "hostOnly": True})
+    assert "domain" not in cdp
+    assert cdp["url"] == "https://www.example.com/"
+
+    cdp = to_cdp_cookie({**COOKIE, "hostOnly": False})
+    assert cdp["domain"] == ".example.com" and "url" not in cdp
+
+
+@pytest.mark.skipif(os.name == "nt", reason="launcher needs a shebang")
+class TestCDPCookies:
+    def test_client(self, launcher: str, tmp_path: Path) -> None:
+        port = getRandomPort()
+        process = subprocess.Popen([launcher, f"--remote-debugging-port={port}"])
+        try:
+            deadline = time.monotonic() + 10
+            while True:
+                try:
+                    targets = requests.get(f"http://127.0.0.1:{port}/json").json()
+                    break
+                except requests.ConnectionError:
+                    assert time.monotonic() < deadline
+                    time.sleep(0.05)
+
+            with CDPClient(targets[0]["webSocketDebuggerUrl"]) as client:
+                client.send(
+                    "Network.setCookies",
+                    {
+                        "cookies": [
+                            to_cdp_cookie(COOKIE),
+                            to_cdp_cookie({**COOKIE, "domain": "example.com"}),
+                        ]
+                    },
+                )
+                cookies = client.send("Network.getAllCookies")["cookies"]
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+        assert sorted((c["domain"], c["name"]) for c in cookies) == [
+            (".example.com", "sid"),
+            ("example.com", "sid"),
+        ]
+
+    def test_gologin_round_trip(self, launcher: str, tmp_path: Path) -> None:
+        with StandInServer() as server:
+            profile_id = server.add_profile()
+            server.cookies[profile_id] = [COOKIE]
+            gl = GoLogin(
+                {
+                    "token": "standin-token",
+                    "profile_id": profile_id,
+                    "tmpdir": str(tmp_path),
+                    "executablePath": launcher,
+                    "port": getRandomPort(),
+                    "cookies_via_cdp": True,
+                    "writeCookiesFromServer": True,
+                    "uploadCookiesToServer": True,
+                    **server.options(),
+                }
+            )
+            gl.start()
+            assert [cookie["name"] for cookie in gl.getBrowserCookies()] == ["sid"]
+            gl.setBrowserCookies([{**COOKIE, "name": "other"}])
+            gl.stop()
+
+            uploaded = sorted(cookie["name"] for cookie in server.cookies[profile_id])
+        assert uploaded == ["other", "sid"]
+
+    def test_failed_injection_kills_browser(
+        self, launcher: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        def fail(gl: GoLogin, cookies: List[Dict[str, Any]]) -> None:
+            # the merger dropped the expired cookie before injection
+            assert [cookie["name"] for cookie in cookies] == ["sid"]
+            raise ValueError("no page target")
+
+        launched: List[int] = []
+        launch = GoLogin.launchBrowser
+
+        def record(gl: GoLogin) -> int:
+            launched.append(launch(gl))
+            return launched[-1]
+
+        monkeypatch.setattr(GoLogin, "setBrowserCookies", fail)
+        monkeypatch.setattr(GoLogin, "launchBrowser", record)
+        with StandInServer() as server:
+            profile_id = server.add_profile()
+            server.cookies[profile_id] = [
+                COOKIE,
+                {**COOKIE, "name": "old", "expirationDate": 1000000000},
+            ]
+            gl = GoLogin(
+                {
+                    "token": "standin-token",
+                    "profile_id": profile_id,
+                    "tmpdir": str(tmp_path),
+                    "executablePath": launcher,
+                    "port": getRandomPort(),
+                    "cookies_via_cdp": True,
+                    "writeCookiesFromServer": True,
+                    "max_rss": 1 << 30,
+                    **server.options(),
+                }
+            )
+            with pytest.raises(ValueError):
+                gl.start()
+            assert gl.pid == 0 and not psutil.pid_exists(launched[0])
+            assert gl.supervisor is not None and gl.supervisor.metrics() == {}
+            assert gl.launch_lock is None and gl.workspace_lock is None
@@ -0,0 +1,145 @@
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from pygologin import GoLogin
+from pygologin.committer import DONE, FAILED, Committer, CommitJob
+from pygologin.exceptions import CommitPendingError
+from pygologin.testing import StandInServer
+from pygologin.workspace import Workspace
+
+
+class TestCommitter:
+    def test_retries_and_callbacks(self, tmp_path: Path) -> None:
+        finished: List[CommitJob] = []
+        committer = Committer(
+            str(tmp_path), retries=2, backoff=0, on_complete=finished.append
+        )
+        calls = []
+
+        def flaky() -> None:
+            calls.append(1)
+            if len(calls) < 3:
+                raise OSError("upload failed")
+
+        job = committer.submit("p1", flaky)
+        assert committer.flush(timeout=5)
+        assert (job.status, job.attempts) == (DONE, 3)
+        assert finished == [job]
+        assert not committer.pending("p1")
+        assert not (tmp_path / "gologin_p1.commit").exists()
+        assert committer.stats() == {"pending": 0, "completed": 1, "failed": 0}
+
+    def test_failed_commit_blocks_start(self, tmp_path: Path) -> None:
+        committer = Committer(str(tmp_path), retries=0)
+
+        def broken() -> None:
+            raise OSError("no network")
+
+        job = committer.submit("p1", broken)
+        committer.flush()
+        assert job.status == FAILED
+        state = json.loads((tmp_path / "gologin_p1.commit").read_text())
+        assert state["error"] == "OSError: no network"
+        with pytest.raises(CommitPendingError, match="failed commit"):
+            committer.guard("p1")
+        assert Workspace(str(tmp_path)).is_locked("p1")
+
+        committed: List[str] = []
+        jobs = committer.recover(
+            lambda profile_id: lambda: committed.append(profile_id)
+        )
+        committer.join()
+        assert [job.profile_id for job in jobs] == ["p1"] and committed == ["p1"]
+        committer.guard("p1")
+
+    def test_guard_waits_for_queued_commit(self, tmp_path: Path) -> None:
+        committer = Committer(str(tmp_path), workers=1)
+        release = threading.Event()
+        committer.submit("p1", release.wait)
+        with pytest.raises(CommitPendingError, match="queued|running"):
+            committer.guard("p1")
+        threading.Timer(0.1, release.set).start()
+        committer.guard("p1", timeout=5)
+        assert committer.join(timeout=5)
+
+    def test_recover_after_crash(self, tmp_path: Path) -> None:
+        # pid 2**22 + 1 is above the default pid_max
+        state = {"profile_id": "p2", "pid": 2**22 + 1, "status": "running"}
+        (tmp_path / "gologin_p2.commit").write_text(json.dumps(state))
+        alive = {"profile_id": "p3", "pid": 1, "status": "running"}
+        (tmp_path / "gologin_p3.commit").write_text(json.dumps(alive))
+
+        committer = Committer(str(tmp_path))
+        assert committer.stale() == ["p2"]
+        committer.recover(lambda profile_id: lambda: None)
+        committer.join()
+        assert not committer.pending("p2")
+        assert committer.pending("p3")
+
+
+def test_gologin_background_commit(tmp_path: Path) -> None:
+    committed: List[CommitJob] = []
+    with StandInServer(latency=0.1) as server:
+        profile_id = server.add_profile()
+        gl = GoLogin(
+            {
+                "token": "standin-token",
+                "profile_id": profile_id,
+                "tmpdir": str(tmp_path),
+                "executablePath": sys.executable,
+                "spawn_browser": False,
+                "background_commit": True,
+                "on_commit": committed.append,
+                **server.options(),
+            }
+        )
+        profile_path = gl.start()
+        gl.stop()
+        assert gl.committer is not None
+        if gl.committer.pending(profile_id):
+            with pytest.raises(CommitPendingError):
+                gl.start()
+        assert gl.committer.flush(timeout=30)
+        assert [job.status for job in committed] == [DONE]
+        assert ("PUT", "/upload") in server.requests
+        assert not Path(profile_path).exists()
+        assert not Workspace(str(tmp_path)).is_locked(profile_id)
+
+        gl.start()
+        gl.stop()
+        assert gl.committer.join(timeout=30)
+        assert len(committed) == 2
+
+
+def test_background_commit_outlives_profile_switch(tmp_path: Path) -> None:
+    with StandInServer(latency=0.1) as server:
+        first, second = server.add_profile(), server.add_profile()
+        gl = GoLogin(
+            {
+                "token": "standin-token",
+                "profile_id": first,
+                "tmpdir": str(tmp_path),
+                "executablePath": sys.executable,
+                "spawn_browser": False,
+                "background_commit": True,
+                **server.options(),
+            }
+        )
+        first_path = gl.start()
+        gl.stop()
+        # the instance moves on before the queued commit runs
+        gl.setProfileId(second)
+        second_path = gl.start()
+        assert gl.committer is not None
+        assert gl.committer.flush(timeout=30)
+        assert not Path(first_path).exists()
+        assert Path(second_path).exists()
+        assert not Workspace(str(tmp_path)).is_locked(first)
+        assert Workspace(str(tmp_path)).is_locked(second)
+        gl.stop()
+        assert gl.committer.join(timeout=30)
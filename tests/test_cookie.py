@@ -0,0 +1,70 @@
+import json
+
+from pygologin.cookiesManager import Cookie, CookieBatch, CookiesManager
+from pygologin.cookiesManager.cookie import INSERT_COLUMNS
+
+COOKIES = [
+    {
+        "domain": ".example.com",
+        "name": "sid",
+        "value": "abc",
+        "path": "/",
+        "sameSite": "lax",
+        "secure": True,
+        "httpOnly": True,
+        "session": False,
+        "expirationDate": 2000000000,
+        "creationDate": 1700000000,
+    },
+    {
+        "domain": "example.org",
+        "name": "__Host-pref",
+        "value": "1",
+        "path": "/",
+        "sameSite": "unspecified",
+        "session": True,
+        "expirationDate": 2000000000,
+    },
+]
+
+
+class TestCookie:
+    def test_slots(self) -> None:
+        cookie = Cookie.from_dict(COOKIES[0])
+        assert not hasattr(cookie, "__dict__")
+        assert Cookie.from_dict(cookie.as_dict()) == cookie
+
+    def test_batch_roundtrip(self) -> None:
+        batch = CookieBatch.from_dicts(COOKIES)
+        assert len(batch) == 2
+        assert list(batch) == [Cookie.from_dict(c) for c in COOKIES]
+        assert CookieBatch.from_cookies(batch).to_api() == batch.to_api()
+
+        api = json.loads(batch.to_json())
+        assert api[0]["url"] == "https://example.com/"
+        assert api[0]["sameSite"] == "lax"
+        assert api[1]["hostOnly"] is True
+        assert api[1]["expirationDate"] == 0
+
+    def test_sqlite_params(self) -> None:
+        first, second = CookieBatch.from_dicts(COOKIES).sqlite_params(now=42)
+        first = dict(zip(INSERT_COLUMNS, first))
+        second = dict(zip(INSERT_COLUMNS, second))
+        assert first["creation_utc"] == 1700000000
+        assert first["encrypted_value"] == "abc"
+        assert (first["samesite"], first["source_port"], first["has_expires"]) == (
+            1,
+            443,
+            1,
+        )
+        # a __Host- cookie is always secure; a session cookie never expires
+        assert (second["is_secure"], second["source_scheme"]) == (1, 2)
+        assert (second["expires_utc"], second["is_persistent"]) == (0, 0)
+        assert second["creation_utc"] == 42
+
+    def test_manager_adapter(self) -> None:
+        chunks = CookiesManager().get_chunked_insert_values(COOKIES)
+        assert len(chunks) == 2
+        query, params = chunks[0]
+        assert query.startswith("insert or replace into cookies")
+        assert query.count("?") == len(params[0])
@@ -0,0 +1,136 @@
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from pygologin import GoLogin
+from pygologin.__main__ import main
+from pygologin.cookiesManager import BulkResult, CookiesManager
+from pygologin.testing import StandInServer
+from tests.test_cookies_merger import cookie, make_cookies_db
+
+FUTURE = int(time.time()) + 86400
+
+
+def gologin(server: StandInServer, tmp_path: Path) -> GoLogin:
+    return GoLogin(
+        {
+            "token": "standin-token",
+            "tmpdir": str(tmp_path),
+            "executablePath": sys.executable,
+            **server.options(),
+        }
+    )
+
+
+def add_profiles(server: StandInServer, count: int) -> List[str]:
+    profile_ids = []
+    for index in range(count):
+        profile_id = server.add_profile()
+        server.cookies[profile_id] = [
+            cookie("sid", value=profile_id, expirationDate=FUTURE),
+            cookie("lang", value=str(index), expirationDate=FUTURE),
+        ]
+        profile_ids.append(profile_id)
+    return profile_ids
+
+
+class TestCookiesBulk:
+    def test_download_and_upload_directory(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        profile_ids = add_profiles(server, 6)
+        gl = gologin(server, tmp_path)
+        seen: List[BulkResult] = []
+        results = gl.downloadCookiesMany(
+            profile_ids + ["missing"],
+            str(tmp_path / "out"),
+            max_workers=3,
+            on_result=seen.append,
+        )
+        assert len(seen) == 7
+        assert not results["missing"].ok
+        assert "HTTPError" in (results["missing"].error or "")
+        assert not (tmp_path / "out" / "missing.json").exists()
+        for profile_id in profile_ids:
+            assert results[profile_id].ok and results[profile_id].cookies == 2
+            with open(tmp_path / "out" / f"{profile_id}.json") as f:
+                assert json.load(f) == server.cookies[profile_id]
+
+        expected = {p: server.cookies[p] for p in profile_ids}
+        cleared = gl.clearCookiesMany(profile_ids, max_workers=3)
+        assert all(result.ok for result in cleared.values())
+        assert all(server.cookies[p] == [] for p in profile_ids)
+
+        uploaded = gl.uploadCookiesMany(profile_ids, str(tmp_path / "out"))
+        assert all(result.cookies == 2 for result in uploaded.values())
+        # each profile gets its own cookies, not those of gl.profile_id
+        assert {p: server.cookies[p] for p in profile_ids} == expected
+        assert (
+            server.requests.count(("POST", f"/browser/{profile_ids[0]}/cookies")) == 2
+        )
+
+    def test_download_into_local_profiles(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        profile_ids = add_profiles(server, 2)
+        for profile_id in profile_ids:
+            make_cookies_db(tmp_path, profile_id)
+        gl = gologin(server, tmp_path)
+        results = gl.downloadCookiesMany(profile_ids + ["not-extracted"])
+        assert "FileNotFoundError" in (results["not-extracted"].error or "")
+
+        manager = CookiesManager(profile_id=profile_ids[1], tmpdir=str(tmp_path))
+        assert results[profile_ids[1]].path == manager.get_cookies_file_path()
+        local = manager.load_cookies_from_file()
+        assert {c["value"] for c in local if c["name"] == "sid"} == {profile_ids[1]}
+
+        server.cookies[profile_ids[1]] = []
+        uploaded = gl.uploadCookiesMany([profile_ids[1]])
+        assert uploaded[profile_ids[1]].cookies == 2
+        assert len(server.cookies[profile_ids[1]]) == 2
+
+    def test_rate(self, server: StandInServer, tmp_path: Path) -> None:
+        profile_ids = add_profiles(server, 8)
+        gl = gologin(server, tmp_path)
+        started = time.monotonic()
+        results = gl.clearCookiesMany(profile_ids, max_workers=8, rate=5)
+        # a burst of five, then three more at 5/s
+        assert time.monotonic() - started >= 0.55
+        assert all(result.ok for result in results.values())
+
+    def test_cli(
+        self,
+        server: StandInServer,
+        tmp_path: Path,
+        capsys: pytest.CaptureFixture,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        profile_ids = add_profiles(server, 2)
+        ids_file = tmp_path / "ids.txt"
+        ids_file.write_text("\n".join(profile_ids) + "\n")
+        monkeypatch.setattr("pygologin.gologin.API_URL", server.url)
+        assert (
+            main(
+                [
+                    "cookies",
+                    "download",
+                    "--token",
+                    "standin-token",
+                    "--profiles-file",
+                    str(ids_file),
+                    "--dir",
+                    str(tmp_path / "out"),
+                    "--tmpdir",
+                    str(tmp_path),
+                    "--executable-path",
+                    sys.executable,
+                ]
+            )
+            == 0
+        )
+        assert "2 ok, 0 failed" in capsys.readouterr().err
+        assert (tmp_path / "out" / f"{profile_ids[0]}.json").exists()
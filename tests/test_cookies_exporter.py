@@ -0,0 +1,67 @@
+import io
+import json
+from pathlib import Path
+
+from pygologin.__main__ import main
+from pygologin.cookiesManager import CookiesExporter, CookiesManager, CookiesMerger
+from tests.test_cookies_merger import NOW, cookie, make_cookies_db
+
+
+def make_profiles(tmp_path: Path, count: int) -> None:
+    for index in range(count):
+        profile_id = f"p{index:03d}"
+        make_cookies_db(tmp_path, profile_id)
+        CookiesManager(
+            profile_id=profile_id, tmpdir=str(tmp_path), merger=CookiesMerger(now=NOW)
+        ).write_cookies_to_file(
+            [
+                cookie("sid", value=profile_id),
+                cookie("ad", domain=".ads.net"),
+                cookie("sub", domain="shop.example.com"),
+            ]
+        )
+
+
+class TestCookiesExporter:
+    def test_export(self, tmp_path: Path) -> None:
+        make_profiles(tmp_path, 12)
+        (tmp_path / "gologin_empty" / "Default").mkdir(parents=True)
+        (tmp_path / "unrelated").mkdir()
+
+        out = io.StringIO()
+        seen = {}
+        stats = CookiesExporter(
+            str(tmp_path), domains=["example.com"], workers=2, chunksize=4
+        ).export(
+            out, callback=lambda profile_id, cookies: seen.update({profile_id: cookies})
+        )
+        assert stats == {"profiles": 12, "cookies": 24, "errors": 0}
+
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [line["profile_id"] for line in lines] == sorted(seen)
+        first = lines[0]["cookies"]
+        assert {c["domain"] for c in first} == {".example.com", "shop.example.com"}
+        assert {c["value"] for c in first if c["name"] == "sid"} == {"p000"}
+
+    def test_errors_and_cli(self, tmp_path: Path, capsys) -> None:
+        make_profiles(tmp_path, 2)
+        broken = tmp_path / "gologin_broken" / "Default" / "Cookies"
+        broken.parent.mkdir(parents=True)
+        broken.write_bytes(b"not a database")
+
+        code = main(
+            [
+                "export-cookies",
+                "--tmpdir",
+                str(tmp_path),
+                "--workers",
+                "1",
+                "--domain",
+                "ads.net",
+            ]
+        )
+        assert code == 1
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [line["profile_id"] for line in lines] == ["broken", "p000", "p001"]
+        assert "error" in lines[0]
+        assert [c["name"] for c in lines[1]["cookies"]] == ["ad"]
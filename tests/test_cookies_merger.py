@@ -0,0 +1,122 @@
+import os
+import sqlite3
+from pathlib import Path
+
+from pygologin.cookiesManager import CookiesManager, CookiesMerger
+from pygologin.cookiesManager.cookiesManager import COOKIE_ROW_COLUMN_NAMES
+from pygologin.cookiesManager.cookiesMerger import to_unix_seconds
+
+NOW = 1700000000
+
+
+def cookie(name: str, **fields):
+    return {
+        "domain": ".example.com",
+        "name": name,
+        "value": "v",
+        "path": "/",
+        "sameSite": "lax",
+        "session": False,
+        "expirationDate": NOW + 3600,
+        "creationDate": NOW - 10,
+        **fields,
+    }
+
+
+def make_cookies_db(tmp_path: Path, profile_id: str) -> str:
+    path = tmp_path / f"gologin_{profile_id}" / "Default" / "Cookies"
+    os.makedirs(path.parent)
+    db = sqlite3.connect(str(path))
+    columns = ", ".join(COOKIE_ROW_COLUMN_NAMES + ["is_same_party"])
+    db.execute(f"create table cookies ({columns})")
+    db.execute(
+        "create unique index cookies_unique_index on cookies "
+        "(host_key, top_frame_site_key, name, path, source_scheme, source_port)"
+    )
+    db.commit()
+    db.close()
+    return str(path)
+
+
+class TestCookiesMerger:
+    def test_newest_wins(self) -> None:
+        merger = CookiesMerger(now=NOW)
+        older = cookie("sid", value="old", creationDate=NOW - 100)
+        newer = cookie("sid", value="new", creationDate=NOW - 1)
+        for sources in (([older], [newer]), ([newer], [older])):
+            merged, report = merger.merge(*sources)
+            assert [c["value"] for c in merged] == ["new"]
+            assert report.duplicates == 1
+            assert report.kept == 1
+
+    def test_key_includes_path_and_top_frame(self) -> None:
+        merged, report = CookiesMerger(now=NOW).merge(
+            [
+                cookie("sid"),
+                cookie("sid", path="/app"),
+                cookie("sid", topFrameSiteKey="https://other.com"),
+            ]
+        )
+        assert len(merged) == 3
+        assert report.duplicates == 0
+
+    def test_policy(self) -> None:
+        cookies = [
+            cookie("live"),
+            cookie("expired", expirationDate=NOW - 1),
+            cookie("session", session=True, expirationDate=0),
+        ]
+        merged, report = CookiesMerger(now=NOW).merge(cookies)
+        assert {c["name"] for c in merged} == {"live", "session"}
+        assert report.expired == 1
+
+        merged, report = CookiesMerger(drop_session=True, now=NOW).merge(cookies)
+        assert [c["name"] for c in merged] == ["live"]
+        assert (report.expired, report.session, report.dropped) == (1, 1, 2)
+
+    def test_chrome_time(self) -> None:
+        chrome = (NOW + 11644473600) * 1000000
+        assert to_unix_seconds(chrome) == NOW
+        assert to_unix_seconds(NOW) == NOW
+
+
+class TestWriteCookies:
+    def test_compacts_file(self, tmp_path: Path) -> None:
+        db_path = make_cookies_db(tmp_path, "p1")
+        manager = CookiesManager(
+            profile_id="p1", tmpdir=str(tmp_path), merger=CookiesMerger(now=NOW)
+        )
+        manager.write_cookies_to_file(
+            [cookie("stale", expirationDate=NOW + 10), cookie("local", value="mine")]
+        )
+
+        # "stale" expires in the file, "local" was changed after the server copy
+        db = sqlite3.connect(db_path)
+        db.execute(
+            "update cookies set expires_utc = ? where name = 'stale'", (NOW - 5,)
+        )
+        db.execute(
+            "update cookies set creation_utc = ? where name = 'local'",
+            ((NOW + 11644473600) * 1000000,),
+        )
+        db.commit()
+        db.close()
+
+        report = manager.write_cookies_to_file(
+            [
+                cookie("local", value="server"),
+                cookie("fresh"),
+                cookie("fresh", value="dup", creationDate=NOW - 50),
+                cookie("gone", expirationDate=NOW - 1),
+            ]
+        )
+        assert report.as_dict() == {
+            "received": 4,
+            "kept": 1,
+            "duplicates": 1,
+            "expired": 2,
+            "session": 0,
+            "stale": 1,
+        }
+        cookies = {c["name"]: c["value"] for c in manager.load_cookies_from_file()}
+        assert cookies == {"local": "mine", "fresh": "v"}
@@ -0,0 +1,132 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional, Tuple
+
+import pytest
+
+from pygologin.download import RangedDownload
+from pygologin.exceptions import DownloadError
+from pygologin.testing import StandInServer
+from pygologin.transport import Transport
+
+
+def download(server: StandInServer, path: Path, **kwargs) -> RangedDownload:
+    return RangedDownload(
+        Transport(backoff_factor=0),
+        server.url + "/download",
+        str(path),
+        headers={"browserId": "profile"},
+        **kwargs,
+    )
+
+
+def write_part(
+    target: Path,
+    data: bytes,
+    validator: bytes,
+    checksum: Optional[Tuple[str, str]] = None,
+) -> None:
+    # a partial left by an earlier run of the object validator belongs to
+    Path(str(target) + ".part").write_bytes(data)
+    digest = hashlib.sha256(validator).hexdigest()
+    state = {"validator": f'"{digest[:16]}"', "checksum": checksum}
+    Path(str(target) + ".part.validator").write_text(json.dumps(state))
+
+
+class TestRangedDownload:
+    def test_resume_part_file(self, tmp_path: Path) -> None:
+        with StandInServer(profile_size=100_000) as server:
+            server.add_profile("profile")
+            data = server.zips["profile"]
+            target = tmp_path / "profile.zip"
+            write_part(target, data[:40_000], data)
+
+            job = download(server, target)
+            assert job.run() == len(data)
+
+        assert target.read_bytes() == data
+        assert job.resumed == 1
+        assert not Path(str(target) + ".part").exists()
+        assert not Path(str(target) + ".part.validator").exists()
+
+    def test_stale_part_file_is_replaced(self, tmp_path: Path) -> None:
+        with StandInServer(profile_size=100_000) as server:
+            server.add_profile("profile")
+            data = server.zips["profile"]
+            # from an older version of the profile: If-Range gets it all anew
+            stale = tmp_path / "stale.zip"
+            write_part(stale, b"old" * 10_000, b"old version")
+            assert download(server, stale).run() == len(data)
+            # no validator: unknown version, not resumed
+            unknown = tmp_path / "unknown.zip"
+            Path(str(unknown) + ".part").write_bytes(data[:40_000])
+            job = download(server, unknown)
+            job.run()
+            # longer than the object: 416, then a full GET
+            longer = tmp_path / "longer.zip"
+            write_part(longer, data + b"tail", data)
+            assert download(server, longer).run() == len(data)
+
+        assert stale.read_bytes() == unknown.read_bytes() == data
+        assert longer.read_bytes() == data
+        assert job.resumed == 0
+
+    def test_resume_with_content_md5(self, tmp_path: Path) -> None:
+        with StandInServer(profile_size=100_000, checksum="md5") as server:
+            server.add_profile("profile")
+            data = server.zips["profile"]
+            # the 206's Content-MD5 covers the range only and is ignored
+            target = tmp_path / "profile.zip"
+            write_part(target, data[:40_000], data)
+            assert download(server, target).run() == len(data)
+            # the whole object's checksum, kept from the first response
+            md5 = hashlib.md5(data).hexdigest()
+            kept = tmp_path / "kept.zip"
+            write_part(kept, data[:40_000], data, ("md5", md5))
+            assert download(server, kept).run() == len(data)
+            wrong = tmp_path / "wrong.zip"
+            write_part(wrong, data[:40_000], data, ("md5", "0" * 32))
+            with pytest.raises(DownloadError):
+                download(server, wrong).run()
+            # a full download stores the checksum of the 200 next to the part
+            fresh = tmp_path / "fresh.zip"
+            job = download(server, fresh)
+            job.run()
+        assert target.read_bytes() == kept.read_bytes() == fresh.read_bytes() == data
+        assert job.checksum == ("md5", md5)
+
+    def test_truncated_transfers(self, tmp_path: Path) -> None:
+        with StandInServer(profile_size=100_000, truncate_rate=0.5, seed=3) as server:
+            server.add_profile("profile")
+            target = tmp_path / "profile.zip"
+            job = download(server, target, retries=20)
+            job.run()
+
+        assert target.read_bytes() == server.zips["profile"]
+        assert job.resumed > 0
+
+    def test_segments(self, tmp_path: Path) -> None:
+        with StandInServer(profile_size=100_000) as server:
+            server.add_profile("profile")
+            target = tmp_path / "profile.zip"
+            download(server, target, segments=4, segment_threshold=0).run()
+            gets = [r for r in server.requests if r == ("GET", "/download")]
+
+        assert target.read_bytes() == server.zips["profile"]
+        assert len(gets) == 5
+
+    def test_checksum_mismatch(self, tmp_path: Path) -> None:
+        with StandInServer(profile_size=10_000) as server:
+            server.add_profile("profile")
+            target = tmp_path / "profile.zip"
+            write_part(target, b"x" * 5_000, server.zips["profile"])
+
+            with pytest.raises(DownloadError):
+                download(server, target).run()
+
+        assert not target.exists()
+
+    def test_empty(self, tmp_path: Path) -> None:
+        with StandInServer() as server:
+            assert download(server, tmp_path / "empty.zip").run() == 0
@@ -0,0 +1,158 @@
+import gzip
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from pygologin import GoLogin
+from pygologin.__main__ import main
+from pygologin.eventlog import EventLog, analyze, format_report, read_events
+from pygologin.instrumentation import Instrumentation, count_retry
+from pygologin.testing import StandInServer
+
+
+def event(
+    phase: str, profile_id: str, start: float, duration: float, **extra
+) -> Dict[str, Any]:
+    return {
+        "phase": phase,
+        "profile_id": profile_id,
+        "start": start,
+        "end": start + duration,
+        "duration": duration,
+        "bytes": 0,
+        "retries": 0,
+        "outcome": "ok",
+        "error": None,
+        **extra,
+    }
+
+
+class TestEventLog:
+    def test_writes_spans_with_retries(self, tmp_path: Path) -> None:
+        path = tmp_path / "events.jsonl"
+        instrumentation = Instrumentation()
+        sink = EventLog(str(path))
+        instrumentation.add_listener(sink)
+        with instrumentation.span("download", "p1") as span:
+            span.add_bytes(10)
+            count_retry()
+            count_retry()
+            with instrumentation.span("extract", "p1"):
+                pass
+        with pytest.raises(OSError):
+            with instrumentation.span("upload", "p1"):
+                raise OSError("reset")
+        sink.close()
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [
+            (e["phase"], e["retries"], e["outcome"], e["depth"]) for e in lines
+        ] == [
+            ("extract", 0, "ok", 1),
+            ("download", 2, "ok", 0),
+            ("upload", 0, "error", 0),
+        ]
+        assert lines[1]["bytes"] == 10 and lines[2]["error"] == "OSError"
+
+    def test_rotation(self, tmp_path: Path) -> None:
+        path = tmp_path / "events.jsonl"
+        sink = EventLog(str(path), max_bytes=400, backups=2)
+        for index in range(20):
+            sink.write(event("spawn", f"p{index}", 0, 1))
+        sink.close()
+        assert path.stat().st_size <= 400
+        assert (tmp_path / "events.jsonl.1").exists()
+        assert (tmp_path / "events.jsonl.2").exists()
+        assert not (tmp_path / "events.jsonl.3").exists()
+
+
+class TestAnalyze:
+    def test_report(self, tmp_path: Path) -> None:
+        events = []
+        for index in range(10):
+            start = float(index)
+            slow = index == 9
+            events.append(event("getProfile", f"p{index}", start, 0.1))
+            events.append(
+                event(
+                    "getTimeZone",
+                    f"p{index}",
+                    start + 0.1,
+                    2.0 if slow else 0.2,
+                    proxy="slow.proxy" if slow else "fast.proxy",
+                )
+            )
+            events.append(event("download", f"p{index}", start + 0.3, 0.5, bytes=2**20))
+        events.append(
+            event("upload", "p3", 9.0, 1.0, outcome="error", error="HTTP503", retries=3)
+        )
+        path = tmp_path / "events.jsonl.gz"
+        with gzip.open(path, "wt") as f:
+            f.writelines(json.dumps(e) + "\n" for e in events)
+            f.write('{"phase": "spawn", "prof')  # cut short by a crash
+
+        report = analyze(read_events([str(path)]), top=2)
+        assert report["events"] == 31
+        assert report["starts"] == 10
+        assert report["window"] == pytest.approx(11.1)
+        assert report["starts_per_second"] == pytest.approx(10 / 11.1)
+        assert list(report["phases"]) == [
+            "getProfile",
+            "download",
+            "getTimeZone",
+            "upload",
+        ]
+        download = report["phases"]["download"]
+        assert download["p50"] == pytest.approx(0.5)
+        assert download["bytes"] == 10 * 2**20
+        upload = report["phases"]["upload"]
+        assert upload["error_classes"] == {"HTTP503": 1}
+        assert upload["retries"] == 3
+        assert report["slowest_profiles"][0]["profile_id"] == "p9"
+        assert report["slowest_profiles"][0]["proxy"] == "slow.proxy"
+        assert [p["proxy"] for p in report["slowest_proxies"]] == [
+            "slow.proxy",
+            "fast.proxy",
+        ]
+        assert "HTTP503: 1" in format_report(report)
+
+    def test_nested_spans_counted_once(self) -> None:
+        events = [
+            event("getProfile", "p1", 0.0, 0.5),
+            event("updatePreferences", "p1", 0.5, 2.0),
+            # runs inside updatePreferences
+            event("getTimeZone", "p1", 0.6, 1.5, depth=1, proxy="proxy"),
+            event("spawn", "p1", 2.5, 1.0),
+        ]
+        report = analyze(events)
+        assert report["slowest_profiles"][0]["seconds_per_start"] == pytest.approx(3.5)
+        assert report["slowest_proxies"][0]["seconds_per_start"] == pytest.approx(3.5)
+
+
+def test_gologin_event_log_and_analyze(
+    tmp_path: Path, capsys: pytest.CaptureFixture
+) -> None:
+    path = tmp_path / "logs" / "events.jsonl"
+    with StandInServer() as server:
+        gl = GoLogin(
+            {
+                "token": "standin-token",
+                "profile_id": server.add_profile(),
+                "tmpdir": str(tmp_path),
+                "executablePath": sys.executable,
+                "spawn_browser": False,
+                "event_log": str(path),
+                **server.options(),
+            }
+        )
+        gl.start()
+        gl.stop()
+
+    phases = {e["phase"] for e in read_events([str(path)])}
+    assert {"getProfile", "download", "extract", "zip", "upload"} <= phases
+    assert main(["analyze", str(path), "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["starts"] == 1
@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+from pygologin import GoLogin
+from pygologin.fingerprints import FingerprintPool
+from pygologin.testing import StandInServer
+
+
+def wait_for(predicate, timeout: float = 5) -> None:
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class TestFingerprintPool:
+    def test_refill_below_low_water(self) -> None:
+        calls = []
+        lock = threading.Lock()
+
+        def fetch(os_type: str):
+            with lock:
+                calls.append(os_type)
+                return {"os": os_type, "n": len(calls)}
+
+        pool = FingerprintPool(fetch, size=4, low_water=2)
+        pool.prefill(["lin", "mac"])
+        wait_for(lambda: pool.available("lin") == 4 and pool.available("mac") == 4)
+        assert len(calls) == 8
+
+        fingerprints = [pool.get("lin") for _ in range(2)]
+        assert all(f["os"] == "lin" for f in fingerprints)
+        assert len({f["n"] for f in fingerprints}) == 2
+        time.sleep(0.05)
+        assert len(calls) == 8  # still above the low-water mark
+
+        pool.get("lin")
+        wait_for(lambda: pool.available("lin") == 4)
+        assert len(calls) == 11
+        assert pool.stats()["hits"] == 3
+        pool.close()
+
+    def test_miss_fetches_inline_and_errors_are_counted(self) -> None:
+        def fetch(os_type: str):
+            if os_type == "bad":
+                raise RuntimeError("boom")
+            return {"os": os_type}
+
+        pool = FingerprintPool(fetch, size=2)
+        assert pool.get("win") == {"os": "win"}
+        assert pool.stats()["misses"] == 1
+        pool.prefill(["bad"])
+        wait_for(lambda: pool.stats()["errors"] == 2)
+        assert pool.available("bad") == 0
+        pool.close()
+
+
+class TestCreateWithPrefetch:
+    def test_create_uses_pool(self, tmp_path: Path) -> None:
+        with StandInServer(latency=0.05) as server:
+            options = {
+                "token": "standin-token",
+                "tmpdir": str(tmp_path),
+                "executablePath": sys.executable,
+                **server.options(),
+            }
+
+            plain = GoLogin(options)
+            started = time.monotonic()
+            for _ in range(5):
+                plain.create({"name": "plain"})
+            plain_time = time.monotonic() - started
+
+            gl = GoLogin({**options, "fingerprint_prefetch": 8})
+            gl.fingerprint_pool.prefill(["lin"])
+            wait_for(lambda: gl.fingerprint_pool.available("lin") == 8)
+            started = time.monotonic()
+            for _ in range(5):
+                gl.create({"name": "pooled"})
+            pooled_time = time.monotonic() - started
+            gl.fingerprint_pool.close()
+
+        assert gl.fingerprint_pool.stats()["hits"] == 5
+        assert len(server.profiles) == 10
+        assert pooled_time < plain_time * 0.8
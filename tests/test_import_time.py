@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+# modules that only start()/stop() or API calls need
+HEAVY_MODULES = (
+    "requests",
+    "urllib3",
+    "psutil",
+    "sqlite3",
+    "subprocess",
+    "zipfile",
+    "concurrent.futures",
+)
+# generous; a regression to eager imports costs well over 100ms
+BUDGET_MS = float(os.environ.get("PYGOLOGIN_IMPORT_BUDGET_MS", "60"))
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_times(code: str) -> Dict[str, int]:
+    # module -> self time in microseconds, from -X importtime output
+    times = {}
+    for line in run_python(code).stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+def new_modules(code: str) -> set:
+    script = (
+        "import sys; before = set(sys.modules); "
+        + code
+        + "; print(' '.join(set(sys.modules) - before))"
+    )
+    return set(run_python(script).stdout.split())
+
+
+class TestImportTime:
+    def test_heavy_modules_are_lazy(self) -> None:
+        loaded = new_modules("from pygologin import GoLogin, HistogramSink")
+        assert "pygologin.gologin" in loaded
+        assert not loaded & set(HEAVY_MODULES)
+
+        loaded = new_modules("import pygologin.cookiesManager")
+        assert "sqlite3" not in loaded
+
+    def test_budget(self) -> None:
+        baseline = import_times("pass")
+        best = min(
+            sum(
+                us
+                for name, us in import_times("from pygologin import GoLogin").items()
+                if name not in baseline
+            )
+            for _ in range(3)
+        )
+        assert best / 1000 < BUDGET_MS, f"import took {best / 1000:.1f}ms"
+
+    def test_lazy_attributes(self) -> None:
+        import pygologin
+
+        assert "GoLogin" in dir(pygologin)
+        assert pygologin.GoLogin.__module__ == "pygologin.gologin"
+        with pytest.raises(AttributeError):
+            pygologin.missing
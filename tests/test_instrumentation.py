@@ -0,0 +1,93 @@
+from typing import List
+
+import pytest
+
+from pygologin.instrumentation import (
+    NOOP_SPAN,
+    Histogram,
+    HistogramSink,
+    Instrumentation,
+    Span,
+    percentile,
+)
+
+
+class TestInstrumentation:
+    def test_noop_without_listeners(self) -> None:
+        instrumentation = Instrumentation()
+        assert instrumentation.span("download") is NOOP_SPAN
+        with instrumentation.span("download") as span:
+            assert not span.active
+            span.add_bytes(10)
+            span.set("key", "value")
+
+    def test_callback_receives_span(self) -> None:
+        spans: List[Span] = []
+        instrumentation = Instrumentation()
+        instrumentation.add_listener(spans.append)
+        with instrumentation.span("download", "profile") as span:
+            assert span.active
+            span.add_bytes(42)
+
+        assert len(spans) == 1
+        assert spans[0].phase == "download"
+        assert spans[0].profile_id == "profile"
+        assert spans[0].bytes == 42
+        assert spans[0].outcome == "ok"
+        assert spans[0].duration >= 0
+        assert spans[0].end == spans[0].start + spans[0].duration
+
+    def test_duration_ignores_wall_clock(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        spans: List[Span] = []
+        instrumentation = Instrumentation()
+        instrumentation.add_listener(spans.append)
+        clock = iter([1000.0, 900.0])
+        monkeypatch.setattr("pygologin.instrumentation.time.time", lambda: next(clock))
+        with instrumentation.span("download"):
+            pass
+        # the wall clock stepped back, the span still has a sane duration
+        assert spans[0].start == 1000.0
+        assert 0 <= spans[0].duration < 1
+
+    def test_error_outcome(self) -> None:
+        spans: List[Span] = []
+        instrumentation = Instrumentation()
+        instrumentation.add_listener(spans.append)
+        with pytest.raises(ValueError):
+            with instrumentation.span("extract"):
+                raise ValueError("bad zip")
+
+        assert spans[0].outcome == "error"
+        assert spans[0].error == "ValueError"
+
+    def test_histogram_sink(self) -> None:
+        sink = HistogramSink()
+        instrumentation = Instrumentation()
+        instrumentation.add_listener(sink)
+        for _ in range(3):
+            with instrumentation.span("zip") as span:
+                span.add_bytes(5)
+
+        summary = sink.summary()
+        assert summary["zip:ok"]["count"] == 3
+        assert summary["zip:ok"]["bytes"] == 15
+
+        instrumentation.remove_listener(sink)
+        assert instrumentation.enabled is False
+
+
+def test_histogram_window() -> None:
+    histogram = Histogram(window=4)
+    for value in range(100):
+        histogram.observe(float(value))
+    assert histogram.count == 100
+    assert histogram.sum == sum(range(100))
+    assert sum(histogram.counts) == 100
+    assert histogram.percentile(0) == 96.0
+    assert histogram.percentile(100) == 99.0
+
+
+def test_percentile() -> None:
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
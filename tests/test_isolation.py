@@ -0,0 +1,197 @@
+import os
+import resource
+import subprocess
+import sys
+from pathlib import Path
+
+import psutil
+import pytest
+
+from pygologin import GoLogin, getRandomPort
+from pygologin.isolation import CgroupV2, CpuAllocator, Isolation, parse_cpulist
+from pygologin.testing import StandInServer
+from pygologin.testing.fake_orbita import write_launcher
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="Linux isolation"
+)
+
+NODES = {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+
+
+def fake_cgroup_root(tmp_path: Path, controllers: str = "cpu io memory pids") -> Path:
+    base = tmp_path / "cgroup"
+    base.mkdir()
+    (base / "cgroup.controllers").write_text(controllers)
+    return base
+
+
+class TestCpuAllocator:
+    def test_parse_cpulist(self) -> None:
+        assert parse_cpulist("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+
+    def test_spreads_across_nodes(self) -> None:
+        allocator = CpuAllocator(cpus=range(8), nodes=NODES)
+        sets = [allocator.acquire(2) for _ in range(5)]
+        assert sets == [[0, 1], [4, 5], [2, 3], [6, 7], [0, 1]]
+
+        allocator.release([4, 5])
+        assert allocator.acquire(2) == [4, 5]
+        assert allocator.usage()[0] == 2
+
+    def test_unknown_topology(self) -> None:
+        allocator = CpuAllocator(cpus=[2, 3, 9], nodes={0: [0, 1, 2, 3]})
+        assert allocator.acquire(1) == [2]
+        assert allocator.acquire(1) == [9]  # cpus outside any node form their own
+        assert allocator.acquire(5) == [2, 3, 9]
+
+
+class TestCgroupV2:
+    def test_group_limits(self, tmp_path: Path) -> None:
+        base = fake_cgroup_root(tmp_path)
+        cgroups = CgroupV2(base=str(base))
+        assert cgroups.available()
+        assert (base / "cgroup.subtree_control").read_text() == "+cpu +memory +pids"
+
+        path = Path(cgroups.group("p/1", memory_max=2**30, cpu_max=1.5, pids_max=64))
+        assert path == base / "pygologin" / "p_1"
+        assert (path / "memory.max").read_text() == str(2**30)
+        assert (path / "cpu.max").read_text() == "150000 100000"
+        assert (path / "pids.max").read_text() == "64"
+
+    def test_moves_own_process_to_leaf(self, tmp_path: Path) -> None:
+        base = fake_cgroup_root(tmp_path)
+        (base / "cgroup.procs").write_text(f"{os.getpid()}\n")
+        cgroups = CgroupV2(base=str(base))
+        assert cgroups.available()
+        assert (base / "supervisor" / "cgroup.procs").read_text() == str(os.getpid())
+
+    def test_unavailable(self, tmp_path: Path) -> None:
+        assert not CgroupV2(base=str(tmp_path / "missing")).available()
+
+
+def child_limits(preexec) -> str:
+    code = (
+        "import os, resource; "
+        "print(resource.getrlimit(resource.RLIMIT_DATA)[0], "
+        "sorted(os.sched_getaffinity(0)))"
+    )
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        preexec_fn=preexec,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+
+class TestIsolation:
+    def test_rlimit_fallback_and_affinity(self, tmp_path: Path) -> None:
+        cpu = min(os.sched_getaffinity(0))
+        isolation = Isolation(
+            memory_max=4 * 2**30,
+            cpus_per_browser=1,
+            cgroups=CgroupV2(base=str(tmp_path / "missing")),
+            allocator=CpuAllocator(cpus=[cpu], nodes={}),
+        )
+        placement = isolation.prepare("p1")
+        assert placement.cgroup is None
+        assert placement.cpus == [cpu]
+        assert child_limits(isolation.preexec(placement)) == f"{4 * 2**30} [{cpu}]"
+
+        isolation.release(placement)
+        assert isolation.allocator.usage() == {cpu: 0}
+
+    def test_fallback_maps_cpu_and_pids(self, tmp_path: Path) -> None:
+        cpus = sorted(os.sched_getaffinity(0))
+        isolation = Isolation(
+            cpu_max=0.5,
+            pids_max=4096,
+            cgroups=CgroupV2(base=str(tmp_path / "missing")),
+            allocator=CpuAllocator(cpus=cpus, nodes={}),
+        )
+        placement = isolation.prepare("p1")
+        assert len(placement.cpus) == 1
+        assert (resource.RLIMIT_NPROC, 4096) in placement.rlimits
+        isolation.release(placement)
+        assert set(isolation.allocator.usage().values()) == {0}
+
+    def test_cgroup_placement(self, tmp_path: Path) -> None:
+        base = fake_cgroup_root(tmp_path)
+        isolation = Isolation(memory_max=2**30, cgroups=CgroupV2(base=str(base)))
+        placement = isolation.prepare("p1")
+        cgroup = Path(placement.cgroup)
+        (cgroup / "cgroup.procs").write_text("")
+        child_limits(isolation.preexec(placement))
+        assert (cgroup / "cgroup.procs").read_text() == "0"
+
+        (cgroup / "cgroup.procs").unlink()
+        (cgroup / "memory.max").unlink()
+        isolation.release(placement)
+        assert not cgroup.exists()
+
+    def test_shared_group(self, tmp_path: Path) -> None:
+        base = fake_cgroup_root(tmp_path)
+        isolation = Isolation(
+            cpu_max=2, group="batch", cgroups=CgroupV2(base=str(base))
+        )
+        first, second = isolation.prepare("p1"), isolation.prepare("p2")
+        assert first.cgroup == second.cgroup == str(base / "pygologin" / "batch")
+        isolation.release(first)
+        assert os.path.isdir(second.cgroup)
+
+
+def test_gologin_spawns_isolated_browser(tmp_path: Path) -> None:
+    launcher = write_launcher(str(tmp_path / "fake-orbita"))
+    isolation = Isolation(
+        memory_max=8 * 2**30,
+        cpus_per_browser=1,
+        cgroups=CgroupV2(base=str(tmp_path / "missing")),
+    )
+    with StandInServer() as server:
+        gl = GoLogin(
+            {
+                "token": "standin-token",
+                "profile_id": server.add_profile(),
+                "tmpdir": str(tmp_path),
+                "executablePath": launcher,
+                "port": getRandomPort(),
+                "isolation": isolation,
+                **server.options(),
+            }
+        )
+        gl.start()
+        try:
+            process = psutil.Process(gl.pid)
+            assert process.rlimit(resource.RLIMIT_DATA)[0] == 8 * 2**30
+            assert process.cpu_affinity() == gl.placement.cpus
+        finally:
+            gl.stop()
+        assert gl.placement is None
+        assert set(isolation.allocator.usage().values()) == {0}
+
+
+def test_runner_shares_cpu_allocator(tmp_path: Path) -> None:
+    from pygologin.runner import ResourceGate, Runner
+
+    with StandInServer() as server:
+        profile_ids = [server.add_profile() for _ in range(3)]
+        seen = []
+        options = {
+            "token": "standin-token",
+            "tmpdir": str(tmp_path),
+            "executablePath": sys.executable,
+            "spawn_browser": False,
+            "cpu_affinity": 1,
+            "cgroup_base": str(tmp_path / "missing"),
+            **server.options(),
+        }
+        with Runner(
+            options,
+            lambda gl, address: seen.append(gl.isolation),
+            gate=ResourceGate(max_cpu=100, max_memory=100),
+        ) as runner:
+            runner.run(profile_ids)
+        assert runner.base.isolation is not None
+        assert runner.base.isolation.cgroups.base == str(tmp_path / "missing")
+        assert all(isolation is runner.base.isolation for isolation in seen)
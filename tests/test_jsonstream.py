@@ -0,0 +1,83 @@
+import json
+import sys
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+
+from pygologin import GoLogin
+from pygologin.cookiesManager import CookiesManager, CookiesMerger
+from pygologin.jsonstream import JSONStreamError, batched, iter_items
+from pygologin.testing import StandInServer
+from tests.test_cookies_merger import NOW, cookie, make_cookies_db
+
+
+def chunks(data: bytes, size: int) -> Iterator[bytes]:
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+DOCUMENT = {
+    "allProfilesCount": 3,
+    "meta": {"nested": [1, {"deep": "]}"}], "n": 12345},
+    "profiles": [{"id": "a", "name": "ünïcødé"}, {"id": "b", "n": 1.5e10}, 7, None],
+    "after": True,
+}
+
+
+class TestIterItems:
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 4096])
+    def test_chunk_boundaries(self, size: int) -> None:
+        data = json.dumps(DOCUMENT, ensure_ascii=False, indent=1).encode()
+        items = list(iter_items(chunks(data, size), path=("profiles",)))
+        assert items == DOCUMENT["profiles"]
+
+        numbers = json.dumps([123456789, -0.5, 1e-7, []]).encode()
+        assert list(iter_items(chunks(numbers, size))) == [123456789, -0.5, 1e-7, []]
+
+    def test_empty_and_null(self) -> None:
+        assert list(iter_items([b" [ ] "])) == []
+        assert list(iter_items([b'{"profiles": null}'], path=("profiles",))) == []
+
+    def test_errors(self) -> None:
+        with pytest.raises(JSONStreamError):
+            list(iter_items([b'[{"a": 1}, {"b"']))
+        with pytest.raises(JSONStreamError):
+            list(iter_items([b'{"other": []}'], path=("profiles",)))
+        with pytest.raises(JSONStreamError):
+            list(iter_items([b"[1 2]"]))
+
+    def test_batched(self) -> None:
+        assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+class TestStreamingAPI:
+    def test_profiles_and_cookies(self, tmp_path: Path) -> None:
+        with StandInServer() as server:
+            gl = GoLogin(
+                {
+                    "token": "standin-token",
+                    "tmpdir": str(tmp_path),
+                    "executablePath": sys.executable,
+                    **server.options(),
+                }
+            )
+            ids = [server.add_profile() for _ in range(3)]
+            assert sorted(p["id"] for p in gl.iter_profiles()) == sorted(ids)
+
+            server.cookies[ids[0]] = [
+                cookie(f"c{i % 250}", value=str(i), creationDate=NOW + i)
+                for i in range(1000)
+            ]
+            gl.setProfileId(ids[0])
+            make_cookies_db(tmp_path, ids[0])
+            manager = CookiesManager(
+                profile_id=ids[0], tmpdir=str(tmp_path), merger=CookiesMerger(now=NOW)
+            )
+            report = manager.write_cookies_to_file(gl.iter_cookies(), batch_size=100)
+
+        assert (report.received, report.kept) == (1000, 1000)
+        stored: List[dict] = manager.load_cookies_from_file()
+        # the newest copy of each name wins across batches
+        assert len(stored) == 250
+        assert {c["value"] for c in stored} == {str(i) for i in range(750, 1000)}
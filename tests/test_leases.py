@@ -0,0 +1,186 @@
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from pygologin import GoLogin
+from pygologin.agent import Agent
+from pygologin.exceptions import LeaseLostError, ProfileInUseError
+from pygologin.leases import (
+    HTTPLeaseBackend,
+    Lease,
+    LeaseBackend,
+    LeaseCoordinator,
+    MemoryLeaseBackend,
+    SQLiteLeaseBackend,
+)
+from pygologin.testing import StandInServer
+from pygologin.testing.fake_orbita import write_launcher
+
+
+@pytest.fixture(params=["memory", "sqlite", "http"])
+def backend(
+    request: pytest.FixtureRequest, server: StandInServer, tmp_path: Path
+) -> LeaseBackend:
+    if request.param == "memory":
+        return MemoryLeaseBackend()
+    if request.param == "sqlite":
+        return SQLiteLeaseBackend(str(tmp_path / "leases.sqlite"))
+    return HTTPLeaseBackend(server.url + "/leases")
+
+
+class TestBackends:
+    def test_acquire_release(self, backend: LeaseBackend) -> None:
+        lease = backend.acquire("p1", "a", 60)
+        assert (lease.owner, lease.token) == ("a", 1)
+        assert backend.acquire("p1", "b", 60).owner == "a"
+        assert backend.acquire("p1", "a", 60).token == 1
+        held = backend.get("p1")
+        assert held is not None and held.owner == "a"
+
+        assert backend.release(lease)
+        assert not backend.release(lease)
+        assert backend.get("p1") is None
+        assert backend.acquire("p1", "b", 60).token == 2
+
+    def test_fencing(self, backend: LeaseBackend) -> None:
+        stale = backend.acquire("p1", "a", 0.05)
+        time.sleep(0.1)
+        # expired, but nobody took it: the holder may still renew
+        stale = backend.renew(stale, 0.05)
+        assert stale.token == 1
+        time.sleep(0.1)
+        taken = backend.acquire("p1", "b", 60)
+        assert taken.token == 2
+
+        with pytest.raises(LeaseLostError):
+            backend.renew(stale, 60)
+        assert not backend.release(stale)
+        assert backend.renew(taken, 60).owner == "b"
+
+    def test_backend_is_abstract(self) -> None:
+        with pytest.raises(TypeError):
+            LeaseBackend()  # type: ignore[abstract]
+
+    def test_sqlite_shared_between_instances(self, tmp_path: Path) -> None:
+        path = str(tmp_path / "leases.sqlite")
+        first, second = SQLiteLeaseBackend(path), SQLiteLeaseBackend(path)
+        first.acquire("p1", "a", 60)
+        assert second.acquire("p1", "b", 60).owner == "a"
+
+
+class TestLeaseCoordinator:
+    def test_acquire_waits_for_release(self) -> None:
+        backend = MemoryLeaseBackend()
+        first = LeaseCoordinator(backend, owner="a", ttl=60)
+        second = LeaseCoordinator(backend, owner="b", ttl=1)
+        first.acquire("p1")
+        with pytest.raises(ProfileInUseError, match="leased by a"):
+            second.acquire("p1")
+        with pytest.raises(ProfileInUseError, match="this process"):
+            first.acquire("p1")
+
+        threading.Timer(0.2, first.release, ("p1",)).start()
+        assert second.acquire("p1", timeout=5).token == 2
+        second.close()
+        assert backend.get("p1") is None
+
+    def test_keepalive_and_loss(self) -> None:
+        backend = MemoryLeaseBackend()
+        lost: List[Lease] = []
+        coordinator = LeaseCoordinator(
+            backend, owner="a", ttl=0.3, renew_interval=0.05, on_lost=lost.append
+        )
+        lease = coordinator.acquire("p1")
+        time.sleep(0.5)
+        assert backend.get("p1") is not None
+
+        backend.release(coordinator.held["p1"])
+        backend.acquire("p1", "b", 60)
+        time.sleep(0.2)
+        assert [item.token for item in lost] == [lease.token]
+        assert coordinator.stats()["lost"] == 1
+        with pytest.raises(LeaseLostError):
+            coordinator.renew("p1")
+        coordinator.close()
+
+    def test_keepalive_exits_when_idle(self) -> None:
+        coordinator = LeaseCoordinator(MemoryLeaseBackend(), ttl=0.3)
+        coordinator.acquire("p1")
+        thread = coordinator._thread
+        assert thread is not None and thread.is_alive()
+        coordinator.release("p1")
+        thread.join(timeout=5)
+        assert not thread.is_alive() and coordinator._thread is None
+        coordinator.acquire("p1")
+        assert coordinator._thread is not None and coordinator._thread.is_alive()
+        coordinator.close()
+
+
+class TestGoLoginLeases:
+    def options(self, server: StandInServer, tmpdir: Path) -> Dict[str, Any]:
+        # every instance is a separate host: its own tmpdir and coordinator
+        return {
+            "token": "standin-token",
+            "tmpdir": str(tmpdir),
+            "executablePath": sys.executable,
+            "spawn_browser": False,
+            "lease_url": server.url + "/leases",
+            **server.options(),
+        }
+
+    def test_one_host_at_a_time(self, server: StandInServer, tmp_path: Path) -> None:
+        profile_id = server.add_profile()
+        first = GoLogin(
+            {**self.options(server, tmp_path / "a"), "profile_id": profile_id}
+        )
+        second = GoLogin(
+            {**self.options(server, tmp_path / "b"), "profile_id": profile_id}
+        )
+        first.start()
+        with pytest.raises(ProfileInUseError):
+            second.start()
+        assert server.requests.count(("GET", "/download")) == 1
+
+        first.stop()
+        second.start()
+        second.stop()
+        assert server.requests.count(("PUT", "/upload")) == 2
+        assert server.leases.get(profile_id) is None
+
+    def test_lost_lease_does_not_upload(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        profile_id = server.add_profile()
+        gl = GoLogin({**self.options(server, tmp_path), "profile_id": profile_id})
+        gl.start()
+        # the lease expired and another host took the profile over
+        assert gl.lease is not None
+        server.leases.release(gl.lease)
+        server.leases.acquire(profile_id, "other-host", 60)
+
+        with pytest.raises(LeaseLostError):
+            gl.stop()
+        assert ("PUT", "/upload") not in server.requests
+        assert server.leases.get(profile_id).owner == "other-host"  # type: ignore[union-attr]
+
+
+def test_agent_serves_leases(server: StandInServer, tmp_path: Path) -> None:
+    options = {
+        "token": "standin-token",
+        "tmpdir": str(tmp_path / "agent"),
+        "executablePath": write_launcher(str(tmp_path / "fake-orbita")),
+        **server.options(),
+    }
+    backend = SQLiteLeaseBackend(str(tmp_path / "leases.sqlite"))
+    with Agent(options, port=0, lease_backend=backend) as agent:
+        client = HTTPLeaseBackend(
+            agent.address + "/leases", auth_token=agent.auth_token
+        )
+        lease = client.acquire("p1", "a", 60)
+        assert client.acquire("p1", "b", 60).owner == "a"
+        assert client.release(lease)
+    assert backend.get("p1") is None
@@ -0,0 +1,163 @@
+import socket
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from pygologin import GoLogin
+from pygologin.cache import TTLCache
+from pygologin.exceptions import ProxyError
+from pygologin.proxies import ProxyProber, profile_proxy, proxy_key, proxy_url
+from pygologin.runner import ResourceGate, Runner
+from pygologin.testing import StandInServer
+from pygologin.testing.server import TIMEZONE
+
+
+def dead_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def http_proxy(port: int) -> Dict[str, Any]:
+    return {"mode": "http", "host": "127.0.0.1", "port": port}
+
+
+def test_proxy_url() -> None:
+    assert proxy_url(http_proxy(8080)) == "http://127.0.0.1:8080"
+    proxy = {"mode": "socks5", "host": "h", "port": 1, "username": "u"}
+    assert proxy_url({**proxy, "password": "p"}) == "socks5h://u:p@h:1"
+
+
+def test_profile_proxy() -> None:
+    assert profile_proxy({"proxy": {"mode": "none"}}) is None
+    assert profile_proxy({}) is None
+    assert profile_proxy({"proxy": {"mode": "geolocation", "host": "h"}}) == {
+        "mode": "http",
+        "host": "h",
+    }
+    auto = profile_proxy(
+        {
+            "proxy": {"mode": "gologin"},
+            "autoProxyServer": "http://auto.example:9000",
+            "autoProxyUsername": "u",
+            "autoProxyPassword": "p",
+        }
+    )
+    assert auto is not None
+    assert (auto["host"], auto["port"], auto["username"]) == (
+        "auto.example",
+        "9000",
+        "u",
+    )
+
+
+class TestProxyProber:
+    def test_alive_and_dead(self, server: StandInServer) -> None:
+        timezones: TTLCache = TTLCache(60)
+        # the stand-in server answers the absolute-URI request a proxy gets
+        prober = ProxyProber(
+            "http://geo.invalid/timezone", timeout=2, timezone_cache=timezones
+        )
+        alive, dead, none = prober.probe_many(
+            [http_proxy(server.port), http_proxy(dead_port()), None]
+        )
+
+        assert alive is not None and alive.alive
+        assert alive.connect is not None and alive.first_byte is not None
+        assert alive.timezone == TIMEZONE
+        assert timezones.get(proxy_key(http_proxy(server.port))) == TIMEZONE
+        assert dead is not None and not dead.alive
+        assert dead.connect is None and "ConnectionRefused" in (dead.error or "")
+        assert none is None
+
+    def test_results_are_cached(self, server: StandInServer) -> None:
+        prober = ProxyProber("http://geo.invalid/timezone", timeout=2)
+        proxy = http_proxy(server.port)
+        results = prober.probe_many([proxy, dict(proxy)])
+        prober.probe(proxy)
+
+        assert results[0] is results[1]
+        assert server.requests.count(("GET", "/timezone")) == 1
+        prober.probe(proxy, refresh=True)
+        assert server.requests.count(("GET", "/timezone")) == 2
+
+    def test_http_error_is_dead(self, server: StandInServer) -> None:
+        server.error_rate = 1.0
+        result = ProxyProber("http://geo.invalid/timezone", timeout=2).probe(
+            http_proxy(server.port)
+        )
+
+        assert not result.alive
+        assert result.status == 503
+
+    def test_rank(self, server: StandInServer) -> None:
+        prober = ProxyProber("http://geo.invalid/timezone", timeout=2, slow=60)
+        fast, dead = prober.probe_many(
+            [http_proxy(server.port), http_proxy(dead_port())]
+        )
+        usable, skipped = prober.rank({"a": dead, "b": fast, "c": None})
+
+        assert usable == ["c", "b"]
+        assert skipped == ["a"]
+        prober.slow = 0
+        assert prober.rank({"b": fast}) == ([], ["b"])
+
+
+class TestGoLoginProxies:
+    def options(self, server: StandInServer, tmp_path: Path) -> Dict[str, Any]:
+        return {
+            "token": "standin-token",
+            "tmpdir": str(tmp_path),
+            "executablePath": sys.executable,
+            "spawn_browser": False,
+            **server.options(),
+        }
+
+    def test_probe_proxies(self, server: StandInServer, tmp_path: Path) -> None:
+        good = server.add_profile(proxy=http_proxy(server.port))
+        bad = server.add_profile(proxy=http_proxy(dead_port()))
+        plain = server.add_profile()
+        gl = GoLogin(self.options(server, tmp_path))
+        results = gl.probeProxies([good, bad, plain])
+
+        assert results[good] is not None and results[good].alive
+        assert results[bad] is not None and not results[bad].alive
+        assert results[plain] is None
+
+    def test_start_fails_before_download(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        profile_id = server.add_profile(proxy=http_proxy(dead_port()))
+        gl = GoLogin(
+            {
+                **self.options(server, tmp_path),
+                "profile_id": profile_id,
+                "proxy_probe_ttl": 60,
+            }
+        )
+
+        with pytest.raises(ProxyError):
+            gl.start()
+        assert ("GET", "/download") not in server.requests
+
+    def test_runner_skips_dead_proxies(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        good = server.add_profile(proxy=http_proxy(server.port))
+        bad = server.add_profile(proxy=http_proxy(dead_port()))
+        runner = Runner(
+            self.options(server, tmp_path),
+            lambda gl, address: gl.tz,
+            retries=0,
+            gate=ResourceGate(max_cpu=100, max_memory=100),
+            prober=ProxyProber(server.url + "/timezone", timeout=2),
+        )
+        report = runner.run([good, bad])
+
+        assert [result.profile_id for result in report.succeeded] == [good]
+        assert isinstance(report.failed[0].error, ProxyError)
+        # the start reused the timezone the probe fetched
+        assert report.succeeded[0].result == TIMEZONE
+        assert server.requests.count(("GET", "/timezone")) == 1
@@ -0,0 +1,115 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from requests import Response
+
+from pygologin import GoLogin
+from pygologin.ratelimit import RateLimiter, parse_rate_limit
+from pygologin.testing import StandInServer
+from pygologin.transport import Transport
+
+
+def response(status: int, **headers: str) -> Response:
+    result = Response()
+    result.status_code = status
+    result.headers.update(headers)
+    return result
+
+
+def test_parse_rate_limit() -> None:
+    assert (
+        parse_rate_limit({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "2"}) == 2
+    )
+    assert (
+        parse_rate_limit({"RateLimit-Remaining": "5", "RateLimit-Reset": "2"}) is None
+    )
+    epoch = str(time.time() + 3)
+    reset = parse_rate_limit({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": epoch})
+    assert reset is not None and 2 < reset <= 3
+    assert parse_rate_limit({}) is None
+
+
+class TestRateLimiter:
+    def test_rate_and_burst(self) -> None:
+        limiter = RateLimiter({"api": (20, 5)})
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.acquire("api", "getProfile")
+        assert time.monotonic() - started < 0.05
+        for _ in range(4):
+            limiter.acquire("api")
+        # four more at 20/s once the burst is spent
+        assert time.monotonic() - started >= 0.19
+        assert limiter.acquire("unlimited") == 0.0
+
+    def test_per_call_limit(self) -> None:
+        limiter = RateLimiter({"api": 1000, "create": (5, 1)})
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.acquire("api", "create")
+        assert time.monotonic() - started >= 0.39
+        assert limiter.stats()["waits"] == 2
+
+    def test_retry_after_blocks(self) -> None:
+        limiter = RateLimiter({"api": (100, 10)})
+        limiter.observe(response(429, **{"Retry-After": "0.3"}), "api", "getProfile")
+        started = time.monotonic()
+        limiter.acquire("api")
+        limiter.acquire("api")
+        assert time.monotonic() - started >= 0.3
+        assert limiter.stats()["throttled"] == 1
+
+    def test_rate_limit_headers_block(self) -> None:
+        limiter = RateLimiter({"api": 100})
+        limiter.observe(
+            response(200, **{"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "0.2"}),
+            "api",
+        )
+        assert limiter.acquire("api") >= 0.15
+
+    def test_shared_between_processes(self, tmp_path: Path) -> None:
+        path = str(tmp_path / "ratelimit.json")
+        code = (
+            "import sys\n"
+            "from pygologin.ratelimit import RateLimiter\n"
+            "limiter = RateLimiter({'api': (20, 1)}, path=sys.argv[1])\n"
+            "for _ in range(5):\n"
+            "    limiter.acquire('api')\n"
+        )
+        started = time.monotonic()
+        other = subprocess.Popen([sys.executable, "-c", code, path])
+        limiter = RateLimiter({"api": (20, 1)}, path=path)
+        for _ in range(5):
+            limiter.acquire("api")
+        assert other.wait(timeout=30) == 0
+        # ten requests from two processes at one shared 20/s
+        assert time.monotonic() - started >= 0.45
+
+
+class TestTransportRateLimit:
+    def test_throttled_response_holds_later_requests(self) -> None:
+        limiter = RateLimiter({"timezone": 100})
+        with StandInServer(error_rate=1.0, error_status=429, retry_after=0.3) as server:
+            transport = Transport(retries=0, rate_limiter=limiter)
+            first = transport.get(server.url + "/timezone", endpoint="timezone")
+            assert first.status_code == 429
+            server.error_rate = 0
+            started = time.monotonic()
+            assert transport.get(server.url + "/timezone", endpoint="timezone").ok
+            assert time.monotonic() - started >= 0.25
+
+    def test_gologin_option(self, tmp_path: Path) -> None:
+        gl = GoLogin(
+            {
+                "token": "standin-token",
+                "tmpdir": str(tmp_path),
+                "executablePath": sys.executable,
+                "rate_limits": {"api": (10, 5)},
+            }
+        )
+        assert gl.transport.rate_limiter is gl.rate_limiter
+        assert gl.rate_limiter is not None
+        gl.rate_limiter.acquire("api")
+        assert (tmp_path / "pygologin-ratelimit.json").exists()
@@ -0,0 +1,138 @@
+import sys
+import threading
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from pygologin import GoLogin
+from pygologin.__main__ import main
+from pygologin.runner import PortAllocator, ResourceGate, Runner, script_task
+from pygologin.testing import StandInServer
+
+
+class TestRunner:
+    def options(self, server: StandInServer, tmp_path: Path):
+        return {
+            "token": "standin-token",
+            "tmpdir": str(tmp_path),
+            "executablePath": sys.executable,
+            "spawn_browser": False,
+            **server.options(),
+        }
+
+    def test_run(self, server: StandInServer, tmp_path: Path) -> None:
+        profile_ids = [server.add_profile() for _ in range(3)]
+        seen: List[str] = []
+
+        def task(gl: GoLogin, address: str) -> str:
+            seen.append(gl.profile_id)
+            return address
+
+        runner = Runner(
+            self.options(server, tmp_path),
+            task,
+            concurrency=2,
+            gate=ResourceGate(max_cpu=100, max_memory=100),
+        )
+        report = runner.run(profile_ids)
+
+        assert sorted(seen) == sorted(profile_ids)
+        assert report.summary()["succeeded"] == 3
+        assert server.requests.count(("PUT", "/upload")) == 3
+
+    def test_sessions_share_helpers(
+        self, server: StandInServer, tmp_path: Path
+    ) -> None:
+        profile_ids = [server.add_profile() for _ in range(4)]
+        options = {
+            **self.options(server, tmp_path),
+            "background_commit": True,
+            "max_rss": 1 << 30,
+        }
+        sessions: List[GoLogin] = []
+
+        def task(gl: GoLogin, address: str) -> None:
+            sessions.append(gl)
+
+        with Runner(
+            options, task, gate=ResourceGate(max_cpu=100, max_memory=100)
+        ) as runner:
+            report = runner.run(profile_ids)
+            assert {id(gl.committer) for gl in sessions} == {id(runner.base.committer)}
+            assert {id(gl.supervisor) for gl in sessions} == {
+                id(runner.base.supervisor)
+            }
+            assert all(gl.owned_helpers == [] for gl in sessions)
+        assert report.summary()["succeeded"] == 4
+        # close() waited for the background commits
+        assert server.requests.count(("PUT", "/upload")) == 4
+        names = [thread.name for thread in threading.enumerate()]
+        assert not [n for n in names if n.startswith("pygologin-commit")]
+        assert "pygologin-supervisor" not in names
+
+    def test_retry_failed_start(self, server: StandInServer, tmp_path: Path) -> None:
+        runner = Runner(
+            self.options(server, tmp_path),
+            lambda gl, address: None,
+            retries=1,
+            retry_delay=0,
+            gate=ResourceGate(max_cpu=100, max_memory=100),
+        )
+        report = runner.run(["missing"])
+
+        assert report.failed[0].attempts == 2
+        assert report.failed[0].error is not None
+
+    def test_failed_start_releases_locks(
+        self,
+        server: StandInServer,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        profile_id = server.add_profile()
+        start = GoLogin.start
+
+        def start_and_leak(gl: GoLogin) -> str:
+            # a start that fails after taking the workspace lock and
+            # leaves it behind
+            gl.spawn_browser = False
+            start(gl)
+            raise RuntimeError("spawn failed")
+
+        monkeypatch.setattr(GoLogin, "start", start_and_leak)
+        runner = Runner(
+            self.options(server, tmp_path),
+            lambda gl, address: None,
+            gate=ResourceGate(max_cpu=100, max_memory=100),
+        )
+        report = runner.run([profile_id])
+
+        assert isinstance(report.failed[0].error, RuntimeError)
+        assert runner.base.workspace.usage()["locked"] == 0
+
+    def test_script_task(self, server: StandInServer, tmp_path: Path) -> None:
+        script = tmp_path / "task.py"
+        script.write_text("result = (profile_id, gologin.profile_path)\n")
+        profile_id = server.add_profile()
+        runner = Runner(
+            self.options(server, tmp_path),
+            script_task(str(script)),
+            gate=ResourceGate(max_cpu=100, max_memory=100),
+        )
+        report = runner.run([profile_id])
+
+        assert report.succeeded[0].result[0] == profile_id
+
+
+def test_port_allocator() -> None:
+    ports = PortAllocator(20000, 20010)
+    first = ports.acquire()
+    second = ports.acquire()
+    assert first != second
+    ports.release(first)
+
+
+def test_cli_requires_task(capsys: pytest.CaptureFixture) -> None:
+    assert main(["run", "--token", "t", "profile"]) == 2
+    assert "--entry" in capsys.readouterr().err
@@ -0,0 +1,199 @@
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from pygologin import GoLogin, getRandomPort
+from pygologin.exceptions import ProfileInUseError
+from pygologin.staging import FileLock, ProfileLocks, replace_tree, staging_dir
+from pygologin.testing import StandInServer
+from pygologin.testing.fake_orbita import write_launcher
+
+
+class TestProfileLocks:
+    def test_file_lock(self, tmp_path: Path) -> None:
+        first, second = FileLock(str(tmp_path / "a")), FileLock(str(tmp_path / "a"))
+        assert first.acquire(blocking=False)
+        assert not second.acquire(blocking=False)
+        assert not second.acquire(timeout=0.1)
+        first.release()
+        assert second.acquire(blocking=False)
+        second.release()
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="open files stay put")
+    def test_remove_while_waiting(self, tmp_path: Path) -> None:
+        path = str(tmp_path / "a")
+        holder, waiter = FileLock(path), FileLock(path)
+        assert holder.acquire()
+        thread = threading.Thread(target=waiter.acquire)
+        thread.start()
+        time.sleep(0.2)
+        assert holder.remove()
+        holder.release()
+        thread.join(5)
+        # the waiter locked the file now at path, not the removed one
+        assert waiter.locked
+        assert not FileLock(path).acquire(blocking=False)
+        assert not FileLock(path).remove()
+        waiter.release()
+        assert FileLock(path).remove()
+        assert not Path(path).exists()
+
+    def test_launch_conflict(self, tmp_path: Path) -> None:
+        locks = ProfileLocks(str(tmp_path))
+        lock = locks.launch("p1")
+        with pytest.raises(ProfileInUseError, match="p1 is already running by pid"):
+            locks.launch("p1")
+        with pytest.raises(ProfileInUseError):
+            ProfileLocks(str(tmp_path)).check_launch("p1")
+        locks.check_launch("p2")
+        lock.release()
+        locks.launch("p1").release()
+
+    def test_single_flight(self, tmp_path: Path) -> None:
+        locks = ProfileLocks(str(tmp_path))
+        entered = threading.Event()
+        fresh: List[bool] = []
+
+        def waiter() -> None:
+            entered.wait()
+            with locks.flight("p1") as flight:
+                fresh.append(flight.fresh)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        with locks.flight("p1") as flight:
+            assert not flight.fresh
+            entered.set()
+            time.sleep(0.2)
+            flight.done()
+        thread.join()
+        assert fresh == [True]
+
+        with locks.flight("p1") as flight:
+            assert not flight.fresh  # nobody was preparing it meanwhile
+
+    def test_flight_timeout(self, tmp_path: Path) -> None:
+        locks = ProfileLocks(str(tmp_path), timeout=0.1)
+        with locks.flight("p1"):
+            with pytest.raises(ProfileInUseError, match="over 0.1s"):
+                with ProfileLocks(str(tmp_path), timeout=0.1).flight("p1"):
+                    pass
+
+    def test_replace_tree_and_stale_dirs(self, tmp_path: Path) -> None:
+        target = tmp_path / "gologin_p1"
+        target.mkdir()
+        (target / "old").write_text("old")
+        staging = Path(staging_dir(str(tmp_path), "p1"))
+        (staging / "new").write_text("new")
+        abandoned = Path(staging_dir(str(tmp_path), "p1"))
+
+        replace_tree(str(staging), str(target))
+        assert sorted(p.name for p in target.iterdir()) == ["new"]
+
+        with ProfileLocks(str(tmp_path)).flight("p1"):
+            assert not abandoned.exists()
+        assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == [
+            "gologin_p1"
+        ]
+
+
+def gologin(
+    server: StandInServer, tmp_path: Path, profile_id: str, **options
+) -> GoLogin:
+    return GoLogin(
+        {
+            "token": "standin-token",
+            "profile_id": profile_id,
+            "tmpdir": str(tmp_path),
+            "executablePath": sys.executable,
+            "spawn_browser": False,
+            **server.options(),
+            **options,
+        }
+    )
+
+
+class TestGoLoginStaging:
+    def test_failed_extract_keeps_profile(self, tmp_path: Path) -> None:
+        with StandInServer() as server:
+            gl = gologin(server, tmp_path, server.add_profile())
+        Path(gl.profile_default_folder_path).mkdir(parents=True)
+        Path(gl.profile_default_folder_path, "Preferences").write_text("{}")
+        Path(gl.profile_zip_path).write_bytes(b"not a zip")
+
+        with pytest.raises(zipfile.BadZipFile):
+            gl.extractProfileZip()
+        assert Path(gl.profile_default_folder_path, "Preferences").read_text() == "{}"
+        assert [p.name for p in tmp_path.iterdir() if p.is_dir()] == [
+            Path(gl.profile_path).name
+        ]
+
+    def test_concurrent_starts_download_once(self, tmp_path: Path) -> None:
+        with StandInServer(latency=0.2) as server:
+            profile_id = server.add_profile()
+            instances = [gologin(server, tmp_path, profile_id) for _ in range(3)]
+            barrier = threading.Barrier(len(instances))
+            paths: List[str] = []
+
+            def start(gl: GoLogin) -> None:
+                barrier.wait()
+                paths.append(gl.start())
+
+            threads = [threading.Thread(target=start, args=(gl,)) for gl in instances]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert len(paths) == 3
+            assert Path(paths[0], "Default", "Preferences").exists()
+            assert server.requests.count(("GET", "/download")) == 1
+
+    def test_conflicting_launch_fails_fast(self, tmp_path: Path) -> None:
+        launcher = write_launcher(str(tmp_path / "fake-orbita"))
+        with StandInServer() as server:
+            profile_id = server.add_profile()
+            running = gologin(
+                server,
+                tmp_path,
+                profile_id,
+                executablePath=launcher,
+                spawn_browser=True,
+                port=getRandomPort(),
+            )
+            running.start()
+            try:
+                for spawn_browser in (True, False):
+                    other = gologin(
+                        server, tmp_path, profile_id, spawn_browser=spawn_browser
+                    )
+                    with pytest.raises(ProfileInUseError, match=profile_id):
+                        other.start()
+                assert server.requests.count(("GET", "/download")) == 1
+            finally:
+                running.stop()
+
+            other = gologin(server, tmp_path, profile_id)
+            other.start()
+            other.stop()
+
+    def test_start_without_profile_id(self, tmp_path: Path) -> None:
+        with StandInServer() as server:
+            gl = GoLogin(
+                {
+                    "token": "standin-token",
+                    "tmpdir": str(tmp_path),
+                    "executablePath": sys.executable,
+                    "spawn_browser": False,
+                    **server.options(),
+                }
+            )
+            with pytest.raises(ValueError, match="profile_id"):
+                gl.createStartup()
+            assert server.requests == []
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,185 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import psutil
+import pytest
+import requests
+
+from pygologin import GoLogin, getRandomPort
+from pygologin.supervisor import EXITED, KILLED, RUNNING, Supervisor
+from pygologin.testing import StandInServer
+from pygologin.testing.fake_orbita import write_launcher
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="POSIX process trees")
+
+SLEEPER = "import time; time.sleep(60)"
+# parent with one child, like a browser and its renderer
+TREE = (
+    "import subprocess, sys, time; "
+    f"child = subprocess.Popen([sys.executable, '-c', {SLEEPER!r}]); "
+    "time.sleep(60)"
+)
+HOG = "import time; data = bytearray(96 * 1024 * 1024); time.sleep(60)"
+SPINNER = "while True: pass"
+
+
+class Processes:
+    def __init__(self) -> None:
+        self.started: List[subprocess.Popen] = []
+
+    def spawn(self, code: str) -> int:
+        process = subprocess.Popen([sys.executable, "-c", code])
+        self.started.append(process)
+        return process.pid
+
+    def cleanup(self) -> None:
+        for process in self.started:
+            try:
+                children = psutil.Process(process.pid).children(recursive=True)
+            except psutil.Error:
+                children = []
+            for child in children:
+                child.kill()
+            process.kill()
+            process.wait()
+
+
+@pytest.fixture()
+def processes():
+    processes = Processes()
+    yield processes
+    processes.cleanup()
+
+
+class TestSupervisor:
+    def test_samples_process_tree(self, processes: Processes) -> None:
+        supervisor = Supervisor()
+        supervisor.register("p1", processes.spawn(TREE))
+        deadline = time.time() + 10
+        while True:
+            supervisor.poll()
+            metrics = supervisor.metrics()["p1"]
+            if metrics["processes"] == 2 or time.time() > deadline:
+                break
+            time.sleep(0.05)
+        assert metrics["status"] == RUNNING
+        assert metrics["processes"] == 2
+        assert metrics["rss"] > 0
+        assert metrics["fds"] > 0
+        assert len(supervisor.samples("p1")) >= 1
+        assert supervisor.totals()["running"] == 1
+
+    def test_restart_after_crash(self, processes: Processes) -> None:
+        events: List[Tuple[str, int]] = []
+        supervisor = Supervisor(on_event=lambda e, b: events.append((e, b.pid)))
+        first = processes.spawn(SLEEPER)
+        browser = supervisor.register(
+            "p1", first, restart=lambda: processes.spawn(SLEEPER), max_restarts=1
+        )
+        os.kill(first, signal.SIGKILL)
+        processes.started[0].wait()
+
+        supervisor.poll()
+        assert browser.status == RUNNING
+        assert browser.restarts == 1
+        assert browser.pid != first
+        assert [event for event, _ in events] == ["exited", "restarted"]
+
+        os.kill(browser.pid, signal.SIGKILL)
+        processes.started[1].wait()
+        supervisor.poll()
+        assert browser.status == EXITED  # out of restarts
+
+    def test_restart_does_not_block_registry(self, processes: Processes) -> None:
+        supervisor = Supervisor()
+        restarting = threading.Event()
+        finish = threading.Event()
+
+        def restart() -> int:
+            restarting.set()
+            finish.wait(10)
+            return processes.spawn(SLEEPER)
+
+        first = processes.spawn(SLEEPER)
+        supervisor.register("p1", first, restart=restart)
+        os.kill(first, signal.SIGKILL)
+        processes.started[0].wait()
+        poll = threading.Thread(target=supervisor.poll)
+        poll.start()
+        assert restarting.wait(10)
+        # another profile registers while p1 restarts; p1 is stopped meanwhile
+        supervisor.register("p2", processes.spawn(SLEEPER))
+        supervisor.unregister("p1")
+        finish.set()
+        poll.join(10)
+        assert "p1" not in supervisor.metrics()
+        # the browser restarted after its stop is not left running
+        restarted = processes.started[-1]
+        assert restarted.wait(10) is not None
+
+    def test_memory_cap(self, processes: Processes) -> None:
+        supervisor = Supervisor()
+        pid = processes.spawn(HOG)
+        browser = supervisor.register("p1", pid, max_rss=64 * 1024 * 1024)
+        deadline = time.time() + 10
+        while browser.status == RUNNING and time.time() < deadline:
+            supervisor.poll()
+            time.sleep(0.05)
+        assert (browser.status, browser.reason) == (KILLED, "memory")
+        assert not psutil.pid_exists(pid)
+
+    def test_cpu_cap(self, processes: Processes) -> None:
+        supervisor = Supervisor()
+        browser = supervisor.register(
+            "p1", processes.spawn(SPINNER), max_cpu=20, cpu_grace=2
+        )
+        deadline = time.time() + 10
+        while browser.status == RUNNING and time.time() < deadline:
+            supervisor.poll()
+            time.sleep(0.2)
+        assert (browser.status, browser.reason) == (KILLED, "cpu")
+
+
+def test_gologin_restarts_crashed_browser(tmp_path: Path) -> None:
+    launcher = write_launcher(str(tmp_path / "fake-orbita"))
+    with StandInServer() as server:
+        gl = GoLogin(
+            {
+                "token": "standin-token",
+                "profile_id": server.add_profile(),
+                "tmpdir": str(tmp_path),
+                "executablePath": launcher,
+                "port": getRandomPort(),
+                "restart_on_crash": True,
+                "supervise_interval": 0.1,
+                **server.options(),
+            }
+        )
+        url = gl.start()
+        first = gl.pid
+        os.kill(first, signal.SIGKILL)
+
+        deadline = time.time() + 10
+        while gl.supervisor.metrics()[gl.profile_id]["restarts"] == 0:
+            assert time.time() < deadline
+            time.sleep(0.05)
+        while True:
+            try:
+                if requests.get(f"http://{url}/json/version", timeout=1).ok:
+                    break
+            except requests.ConnectionError:
+                assert time.time() < deadline
+                time.sleep(0.05)
+        assert gl.pid != first
+
+        gl.stop()
+        assert gl.profile_id not in gl.supervisor.metrics()
+        # nothing left to supervise: the thread is gone until the next start
+        names = [thread.name for thread in threading.enumerate()]
+        assert "pygologin-supervisor" not in names
@@ -0,0 +1,131 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+import pytest
+import requests
+
+from pygologin.testing import StandInServer
+from pygologin.transport import Transport, parse_retry_after
+
+
+class SlowFirstHandler(BaseHTTPRequestHandler):
+    calls: List[float] = []
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.calls.append(time.monotonic())
+        if len(self.calls) == 1:
+            time.sleep(1)
+        body = str(len(self.calls)).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture()
+def slow_first() -> Iterator[str]:
+    SlowFirstHandler.calls = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SlowFirstHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestTransport:
+    def test_retry_after(self) -> None:
+        with StandInServer(error_rate=1.0, retry_after=0) as server:
+            transport = Transport(retries=2)
+            response = transport.get(server.url + "/timezone")
+
+        assert response.status_code == 503
+        assert response.retries == 2
+        assert len(server.requests) == 3
+
+    def test_post_not_retried_on_500(self) -> None:
+        with StandInServer(error_rate=1.0, error_status=500) as server:
+            response = Transport(retries=2).post(server.url + "/browser", json={})
+
+        assert response.status_code == 500
+        assert len(server.requests) == 1
+
+    def test_post_retried_on_503_only_with_retry_after(self) -> None:
+        with StandInServer(error_rate=1.0) as server:
+            response = Transport(retries=2).post(server.url + "/browser", json={})
+        assert response.status_code == 503
+        assert len(server.requests) == 1
+
+        with StandInServer(error_rate=1.0, retry_after=0) as server:
+            response = Transport(retries=2).post(server.url + "/browser", json={})
+        assert response.retries == 2
+        assert len(server.requests) == 3
+
+    def test_session_per_thread(self) -> None:
+        transport = Transport()
+        sessions = [transport.session]
+        thread = threading.Thread(target=lambda: sessions.append(transport.session))
+        thread.start()
+        thread.join()
+        assert transport.session is sessions[0]
+        assert sessions[1] is not sessions[0]
+
+        shared = requests.Session()
+        transport = Transport(session=shared)
+        thread = threading.Thread(target=lambda: sessions.append(transport.session))
+        thread.start()
+        thread.join()
+        assert sessions[2] is shared
+        transport.close()
+
+    def test_read_timeout(self) -> None:
+        with StandInServer(latency=1) as server:
+            transport = Transport(timeouts={"timezone": (1, 0.1)}, retries=0)
+            with pytest.raises(requests.Timeout):
+                transport.get(server.url + "/timezone", endpoint="timezone")
+
+    def test_hedged_request(self, slow_first: str) -> None:
+        transport = Transport(hedge=["getProfile"], hedge_delay=0.1)
+        assert transport.hedged("getProfile")
+        assert not transport.hedged("getTimeZone")
+
+        started = time.monotonic()
+        response = transport.get(slow_first, name="getProfile", hedge=True)
+
+        assert time.monotonic() - started < 0.9
+        assert response.text == "2"
+        transport.close()
+
+    def test_hedge_loser_is_closed(
+        self, slow_first: str, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        closed: List[requests.Response] = []
+        close = requests.Response.close
+
+        def record(response: requests.Response) -> None:
+            closed.append(response)
+            close(response)
+
+        monkeypatch.setattr(requests.Response, "close", record)
+        transport = Transport(hedge_delay=0.1)
+        response = transport.get(slow_first, hedge=True)
+        assert response.text == "2"
+        deadline = time.monotonic() + 5
+        while not closed:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        # the slow primary answered after the hedge won and was closed
+        assert response not in closed
+        transport.close()
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
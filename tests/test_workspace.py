@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from pygologin import GoLogin
+from pygologin.exceptions import LeaseLostError
+from pygologin.staging import FileLock, ProfileLocks
+from pygologin.testing import StandInServer
+from pygologin.workspace import Workspace
+
+
+def make_profile(tmpdir: Path, profile_id: str, size: int, age: float = 0) -> None:
+    path = tmpdir / f"gologin_{profile_id}" / "Default"
+    path.mkdir(parents=True)
+    (path / "data").write_bytes(b"x" * size)
+    when = time.time() - age
+    os.utime(path.parent, (when, when))
+
+
+class TestWorkspace:
+    def test_lru_eviction_skips_locked(self, tmp_path: Path) -> None:
+        make_profile(tmp_path, "old", 400, age=300)
+        make_profile(tmp_path, "locked", 400, age=200)
+        make_profile(tmp_path, "new", 400, age=100)
+        workspace = Workspace(str(tmp_path), max_bytes=900)
+        lock = workspace.acquire("locked")
+
+        assert workspace.evict() == ["old"]
+        assert workspace.evict(reserve=400) == ["new"]
+        assert os.path.isdir(tmp_path / "gologin_locked")
+
+        workspace.release(lock, "locked")
+        assert not workspace.is_locked("locked")
+        usage = workspace.usage()
+        assert usage["profiles"] == 1
+        assert usage["bytes"] == 400
+        assert (usage["evicted"], usage["evicted_bytes"]) == (2, 800)
+
+    def test_eviction_removes_profile_locks(self, tmp_path: Path) -> None:
+        make_profile(tmp_path, "old", 400, age=300)
+        make_profile(tmp_path, "busy", 400, age=200)
+        make_profile(tmp_path, "new", 400, age=100)
+        locks = ProfileLocks(str(tmp_path))
+        locks.launch("old").release()
+        with locks.flight("old"):
+            pass
+        workspace = Workspace(str(tmp_path), max_bytes=500)
+        with locks.flight("busy"):
+            # busy is being prepared, so new goes instead
+            assert workspace.evict() == ["old", "new"]
+        assert not (tmp_path / "gologin_old.browser.flock").exists()
+        assert not (tmp_path / "gologin_old.download.flock").exists()
+        assert os.path.isdir(tmp_path / "gologin_busy")
+
+    def test_stale_lock(self, tmp_path: Path) -> None:
+        make_profile(tmp_path, "p1", 10)
+        # pid 2**22 + 1 is above the default pid_max
+        stale = tmp_path / f"gologin_p1.{2**22 + 1}.deadbeef.lock"
+        stale.write_text("")
+        workspace = Workspace(str(tmp_path))
+        assert not workspace.is_locked("p1")
+        assert not stale.exists()
+
+    def test_sweep_orphans(self, tmp_path: Path) -> None:
+        old = time.time() - 7200
+        for name in ("gologin_a.zip", "gologin_b_upload.zip", "gologin_c.zip.part"):
+            (tmp_path / name).write_bytes(b"z" * 10)
+            os.utime(tmp_path / name, (old, old))
+        (tmp_path / "gologin_fresh.zip").write_bytes(b"z")
+        (tmp_path / "gologin_busy.zip").write_bytes(b"z")
+        os.utime(tmp_path / "gologin_busy.zip", (old, old))
+        (tmp_path / "other.zip").write_bytes(b"z")
+        os.utime(tmp_path / "other.zip", (old, old))
+
+        workspace = Workspace(str(tmp_path), orphan_age=3600)
+        workspace.acquire("busy")
+        swept = sorted(os.path.basename(path) for path in workspace.sweep())
+        assert swept == ["gologin_a.zip", "gologin_b_upload.zip", "gologin_c.zip.part"]
+        assert workspace.usage()["swept_bytes"] == 30
+        remaining = {
+            name for name in os.listdir(tmp_path) if not name.endswith(".lock")
+        }
+        assert remaining == {"gologin_busy.zip", "gologin_fresh.zip", "other.zip"}
+
+    def test_sweep_profile_locks(self, tmp_path: Path) -> None:
+        make_profile(tmp_path, "kept", 10)
+        names = [
+            "gologin_gone.download.flock",
+            "gologin_held.browser.flock",
+            "gologin_kept.download.flock",
+        ]
+        for name in names:
+            (tmp_path / name).write_text("")
+        held = FileLock(str(tmp_path / "gologin_held.browser.flock"))
+        assert held.acquire(blocking=False)
+        workspace = Workspace(str(tmp_path), orphan_age=0)
+        swept = [os.path.basename(path) for path in workspace.sweep()]
+        assert swept == ["gologin_gone.download.flock"]
+        held.release()
+        assert (tmp_path / "gologin_kept.download.flock").exists()
+
+    def test_sweeper_thread(self, tmp_path: Path) -> None:
+        orphan = tmp_path / "gologin_x.zip"
+        orphan.write_bytes(b"z")
+        workspace = Workspace(str(tmp_path), orphan_age=0)
+        workspace.start_sweeper(0.05)
+        try:
+            deadline = time.time() + 5
+            while orphan.exists() and time.time() < deadline:
+                time.sleep(0.02)
+        finally:
+            workspace.stop_sweeper()
+        assert not orphan.exists()
+
+
+class TestGoLoginWorkspaceLock:
+    def test_failed_start_and_stop_release_lock(self, tmp_path: Path) -> None:
+        with StandInServer() as server:
+            options = {
+                "token": "standin-token",
+                "tmpdir": str(tmp_path),
+                "executablePath": sys.executable,
+                "spawn_browser": False,
+                "lease_url": server.url + "/leases",
+                **server.options(),
+            }
+            missing = GoLogin({**options, "profile_id": "0" * 24})
+            with pytest.raises(Exception):
+                missing.start()
+            assert not missing.workspace.is_locked("0" * 24)
+
+            profile_id = server.add_profile()
+            gl = GoLogin({**options, "profile_id": profile_id})
+            gl.start()
+            assert gl.workspace.is_locked(profile_id)
+            assert gl.lease is not None
+            server.leases.release(gl.lease)
+            server.leases.acquire(profile_id, "other-host", 60)
+            with pytest.raises(LeaseLostError):
+                gl.stop()
+            assert not gl.workspace.is_locked(profile_id)
@@ -0,0 +1,90 @@
+import os
+import signal
+import subprocess
+import time
+from pathlib import Path
+from typing import List
+
+import psutil
+import pytest
+import requests
+
+from pygologin import GoLogin, getRandomPort
+from pygologin.instrumentation import Span
+from pygologin.testing import StandInServer
+from pygologin.testing.fake_orbita import write_launcher
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="launcher needs a shebang")
+
+
+@pytest.fixture()
+def launcher(tmp_path: Path) -> str:
+    return write_launcher(str(tmp_path / "fake-orbita"))
+
+
+def wait_ready(url: str, timeout: float = 10) -> requests.Response:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return requests.get(url, timeout=1)
+        except requests.ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+class TestFakeOrbita:
+    def test_devtools_and_signals(self, launcher: str, tmp_path: Path) -> None:
+        port = getRandomPort()
+        user_data_dir = tmp_path / "profile"
+        process = subprocess.Popen(
+            [
+                launcher,
+                f"--remote-debugging-port={port}",
+                f"--user-data-dir={user_data_dir}",
+                "--password-store=basic",
+                "--fake-churn-files=2",
+                "--fake-churn-interval=0.05",
+            ]
+        )
+        try:
+            version = wait_ready(f"http://127.0.0.1:{port}/json/version").json()
+            assert version["webSocketDebuggerUrl"].startswith(f"ws://127.0.0.1:{port}")
+            assert requests.get(f"http://127.0.0.1:{port}/json").json()[0]["type"] == (
+                "page"
+            )
+
+            active_port = (user_data_dir / "DevToolsActivePort").read_text()
+            assert active_port.splitlines()[0] == str(port)
+            assert (user_data_dir / "Default" / "History").exists()
+            time.sleep(0.2)
+            assert (user_data_dir / "Default" / "FakeChurn" / "churn_1").exists()
+        finally:
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(timeout=10) == 0
+        assert not (user_data_dir / "DevToolsActivePort").exists()
+
+    def test_gologin_spawn_and_stop(
+        self, launcher: str, server: StandInServer, tmp_path: Path
+    ) -> None:
+        spans: List[Span] = []
+        gl = GoLogin(
+            {
+                "token": "standin-token",
+                "profile_id": server.add_profile(),
+                "tmpdir": str(tmp_path),
+                "executablePath": launcher,
+                "port": getRandomPort(),
+                "on_span": spans.append,
+                **server.options(),
+            }
+        )
+        url = gl.start()
+        assert requests.get(f"http://{url}/json/version").ok
+        pid = gl.pid
+
+        gl.stop()
+        assert not psutil.pid_exists(pid) or (
+            psutil.Process(pid).status() == psutil.STATUS_ZOMBIE
+        )
+        assert {"spawn", "devtools"} <= {span.phase for span in spans}
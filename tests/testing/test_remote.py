@@ -0,0 +1,55 @@
+import sys
+import time
+from pathlib import Path
+
+from pygologin import GoLogin
+from pygologin.testing import StandInServer
+
+
+def gologin(server: StandInServer, tmp_path: Path, **options) -> GoLogin:
+    return GoLogin(
+        {
+            "token": "standin-token",
+            "tmpdir": str(tmp_path),
+            "executablePath": sys.executable,
+            **server.options(),
+            **options,
+        }
+    )
+
+
+class TestRemote:
+    def test_adaptive_polling(self, tmp_path: Path) -> None:
+        with StandInServer(remote_startup=0.3) as server:
+            gl = gologin(server, tmp_path, profile_id=server.add_profile())
+            started = time.monotonic()
+            result = gl.startRemote()
+
+        assert result["status"] == "success"
+        # fixed 3s sleeps used to make this take at least 3 seconds
+        assert time.monotonic() - started < 2
+
+    def test_deadline(self, tmp_path: Path) -> None:
+        with StandInServer(remote_startup=10) as server:
+            gl = gologin(
+                server, tmp_path, profile_id=server.add_profile(), remote_timeout=0.3
+            )
+            started = time.monotonic()
+            result = gl.startRemote()
+
+        assert result["status"] == "failure"
+        assert time.monotonic() - started < 2
+
+    def test_many(self, tmp_path: Path) -> None:
+        with StandInServer(remote_startup=0.2) as server:
+            profile_ids = [server.add_profile() for _ in range(5)]
+            gl = gologin(server, tmp_path)
+            results = dict(gl.startRemoteMany(profile_ids + ["missing"]))
+            assert len(server.remote) == 5
+            stopped = gl.stopRemoteMany(profile_ids + ["missing"])
+
+        assert all(results[pid]["status"] == "success" for pid in profile_ids)
+        assert results["missing"]["status"] == "failure"
+        assert all(stopped[pid] for pid in profile_ids)
+        assert stopped["missing"] is False
+        assert server.remote == {}
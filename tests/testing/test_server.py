@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+import pytest
+import requests
+
+from pygologin import GoLogin
+from pygologin.instrumentation import Span
+from pygologin.testing import StandInServer
+from pygologin.testing.load import run_load
+
+
+class TestStandInServer:
+    def gologin(self, server: StandInServer, tmp_path: Path, **options) -> GoLogin:
+        return GoLogin(
+            {
+                "token": "standin-token",
+                "tmpdir": str(tmp_path),
+                "executablePath": sys.executable,
+                "spawn_browser": False,
+                **server.options(),
+                **options,
+            }
+        )
+
+    def test_start_stop(self, server: StandInServer, tmp_path: Path) -> None:
+        profile_id = server.add_profile()
+        spans: List[Span] = []
+        gl = self.gologin(server, tmp_path, profile_id=profile_id, on_span=spans.append)
+
+        profile_path = gl.start()
+        assert Path(profile_path, "Default", "Preferences").exists()
+        gl.stop()
+
+        assert not Path(profile_path).exists()
+        assert ("PUT", "/upload") in server.requests
+        phases = {span.phase for span in spans}
+        assert {"getProfile", "download", "extract", "zip", "upload"} <= phases
+
+    def test_api_calls(self, server: StandInServer, tmp_path: Path) -> None:
+        gl = self.gologin(server, tmp_path)
+        profile_id = gl.create({"name": "created"})
+        assert gl.getProfile(profile_id)["name"] == "created"
+        assert len(gl.profiles()["profiles"]) == 1
+
+        gl.setProfileId(profile_id)
+        remote = gl.startRemote(delay_s=0)
+        assert remote["status"] == "success"
+        gl.stopRemote()
+
+        gl.delete(profile_id)
+        assert server.profiles == {}
+
+    def test_error_injection(self) -> None:
+        with StandInServer(error_rate=1.0, retry_after=1) as server:
+            response = requests.get(server.url + "/timezone")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_not_found_keeps_connection_usable(self, server: StandInServer) -> None:
+        with requests.Session() as session:
+            for _ in range(3):
+                response = session.post(
+                    server.url + "/no-such-endpoint", json=[{"name": "x"}]
+                )
+                assert response.status_code == 404
+
+
+def test_run_load(server: StandInServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    created: List[str] = []
+    mkdtemp = tempfile.mkdtemp
+    monkeypatch.setattr(
+        tempfile, "mkdtemp", lambda **kw: created.append(mkdtemp(**kw)) or created[-1]
+    )
+    closed: List[GoLogin] = []
+    close = GoLogin.close
+    monkeypatch.setattr(GoLogin, "close", lambda gl: closed.append(gl) or close(gl))
+    reports = run_load(server, levels=(1, 2), iterations=2)
+    assert created and not os.path.exists(created[0])
+    assert len(closed) == 4
+    assert [report.starts for report in reports] == [2, 2]
+    assert reports[1].starts_per_second > 0
+    assert "download:ok" in reports[0].phases